@@ -2,15 +2,23 @@ from flask import Flask, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 from .config import Config
+from .cache import TTLCache
+from .revocation import TokenRevocationList
+from .passwords import PasswordHasher
 from flask_mail import Mail
 import simplejson as json
 
 db = SQLAlchemy()
 jwt = JWTManager()
 mail = Mail()
+password_hasher = PasswordHasher()
 
-revoked_tokens = set()
+revoked_tokens = TokenRevocationList()
+
+# Кэш email -> Identity (id пользователя, id врача, роль, подтверждение)
+identity_cache = TTLCache()
 
 class CustomJSONEncoder(json.JSONEncoder):
     def __init__(self, *args, **kwargs):
@@ -25,9 +33,18 @@ def create_app():
     db.init_app(app)
     jwt.init_app(app)
     mail.init_app(app)
+    password_hasher.init_app(app)
+    identity_cache.configure(
+        maxsize=app.config['IDENTITY_CACHE_SIZE'],
+        ttl=app.config['IDENTITY_CACHE_TTL']
+    )
 
     # Инициализация CORS для всего приложения
-    CORS(app, resources={r"/*": {"origins": "*"}})
+    CORS(app, resources={r"/*": {"origins": "*"}}, expose_headers=["X-Next-Cursor"])
+
+    @app.errorhandler(RequestEntityTooLarge)
+    def request_too_large(e):
+        return jsonify({'message': f'Request body must not exceed {app.config["MAX_CONTENT_LENGTH"]} bytes'}), 413
 
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
@@ -46,5 +63,19 @@ def create_app():
         app.register_blueprint(managers_bp, url_prefix='/manager')
 
         db.create_all()
+        # Индексы, добавленные в модели позже таблиц; дубли study_count удаляются до уникального индекса
+        from .bulk import ensure_indexes
+        from .services import study_counts
+        with db.engine.begin() as conn:
+            study_counts.ensure_unique_index(conn)
+            ensure_indexes(conn, db.metadata)
+        revoked_tokens.init_app(app, db)
+
+        from .routes.manager import registry, forecasts, demand_service, uploads, capacity
+        forecasts.init_app(app, db)
+        demand_service.init_app(app)
+        uploads.init_app(app)
+        capacity.init_app(app)
+        registry.init_app(app)
 
     return app
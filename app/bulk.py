@@ -0,0 +1,41 @@
+from sqlalchemy import insert
+
+
+def insert_ignore(conn, table, rows, index_elements):
+    """Пакетная вставка, пропускающая строки с уже существующим ключом."""
+    if not rows:
+        return
+    if conn.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        statement = pg_insert(table).on_conflict_do_nothing(index_elements=index_elements)
+    elif conn.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        statement = sqlite_insert(table).on_conflict_do_nothing(index_elements=index_elements)
+    else:
+        statement = insert(table)
+    conn.execute(statement, rows)
+
+
+def upsert(conn, table, rows, index_elements, update_columns):
+    """Пакетная вставка; для существующего ключа обновляет ``update_columns``."""
+    if not rows:
+        return
+    if conn.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif conn.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise NotImplementedError(f'upsert is not supported for {conn.dialect.name}')
+    statement = dialect_insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={column: statement.excluded[column] for column in update_columns},
+    )
+    conn.execute(statement, rows)
+
+
+def ensure_indexes(conn, metadata):
+    """Создаёт недостающие индексы моделей: create_all не добавляет их к существующим таблицам."""
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
@@ -8,6 +8,80 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'super-secret'
 
+    # Хеширование паролей: метод werkzeug с параметрами стоимости и пул процессов
+    # (PASSWORD_HASH_WORKERS = 0 — хешировать в текущем потоке)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 8))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+    # Модели прогноза: сколько держать в памяти (None — все) и загружать ли их при старте
+    PREDICTOR_MAX_MODELS = int(os.environ['PREDICTOR_MAX_MODELS']) if os.environ.get('PREDICTOR_MAX_MODELS') else None
+    PREDICTOR_WARMUP = os.environ.get('PREDICTOR_WARMUP', '0') == '1'
+    # 'auto' | 'compiled' | 'sklearn', см. app.ml.predictor.Predictor
+    PREDICTOR_ENGINE = os.environ.get('PREDICTOR_ENGINE', 'auto')
+    PREDICTOR_MMAP = os.environ.get('PREDICTOR_MMAP', '1') == '1'
+    # Как часто (в секундах) воркер проверяет manifest.json на смену версии моделей; 0 — не проверять
+    MODEL_REGISTRY_WATCH_INTERVAL = float(os.environ.get('MODEL_REGISTRY_WATCH_INTERVAL', 30))
+
+    # /manager/predict отдаёт горизонты длиннее стольких недель потоком JSON lines
+    PREDICT_STREAM_WEEKS = int(os.environ.get('PREDICT_STREAM_WEEKS', 104))
+
+    # Наибольший диапазон недель в /manager/predict, /manager/study_counts/range,
+    # выгрузке /manager/export_study_counts и горизонте /manager/analyze_doctors
+    MAX_RANGE_WEEKS = int(os.environ.get('MAX_RANGE_WEEKS', 520))
+
+    # Кэш прогнозов: LRU в памяти + таблица forecast_cache; при прогреве моделей
+    # заранее считаем FORECAST_CACHE_WARM_WEEKS недель вперёд
+    FORECAST_CACHE_SIZE = int(os.environ.get('FORECAST_CACHE_SIZE', 100000))
+    FORECAST_CACHE_PERSIST = os.environ.get('FORECAST_CACHE_PERSIST', '1') == '1'
+    FORECAST_CACHE_WARM_WEEKS = int(os.environ.get('FORECAST_CACHE_WARM_WEEKS', 52))
+
+    # Кэш недельного спроса (факт + прогноз) по неделям, на процесс
+    DEMAND_CACHE_SIZE = int(os.environ.get('DEMAND_CACHE_SIZE', 10000))
+    DEMAND_CACHE_TTL = int(os.environ.get('DEMAND_CACHE_TTL', 300))
+
+    # Фоновый разбор загруженных файлов с количеством исследований
+    STUDY_COUNT_UPLOAD_WORKERS = int(os.environ.get('STUDY_COUNT_UPLOAD_WORKERS', 1))
+    STUDY_COUNT_UPLOAD_CHUNK_ROWS = int(os.environ.get('STUDY_COUNT_UPLOAD_CHUNK_ROWS', 5000))
+    STUDY_COUNT_UPLOAD_DIR = os.environ.get('STUDY_COUNT_UPLOAD_DIR')
+
+    # Наибольший размер тела запроса в байтах, в том числе загружаемого файла; больше — 413
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 64 * 1024 * 1024))
+
+    # Наибольший размер страницы /manager/doctors
+    DOCTORS_PAGE_MAX = int(os.environ.get('DOCTORS_PAGE_MAX', 500))
+
+    # Снимок ресурса врачей по модальностям (на процесс); в своём процессе
+    # сбрасывается сразу после изменения врачей или модальностей
+    CAPACITY_CACHE_TTL = int(os.environ.get('CAPACITY_CACHE_TTL', 60))
+
+    # Часы и дни работы отделения (ISO, 1 — понедельник): по ним недельный спрос
+    # распределяется по интервалам в /manager/coverage
+    CLINIC_OPEN_TIME = os.environ.get('CLINIC_OPEN_TIME', '08:00')
+    CLINIC_CLOSE_TIME = os.environ.get('CLINIC_CLOSE_TIME', '20:00')
+    CLINIC_OPEN_WEEKDAYS = [int(day) for day in os.environ.get('CLINIC_OPEN_WEEKDAYS', '1,2,3,4,5,6,7').split(',')]
+    COVERAGE_MAX_DAYS = int(os.environ.get('COVERAGE_MAX_DAYS', 31))
+
+    # Наибольшее число нанимаемых врачей в одном сценарии /manager/simulate
+    SIMULATION_MAX_HIRES = int(os.environ.get('SIMULATION_MAX_HIRES', 1000))
+
+    # Кэш роли и статуса подтверждения пользователя (на процесс)
+    IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 60))
+    IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', 10000))
+
+    # Хранилище отозванных токенов: 'database' (таблица revoked_token) или 'sqlite' (локальный файл)
+    REVOCATION_BACKEND = os.environ.get('REVOCATION_BACKEND', 'database')
+    REVOCATION_SQLITE_PATH = os.environ.get('REVOCATION_SQLITE_PATH') or os.path.join(basedir, '..', 'revoked_tokens.sqlite')
+    # Окно устаревания между воркерами: токен, отозванный в другом процессе, здесь
+    # считается действующим до очередной синхронизации — не дольше
+    # REVOCATION_SYNC_INTERVAL секунд. 0 — синхронизироваться при каждой проверке
+    REVOCATION_SYNC_INTERVAL = float(os.environ.get('REVOCATION_SYNC_INTERVAL', 2))
+    REVOCATION_LOCAL_SIZE = int(os.environ.get('REVOCATION_LOCAL_SIZE', 10000))
+    REVOCATION_BLOOM_CAPACITY = int(os.environ.get('REVOCATION_BLOOM_CAPACITY', 100000))
+    REVOCATION_BLOOM_ERROR_RATE = float(os.environ.get('REVOCATION_BLOOM_ERROR_RATE', 0.001))
+    REVOCATION_REBUILD_INTERVAL = float(os.environ.get('REVOCATION_REBUILD_INTERVAL', 3600))
+
     # Настройки для Flask-Mail
     MAIL_SERVER = 'smtp.yandex.ru'
     MAIL_PORT = 465
@@ -1,8 +1,37 @@
+from collections import namedtuple
 from functools import wraps
 from flask import request, jsonify
 from flask_jwt_extended import get_jwt_identity, jwt_required, get_jwt
-from app.models import Users
-from app import revoked_tokens
+from app.models import Users, Doctors
+from app import db, revoked_tokens, identity_cache
+
+Identity = namedtuple('Identity', ['user_id', 'doctor_id', 'role', 'approved'])
+
+
+def load_identity(email):
+    identity = identity_cache.get(email)
+    if identity is not None:
+        return identity
+
+    # Один запрос вместо отдельных выборок Users и Doctors
+    row = db.session.query(Users.id, Doctors.id, Users.role, Users.approved).outerjoin(
+        Doctors, Doctors.user_id == Users.id
+    ).filter(Users.email == email).first()
+    if row is None:
+        return None
+
+    identity = Identity(*row)
+    identity_cache.set(email, identity)
+    return identity
+
+
+def get_current_identity():
+    return load_identity(get_jwt_identity()['email'])
+
+
+def invalidate_identity(email):
+    identity_cache.pop(email)
+
 
 def role_and_approval_required(*required_roles):
     def decorator(f):
@@ -10,9 +39,8 @@ def role_and_approval_required(*required_roles):
         @jwt_required()
         @check_token_not_revoked
         def decorated_function(*args, **kwargs):
-            current_user = get_jwt_identity()
-            user = Users.query.filter_by(email=current_user['email']).first()
-            if user.role not in required_roles or not user.approved:
+            identity = get_current_identity()
+            if identity is None or identity.role not in required_roles or not identity.approved:
                 return jsonify({'message': 'Access denied'}), 403
             return f(*args, **kwargs)
         return decorated_function
@@ -27,4 +55,3 @@ def check_token_not_revoked(f):
             return jsonify({'message': 'Token has been revoked'}), 401
         return f(*args, **kwargs)
     return decorated_function
-
@@ -0,0 +1,134 @@
+from datetime import date
+
+import numpy as np
+from sqlalchemy import delete, select
+
+from app.bulk import insert_ignore
+from app.cache import TTLCache
+from app.ml.predictor import weeks_ahead
+
+
+class ForecastCache:
+    """Кэш прогнозов по ключу (версия модели, цель, год, неделя).
+
+    Леса детерминированы, поэтому прогноз на неделю достаточно посчитать
+    один раз для каждой версии модели. Первый уровень — LRU в памяти
+    процесса, второй — таблица forecast_cache, общая для всех воркеров.
+    Версия модели — хеш её файла, так что замена файла или переключение
+    версии в реестре сами инвалидируют старые записи, а строки версий,
+    убранных из манифеста реестра, удаляются из таблицы.
+    """
+
+    def __init__(self, registry, maxsize=100000):
+        self.registry = registry
+        self.db = None
+        self.persist = False
+        self.warm_weeks = 0
+        self.local = TTLCache(maxsize=maxsize, ttl=float('inf'))
+        self._seen_versions = set()
+
+    def init_app(self, app, db):
+        self.db = db
+        self.persist = app.config['FORECAST_CACHE_PERSIST']
+        self.warm_weeks = app.config['FORECAST_CACHE_WARM_WEEKS']
+        self.local.configure(maxsize=app.config['FORECAST_CACHE_SIZE'])
+        self.registry.on_reload(self._prefill)
+
+    def _prefill(self, predictor):
+        # Новая версия моделей начинает работу с уже посчитанным горизонтом
+        if self.warm_weeks and (self.registry.preload or self.registry.version is not None):
+            self.fill(predictor=predictor)
+
+    @property
+    def table(self):
+        from app.models import ForecastCacheEntry
+        return ForecastCacheEntry.__table__
+
+    def predict_many(self, targets, year_weeks, predictor=None) -> np.ndarray:
+        """То же, что ``Predictor.predict_many``, но модели вызываются только для промахов кэша."""
+        predictor = predictor or self.registry.predictor
+        year_weeks = [(int(year), int(week)) for year, week in year_weeks]
+        versions = [predictor.model_version(target) for target in targets]
+        if not self._seen_versions.issuperset(versions):
+            self._seen_versions.update(versions)
+            self.purge_stale(predictor)
+
+        keys = [(version, target, year, week)
+                for version, target in zip(versions, targets) for year, week in year_weeks]
+        values = self.local.get_many(keys)
+        result = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        result = result.reshape(len(targets), len(year_weeks))
+
+        missing = np.isnan(result)
+        if missing.any() and self.persist:
+            self._load_persisted(result, targets, versions, year_weeks)
+            missing = np.isnan(result)
+
+        if missing.any():
+            rows = np.flatnonzero(missing.any(axis=1))
+            columns = np.flatnonzero(missing.any(axis=0))
+            computed = predictor.predict_many(
+                [targets[i] for i in rows], [year_weeks[j] for j in columns]
+            )
+            result[np.ix_(rows, columns)] = computed
+            entries = [
+                (versions[i], targets[i], year_weeks[j][0], year_weeks[j][1], float(computed[a, b]))
+                for a, i in enumerate(rows) for b, j in enumerate(columns)
+            ]
+            self.local.set_many((entry[:4], entry[4]) for entry in entries)
+            if self.persist:
+                self._store(entries)
+        return result
+
+    def _load_persisted(self, result, targets, versions, year_weeks):
+        table = self.table
+        missing = np.isnan(result)
+        wanted_targets = {targets[i] for i in np.flatnonzero(missing.any(axis=1))}
+        years = [year for year, _ in year_weeks]
+        query = select(table.c.model_version, table.c.target, table.c.year, table.c.week_number, table.c.value).where(
+            table.c.model_version.in_(set(versions)),
+            table.c.target.in_(wanted_targets),
+            table.c.year.between(min(years), max(years)),
+        )
+        with self.db.engine.connect() as conn:
+            stored = {tuple(row[:4]): row[4] for row in conn.execute(query)}
+        if not stored:
+            return
+
+        found = []
+        for i, j in zip(*np.nonzero(missing)):
+            key = (versions[i], targets[i]) + year_weeks[j]
+            value = stored.get(key)
+            if value is not None:
+                result[i, j] = value
+                found.append((key, value))
+        self.local.set_many(found)
+
+    def _store(self, entries):
+        rows = [
+            {'model_version': version, 'target': target, 'year': year, 'week_number': week, 'value': value}
+            for version, target, year, week, value in entries
+        ]
+        with self.db.engine.begin() as conn:
+            insert_ignore(conn, self.table, rows, ['model_version', 'target', 'year', 'week_number'])
+
+    def purge_stale(self, predictor=None):
+        """Удаляет из таблицы прогнозы версий моделей, которых больше нет в манифесте.
+
+        Прогнозы остальных версий остаются: их может читать воркер, который
+        ещё не переключился, или понадобиться после отката.
+        """
+        if not self.persist:
+            return
+        predictor = predictor or self.registry.predictor
+        keep = self.registry.model_versions()
+        keep.update(predictor.model_version(target) for target in predictor.targets)
+        with self.db.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.model_version.notin_(keep)))
+
+    def fill(self, start=None, weeks=None, predictor=None):
+        """Заранее считает прогнозы всех целей на горизонт ``weeks`` недель от ``start``."""
+        predictor = predictor or self.registry.predictor
+        start = start or date.today().isocalendar()[:2]
+        year_weeks = weeks_ahead(start[0], start[1], weeks or self.warm_weeks)
+        return self.predict_many(predictor.targets, year_weeks, predictor=predictor)
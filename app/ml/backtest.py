@@ -0,0 +1,141 @@
+"""Бэктест моделей прогноза со скользящей точкой прогноза (rolling origin).
+
+    python -m app.ml.backtest --horizon 4 --step 4 --min-train 52 --workers 4 --json report.json
+
+История из study_count разворачивается так же, как при переобучении. Для
+каждой точки прогноза лес обучается на неделях до неё и прогнозирует
+следующие ``horizon`` недель. Цели считаются параллельно в пуле процессов.
+На выходе для каждой цели: MAE и MAPE, время обучения и время инференса.
+Тот же лес на тех же окнах прогнозирует и в скомпилированном формате
+(``compile_forest``, как в реестре с engine=compiled): время компиляции и
+инференса и наибольшее расхождение с sklearn видны рядом, так что регрессия
+формата проявится здесь же.
+
+Активная версия моделей здесь не проверяется: она обучена на всей истории,
+и её ошибка на этих окнах была бы ошибкой на обучающей выборке.
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from app.ml.compiled import compile_forest
+from app.ml.predictor import FEATURES
+from app.ml.training import FOREST_PARAMS, load_history
+
+
+def errors(actual, predicted):
+    actual = np.asarray(actual, dtype=np.float64)
+    predicted = np.asarray(predicted, dtype=np.float64)
+    nonzero = actual != 0
+    return {
+        'mae': round(float(np.mean(np.abs(actual - predicted))), 3),
+        'mape': round(float(np.mean(np.abs((actual - predicted)[nonzero] / actual[nonzero])) * 100), 3)
+        if nonzero.any() else None,
+    }
+
+
+def backtest_target(target, features, values, origins, horizon, params=None):
+    """Бэктест одной цели; выполняется в дочернем процессе."""
+    if not origins:
+        raise ValueError(f'{target}: недостаточно истории для бэктеста ({len(values)} недель)')
+    result = {'target': target, 'weeks': len(values), 'origins': len(origins)}
+    windows = [np.arange(origin, min(origin + horizon, len(values))) for origin in origins]
+    holdout = np.concatenate(windows)
+
+    predicted, fit_seconds, predict_seconds = [], [], []
+    compiled_predicted, compile_seconds, compiled_predict_seconds = [], [], []
+    for origin, window in zip(origins, windows):
+        forest = RandomForestRegressor(**(params or FOREST_PARAMS))
+        started = time.perf_counter()
+        forest.fit(pd.DataFrame(features[:origin], columns=FEATURES), values[:origin])
+        fit_seconds.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        predicted.append(forest.predict(pd.DataFrame(features[window], columns=FEATURES)))
+        predict_seconds.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        compiled = compile_forest(forest)
+        compile_seconds.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        compiled_predicted.append(compiled.predict(features[window]))
+        compiled_predict_seconds.append(time.perf_counter() - started)
+
+    predicted, compiled_predicted = np.concatenate(predicted), np.concatenate(compiled_predicted)
+    result['retrained'] = dict(
+        errors(values[holdout], predicted),
+        fit_seconds=round(float(np.mean(fit_seconds)), 4),
+        predict_ms=round(float(np.mean(predict_seconds)) * 1000, 3),
+    )
+    result['compiled'] = dict(
+        errors(values[holdout], compiled_predicted),
+        compile_seconds=round(float(np.mean(compile_seconds)), 4),
+        predict_ms=round(float(np.mean(compiled_predict_seconds)) * 1000, 3),
+        max_abs_diff=float(np.max(np.abs(compiled_predicted - predicted))),
+    )
+    return result
+
+
+def rolling_origins(weeks, horizon, step, min_train):
+    return list(range(max(min_train, 1), weeks - horizon + 1, step))
+
+
+def run(history, horizon=4, step=4, min_train=52, workers=None):
+    jobs, short = [], []
+    for target in history.columns:
+        column = history[target].dropna()
+        if column.empty:
+            continue
+        features = column.index.to_frame(index=False).to_numpy()
+        origins = rolling_origins(len(column), horizon, step, min_train)
+        if not origins:
+            short.append(f'{target} ({len(column)})')
+        jobs.append((target, features, column.to_numpy(), origins, horizon))
+    # Проверяем до запуска пула, чтобы не обучать впустую остальные цели
+    if short:
+        raise ValueError(f'недостаточно истории для min_train={min_train}, horizon={horizon}: ' + ', '.join(short))
+    if not jobs:
+        raise ValueError('study_count пуст: проверять нечего')
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(backtest_target, *zip(*jobs)))
+    return {'total_seconds': round(time.perf_counter() - started, 3), 'targets': results}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--horizon', type=int, default=4)
+    parser.add_argument('--step', type=int, default=4)
+    parser.add_argument('--min-train', type=int, default=52)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--json', help='сохранить отчёт в файл')
+    args = parser.parse_args()
+
+    from app import create_app, db
+
+    app = create_app()
+    with app.app_context():
+        history = load_history(db.session)
+    try:
+        report = run(history, args.horizon, args.step, args.min_train, args.workers)
+    except ValueError as exc:
+        parser.exit(1, f'error: {exc}\n')
+
+    print(f'{len(report["targets"])} targets in {report["total_seconds"]} s')
+    for row in report['targets']:
+        print(f'{row["target"]}: {row["weeks"]} weeks, {row["origins"]} origins')
+        for engine in ['retrained', 'compiled']:
+            stats = ', '.join(f'{key}={value}' for key, value in row[engine].items())
+            print(f'  {engine}: {stats}')
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=4)
+
+
+if __name__ == '__main__':
+    main()
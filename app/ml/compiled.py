@@ -0,0 +1,161 @@
+"""Компиляция случайных лесов sklearn в плоские массивы NumPy.
+
+Все деревья леса хранятся в общих массивах (признак, порог, левый и правый
+потомок, значение листа), а предсказание — векторизованный спуск сразу по
+всем деревьям без sklearn и pandas. Результат совпадает с ``forest.predict``
+бит в бит.
+
+Файл пишется без сжатия, поэтому массивы можно открыть через ``np.memmap``
+прямо внутри .npz: все воркеры gunicorn разделяют одни и те же страницы
+page cache, и память моделей не растёт с числом воркеров.
+
+    python -m app.ml.compiled [версия]   # saved_models/<версия>/*/forest_model.pkl -> compiled_models.npz
+"""
+import os
+import struct
+import zipfile
+from typing import Dict
+
+import numpy as np
+
+ARRAYS = ['feature', 'threshold', 'left', 'right', 'value', 'roots']
+COMPILED_FILE = 'compiled_models.npz'
+
+
+class CompiledForest:
+    def __init__(self, feature, threshold, left, right, value, roots):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = self._max_depth()
+
+    def _max_depth(self):
+        # Число шагов спуска, за которое все деревья гарантированно доходят до листа
+        nodes = np.asarray(self.roots)
+        depth = 0
+        while True:
+            internal = nodes[self.left[nodes] != nodes]
+            if not len(internal):
+                return depth
+            nodes = np.concatenate([self.left[internal], self.right[internal]])
+            depth += 1
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    def predict_trees(self, X) -> np.ndarray:
+        """Значения листьев для каждого дерева: массив формы (деревья, объекты)."""
+        # Как и sklearn, приводим признаки к float32 перед сравнением с порогами
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        samples = np.arange(len(X))
+        nodes = np.repeat(self.roots[:, None], len(X), axis=1)
+        for _ in range(self.max_depth):
+            go_left = X[samples, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes]
+
+    def predict(self, X) -> np.ndarray:
+        per_tree = self.predict_trees(X)
+        # cumsum складывает деревья последовательно, в том же порядке, что и sklearn
+        return np.cumsum(per_tree, axis=0)[-1] / self.n_trees
+
+
+def compile_forest(forest) -> CompiledForest:
+    trees = [estimator.tree_ for estimator in forest.estimators_]
+    offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+
+    feature, threshold, left, right, value = [], [], [], [], []
+    for tree, offset in zip(trees, offsets):
+        own = np.arange(tree.node_count) + offset
+        is_leaf = tree.children_left == -1
+        # Листья ссылаются сами на себя, чтобы спуск на них останавливался
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+        left.append(np.where(is_leaf, own, tree.children_left + offset))
+        right.append(np.where(is_leaf, own, tree.children_right + offset))
+        value.append(tree.value[:, 0, 0])
+
+    return CompiledForest(
+        feature=np.concatenate(feature).astype(np.int32),
+        threshold=np.concatenate(threshold).astype(np.float64),
+        left=np.concatenate(left).astype(np.int32),
+        right=np.concatenate(right).astype(np.int32),
+        value=np.concatenate(value).astype(np.float64),
+        roots=offsets[:-1].astype(np.int32),
+    )
+
+
+def save_compiled(forests: Dict[str, CompiledForest], path):
+    arrays = {'targets': np.array(sorted(forests))}
+    for i, target in enumerate(sorted(forests)):
+        for name in ARRAYS:
+            arrays[f'{i}_{name}'] = getattr(forests[target], name)
+    np.savez(path, **arrays)
+
+
+def compiled_targets(path):
+    with np.load(path) as data:
+        return [str(target) for target in data['targets']]
+
+
+def _mmap_member(path, info):
+    """Открывает .npy внутри несжатого .npz как memmap без копирования в память процесса."""
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError(f'{info.filename} is compressed and cannot be memory-mapped')
+    with open(path, 'rb') as fh:
+        fh.seek(info.header_offset)
+        local_header = fh.read(30)
+        name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+        fh.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(fh)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fh)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fh)
+        offset = fh.tell()
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape, offset=offset,
+                     order='F' if fortran_order else 'C')
+
+
+def load_compiled(path, target, mmap=False) -> CompiledForest:
+    with np.load(path) as data:
+        targets = [str(name) for name in data['targets']]
+        if target not in targets:
+            raise KeyError(target)
+        i = targets.index(target)
+        if not mmap:
+            return CompiledForest(**{name: data[f'{i}_{name}'] for name in ARRAYS})
+
+    with zipfile.ZipFile(path) as archive:
+        return CompiledForest(**{
+            name: _mmap_member(path, archive.getinfo(f'{i}_{name}.npy')) for name in ARRAYS
+        })
+
+
+def compile_directory(models_dir):
+    import joblib
+
+    forests = {}
+    for folder in sorted(os.listdir(models_dir)):
+        path = os.path.join(models_dir, folder, 'forest_model.pkl')
+        if os.path.isfile(path):
+            forests[folder] = compile_forest(joblib.load(path))
+    save_compiled(forests, os.path.join(models_dir, COMPILED_FILE))
+    return forests
+
+
+if __name__ == '__main__':
+    import sys
+    from app.ml.registry import MODELS_ROOT, current_models_dir
+
+    models_dir = os.path.join(MODELS_ROOT, sys.argv[1]) if len(sys.argv) > 1 else current_models_dir()
+    for target, forest in compile_directory(models_dir).items():
+        print(f'{target}: {forest.n_trees} trees, {len(forest.value)} nodes, {forest.nbytes / 1024:.0f} KiB')
@@ -1,21 +1,200 @@
+from collections import OrderedDict
+from datetime import date, timedelta
 from pandas.core.frame import DataFrame
-from typing import List
+from typing import List, Sequence, Tuple
+import numpy as np
 import pandas as pd
+import hashlib
 import joblib
+import threading
 import os
 
+from app.ml.compiled import COMPILED_FILE, CompiledForest, compile_forest, compiled_targets, load_compiled
+
+
+FEATURES = ['Год', 'Номер недели']
+
+
+def week_range(year: int, start_week: int, end_week: int) -> List[Tuple[int, int]]:
+    return [(year, week) for week in range(start_week, end_week + 1)]
+
+
+def iso_week_range(start_year: int, start_week: int, end_year: int, end_week: int) -> np.ndarray:
+    """Все ISO-недели от (start_year, start_week) до (end_year, end_week) включительно.
+
+    Возвращает массив формы (недели, 2) со столбцами год и номер недели; годы
+    с 53 неделями и переход через границу года учитываются. Несуществующая
+    неделя (например, 53-я в 52-недельном году) — ValueError.
+    """
+    start = np.datetime64(date.fromisocalendar(start_year, start_week, 1))
+    end = np.datetime64(date.fromisocalendar(end_year, end_week, 1))
+    count = max(int((end - start).astype(np.int64)) // 7 + 1, 0)
+    # ISO-год и номер недели определяются по четвергу недели
+    thursdays = start + np.arange(count) * 7 + 3
+    years = thursdays.astype('datetime64[Y]')
+    weeks = (thursdays - years).astype(np.int64) // 7 + 1
+    return np.stack([years.astype(np.int64) + 1970, weeks], axis=1)
+
+
+def weeks_ahead(year: int, week: int, count: int) -> List[Tuple[int, int]]:
+    """``count`` ISO-недель начиная с (year, week), с переходом через границу года."""
+    if count <= 0:
+        return []
+    end_year, end_week, _ = (date.fromisocalendar(year, week, 1) + timedelta(weeks=count - 1)).isocalendar()
+    return [tuple(row) for row in iso_week_range(year, week, end_year, end_week).tolist()]
+
 
 class Predictor:
-    def __init__(self):
-        self.models = {}
-        dir_ = os.path.join(os.path.dirname(__file__), 'saved_models')
-        for folder in os.listdir(dir_):
-            for file in os.listdir(f'{dir_}/{folder}'):
-                if file == 'forest_model.pkl':
-                    self.models[folder] = joblib.load(f'{dir_}/{folder}/{file}').predict
+    """Прогноз количества исследований по сохранённым моделям.
+
+    Модели загружаются лениво при первом обращении к цели. Если задан
+    ``max_models``, в памяти держатся только последние использованные модели
+    (LRU). ``warmup()`` загружает модели заранее, например перед fork воркеров.
+
+    ``models_dir`` — каталог одной версии моделей (по умолчанию активная
+    версия из app.ml.registry). ``engine``: 'compiled' — леса,
+    скомпилированные в массивы NumPy (``compiled_models.npz``, см.
+    app.ml.compiled), 'sklearn' — исходные ``forest_model.pkl``, 'auto' —
+    compiled, если файл есть. При ``mmap`` скомпилированные массивы
+    отображаются в память, а не копируются, и воркеры делят одну
+    физическую копию моделей.
+
+    ``model_version(target)`` — хеш файла модели; если файл на диске
+    заменили, модель перечитывается при следующем обращении.
+    """
+
+    def __init__(self, models_dir=None, max_models=None, engine='auto', mmap=True):
+        if models_dir is None:
+            from app.ml.registry import current_models_dir
+            models_dir = current_models_dir()
+        self.models_dir = models_dir
+        self.max_models = max_models
+        self.engine = engine
+        self.mmap = mmap
+        self.models = OrderedDict()
+        self._versions = {}
+        self._forests = {}
+        self._lock = threading.Lock()
+
+    @property
+    def compiled_path(self):
+        return os.path.join(self.models_dir, COMPILED_FILE)
+
+    @property
+    def compiled(self) -> bool:
+        if self.engine == 'auto':
+            return os.path.isfile(self.compiled_path)
+        return self.engine == 'compiled'
+
+    @property
+    def targets(self) -> List[str]:
+        if self.compiled:
+            return compiled_targets(self.compiled_path)
+        return sorted(
+            folder for folder in os.listdir(self.models_dir)
+            if os.path.isfile(os.path.join(self.models_dir, folder, 'forest_model.pkl'))
+        )
+
+    def model_path(self, target: str) -> str:
+        if self.compiled:
+            return self.compiled_path
+        return os.path.join(self.models_dir, target, 'forest_model.pkl')
+
+    def model_version(self, target: str) -> str:
+        path = self.model_path(target)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise KeyError(target)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        version = self._versions.get(key)
+        if version is None:
+            digest = hashlib.sha1()
+            with open(path, 'rb') as fh:
+                for chunk in iter(lambda: fh.read(1 << 20), b''):
+                    digest.update(chunk)
+            version = digest.hexdigest()[:16]
+            self._versions[key] = version
+        return version
+
+    def get_model(self, target: str):
+        version = self.model_version(target)
+        with self._lock:
+            loaded = self.models.get(target)
+            if loaded is not None and loaded[0] == version:
+                self.models.move_to_end(target)
+                return loaded[1]
+
+        model = self._load(target)
+
+        with self._lock:
+            self.models[target] = (version, model)
+            self.models.move_to_end(target)
+            if self.max_models:
+                while len(self.models) > self.max_models:
+                    self.models.popitem(last=False)
+        return model
+
+    def _load(self, target: str):
+        if self.compiled:
+            return load_compiled(self.compiled_path, target, mmap=self.mmap)
+        path = os.path.join(self.models_dir, target, 'forest_model.pkl')
+        if not os.path.isfile(path):
+            raise KeyError(target)
+        return joblib.load(path)
+
+    def warmup(self, targets=None):
+        for target in targets or self.targets:
+            self.get_model(target)
 
     def predict(self, target: str, data: DataFrame) -> List:
-        return list(self.models[target](data))
+        return list(self.get_model(target).predict(data[FEATURES]))
+
+    def predict_many(self, targets: Sequence[str], year_weeks: Sequence[Tuple[int, int]]) -> np.ndarray:
+        """Прогноз для нескольких целей сразу: массив формы (цели, недели).
+
+        Матрица признаков строится один раз и подаётся во все модели.
+        """
+        result = np.zeros((len(targets), len(year_weeks)))
+        if not len(year_weeks):
+            return result
+        features = np.asarray(year_weeks, dtype=np.int64).reshape(-1, 2)
+        if not self.compiled:
+            features = pd.DataFrame(features, columns=FEATURES)
+        for i, target in enumerate(targets):
+            result[i] = self.get_model(target).predict(features)
+        return result
+
+    def get_forest(self, target: str) -> CompiledForest:
+        """Модель цели в виде массивов деревьев (для sklearn-моделей компилируется один раз)."""
+        model = self.get_model(target)
+        if isinstance(model, CompiledForest):
+            return model
+        with self._lock:
+            forest = self._forests.get(target)
+            if forest is None or forest[0] is not model:
+                forest = (model, compile_forest(model))
+                self._forests[target] = forest
+        return forest[1]
+
+    def predict_intervals(self, targets: Sequence[str], year_weeks: Sequence[Tuple[int, int]],
+                          percentiles: Sequence[float] = (10, 50, 90)) -> Tuple[np.ndarray, np.ndarray]:
+        """Точечный прогноз и перцентили по отдельным деревьям леса.
+
+        Возвращает (прогноз формы (цели, недели), полосы формы (цели, перцентили, недели)).
+        Выходы всех деревьев получаются одним векторизованным проходом.
+        """
+        mean = np.zeros((len(targets), len(year_weeks)))
+        bands = np.zeros((len(targets), len(percentiles), len(year_weeks)))
+        if not len(year_weeks):
+            return mean, bands
+        features = np.asarray(year_weeks, dtype=np.int64).reshape(-1, 2)
+        for i, target in enumerate(targets):
+            forest = self.get_forest(target)
+            per_tree = forest.predict_trees(features)
+            mean[i] = np.cumsum(per_tree, axis=0)[-1] / forest.n_trees
+            bands[i] = np.percentile(per_tree, percentiles, axis=0)
+        return mean, bands
 
 
 if __name__ == '__main__':
@@ -29,7 +208,7 @@ if __name__ == '__main__':
         'Номер недели': [i for i in range(start, finish + 1)],
     }
 
-    df = pd.read_csv('testing.csv')
+    df = pd.read_csv(os.path.join(os.path.dirname(__file__), 'testing.csv'))
     cols = list(df.columns)
     out = {
         'Год': [2024 for _ in range(52)],
@@ -0,0 +1,208 @@
+"""Реестр версий моделей прогноза.
+
+    saved_models/
+        manifest.json           {"current": "v2", "versions": {"v1": {...}, "v2": {...}}}
+        v1/<цель>/forest_model.pkl
+        v1/compiled_models.npz
+        v2/...
+
+Активная версия задаётся в manifest.json. Переключение — атомарная замена
+ссылки на ``Predictor``: новый экземпляр сначала прогревается, и только потом
+подменяет старый. Запрос, уже взявший ``registry.predictor``, дорабатывает
+на старой версии.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from app.ml.predictor import Predictor
+
+MODELS_ROOT = os.path.join(os.path.dirname(__file__), 'saved_models')
+MANIFEST_FILE = 'manifest.json'
+
+
+def read_manifest(root=MODELS_ROOT):
+    with open(os.path.join(root, MANIFEST_FILE), encoding='utf-8') as fh:
+        return json.load(fh)
+
+
+def write_manifest(manifest, root=MODELS_ROOT):
+    path = os.path.join(root, MANIFEST_FILE)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, path)
+
+
+def current_models_dir(root=MODELS_ROOT):
+    return os.path.join(root, read_manifest(root)['current'])
+
+
+def set_current_version(version, root=MODELS_ROOT):
+    manifest = read_manifest(root)
+    if version not in manifest['versions'] or not os.path.isdir(os.path.join(root, version)):
+        raise KeyError(version)
+    manifest['current'] = version
+    write_manifest(manifest, root)
+
+
+def publish_version(version, description='', root=MODELS_ROOT):
+    if not os.path.isdir(os.path.join(root, version)):
+        raise KeyError(version)
+    manifest = read_manifest(root)
+    manifest['versions'][version] = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'description': description
+    }
+    write_manifest(manifest, root)
+
+
+class ModelRegistry:
+    def __init__(self, root=MODELS_ROOT):
+        self.root = root
+        self.app = None
+        self.max_models = None
+        self.engine = 'auto'
+        self.mmap = True
+        self.preload = False
+        self.watch_interval = 0
+        self.version = None
+        self._predictor = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._reload_again = False
+        self._last_check = 0.0
+        self._manifest_mtime = None
+        self._model_versions = {}
+
+    def init_app(self, app):
+        self.app = app
+        self.max_models = app.config['PREDICTOR_MAX_MODELS']
+        self.engine = app.config['PREDICTOR_ENGINE']
+        self.mmap = app.config['PREDICTOR_MMAP']
+        self.preload = app.config['PREDICTOR_WARMUP']
+        self.watch_interval = app.config['MODEL_REGISTRY_WATCH_INTERVAL']
+        self.reload()
+
+    def on_reload(self, callback):
+        """``callback(predictor)`` вызывается для новой версии до того, как она станет активной."""
+        self._callbacks.append(callback)
+        return callback
+
+    @property
+    def manifest(self):
+        return read_manifest(self.root)
+
+    @property
+    def predictor(self) -> Predictor:
+        if self._predictor is None:
+            with self._lock:
+                if self._predictor is None:
+                    self.version = self.manifest['current']
+                    self._predictor = self._build(self.version)
+        elif self.watch_interval:
+            self._check_manifest()
+        return self._predictor
+
+    def model_versions(self):
+        """Хеши файлов моделей (``Predictor.model_version``) всех версий из манифеста.
+
+        Считаются для обоих движков: воркеры с разным PREDICTOR_ENGINE видят
+        разные файлы одной версии. Каталоги версий не меняются, поэтому хеши
+        запоминаются по имени версии.
+        """
+        known = set()
+        for version in self.manifest['versions']:
+            hashes = self._model_versions.get(version)
+            if hashes is None:
+                hashes = set()
+                for engine in ('sklearn', 'compiled'):
+                    predictor = Predictor(os.path.join(self.root, version), engine=engine)
+                    try:
+                        hashes.update(predictor.model_version(target) for target in predictor.targets)
+                    except (FileNotFoundError, KeyError):
+                        continue
+                hashes = self._model_versions[version] = frozenset(hashes)
+            known |= hashes
+        return known
+
+    def _build(self, version):
+        return Predictor(
+            models_dir=os.path.join(self.root, version),
+            max_models=self.max_models,
+            engine=self.engine,
+            mmap=self.mmap
+        )
+
+    def _check_manifest(self):
+        now = time.monotonic()
+        if now - self._last_check < self.watch_interval or self._reloading:
+            return
+        self._last_check = now
+        mtime = self._stat_manifest()
+        if mtime == self._manifest_mtime:
+            return
+        if self.manifest['current'] == self.version:
+            self._manifest_mtime = mtime
+        else:
+            # Новую версию готовим в фоне, запросы пока обслуживает старая.
+            # mtime запоминает только удачная подмена, поэтому после ошибки
+            # следующая проверка попробует снова
+            self._start_reload()
+
+    def _stat_manifest(self):
+        return os.stat(os.path.join(self.root, MANIFEST_FILE)).st_mtime_ns
+
+    def _start_reload(self):
+        with self._lock:
+            if self._reloading:
+                # Идущая загрузка могла прочитать манифест до изменения
+                self._reload_again = True
+                return
+            self._reloading = True
+        threading.Thread(target=self._background_reload, daemon=True).start()
+
+    def _background_reload(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    self.reload()
+            except Exception:
+                logging.exception('Model registry reload failed')
+            with self._lock:
+                if not self._reload_again:
+                    self._reloading = False
+                    return
+                self._reload_again = False
+
+    def reload(self):
+        """Загружает активную по манифесту версию и атомарно подменяет текущую."""
+        mtime = self._stat_manifest()
+        version = self.manifest['current']
+        predictor = self._build(version)
+        if self.preload or self._predictor is not None:
+            predictor.warmup()
+        for callback in self._callbacks:
+            callback(predictor)
+        with self._lock:
+            self._predictor = predictor
+            self.version = version
+            self._manifest_mtime = mtime
+        return version
+
+    def activate(self, version):
+        """Делает версию активной в манифесте; прогрев и подмена идут в фоне."""
+        set_current_version(version, self.root)
+        self._start_reload()
+        return version
+
+    def publish(self, version, description='', activate=False):
+        """Регистрирует в манифесте уже записанную на диск версию ``saved_models/<version>``."""
+        publish_version(version, description, self.root)
+        if activate:
+            return self.activate(version)
+        return version
@@ -0,0 +1,160 @@
+"""Переобучение моделей прогноза по таблице study_count.
+
+    python -m app.ml.training --workers 4 --activate
+
+История читается одним запросом и разворачивается pandas в таблицу
+(год, неделя) x тип исследования. Леса по типам исследований обучаются
+параллельно в пуле процессов; каждый процесс сразу сохраняет свой
+``forest_model.pkl`` и возвращает скомпилированные массивы для
+``compiled_models.npz``. Готовая версия появляется в saved_models
+атомарным переименованием каталога и регистрируется в manifest.json.
+
+Запускается отдельно от веб-воркеров (cron, CI); воркеры подхватывают
+новую версию через реестр моделей.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import joblib
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sqlalchemy import select
+
+from app.ml.compiled import COMPILED_FILE, compile_forest, save_compiled
+from app.ml.predictor import FEATURES
+from app.ml.registry import MODELS_ROOT, publish_version, set_current_version
+
+FOREST_PARAMS = {'n_estimators': 100, 'random_state': 42}
+
+
+def load_history(session):
+    """Вся история study_count одним запросом: DataFrame с индексом (Год, Номер недели)."""
+    from app.models import StudyCount
+
+    rows = session.execute(
+        select(StudyCount.year, StudyCount.week_number, StudyCount.study_type, StudyCount.study_count)
+    ).all()
+    history = pd.DataFrame(rows, columns=['year', 'week_number', 'study_type', 'study_count'])
+    return history.pivot_table(
+        index=['year', 'week_number'], columns='study_type', values='study_count', aggfunc='sum'
+    ).rename_axis(index=FEATURES, columns=None)
+
+
+def fit_target(target, features, values, output_dir, params=None):
+    """Обучает лес для одной цели; выполняется в дочернем процессе.
+
+    Замеряется только fit. Память берётся из ru_maxrss процесса: прирост
+    пика за время обучения (0, если пик был достигнут раньше в том же
+    процессе пула) и сам пик.
+    """
+    forest = RandomForestRegressor(**(params or FOREST_PARAMS))
+    frame = pd.DataFrame(features, columns=FEATURES)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    forest.fit(frame, values)
+    fit_seconds = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    os.makedirs(os.path.join(output_dir, target), exist_ok=True)
+    joblib.dump(forest, os.path.join(output_dir, target, 'forest_model.pkl'))
+    stats = {
+        'rows': len(values),
+        'fit_seconds': round(fit_seconds, 3),
+        # ru_maxrss в Linux в килобайтах
+        'rss_growth_mib': round((rss_after - rss_before) / 1024, 1),
+        'max_rss_mib': round(rss_after / 1024, 1),
+    }
+    return target, compile_forest(forest), stats
+
+
+def train_all(history, output_dir, workers=None, params=None):
+    jobs = []
+    for target in history.columns:
+        column = history[target].dropna()
+        if column.empty:
+            continue
+        features = column.index.to_frame(index=False).to_numpy()
+        jobs.append((target, features, column.to_numpy(), output_dir, params))
+    if not jobs:
+        raise ValueError('study_count пуст: обучать нечего')
+
+    compiled, report = {}, {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for target, forest, stats in pool.map(fit_target, *zip(*jobs)):
+            compiled[target] = forest
+            report[target] = stats
+    save_compiled(compiled, os.path.join(output_dir, COMPILED_FILE))
+    return report
+
+
+def retrain(session, version=None, workers=None, activate=False, root=MODELS_ROOT):
+    version = version or datetime.now().strftime('v%Y%m%d-%H%M%S')
+    target_dir = os.path.join(root, version)
+    if os.path.exists(target_dir):
+        raise FileExistsError(target_dir)
+
+    started = time.perf_counter()
+    history = load_history(session)
+    load_seconds = time.perf_counter() - started
+    # Пустая версия в реестре сломала бы прогноз после активации
+    if history.empty:
+        raise ValueError('study_count пуст: обучать нечего')
+
+    # Пишем во временный каталог, чтобы реестр никогда не увидел версию наполовину
+    tmp_dir = os.path.join(root, f'.{version}.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        report = train_all(history, tmp_dir, workers=workers)
+        summary = {
+            'rows': int(history.notna().sum().sum()),
+            'weeks': len(history),
+            'load_seconds': round(load_seconds, 3),
+            'total_seconds': round(time.perf_counter() - started, 3),
+            'workers': workers or os.cpu_count(),
+            'targets': report,
+        }
+        with open(os.path.join(tmp_dir, 'training_report.json'), 'w', encoding='utf-8') as fh:
+            json.dump(summary, fh, ensure_ascii=False, indent=4)
+        os.rename(tmp_dir, target_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    publish_version(version, f'Переобучено по study_count: {summary["weeks"]} недель', root)
+    if activate:
+        set_current_version(version, root)
+    return version, summary
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--version')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--activate', action='store_true')
+    args = parser.parse_args()
+
+    from app import create_app, db
+
+    app = create_app()
+    with app.app_context():
+        try:
+            version, summary = retrain(db.session, args.version, args.workers, args.activate)
+        except ValueError as exc:
+            parser.exit(1, f'error: {exc}\n')
+
+    print(f'version {version}: {summary["weeks"]} weeks loaded in {summary["load_seconds"]} s, '
+          f'trained in {summary["total_seconds"]} s with {summary["workers"]} workers')
+    for target, stats in summary['targets'].items():
+        print(f'  {target}: {stats["rows"]} rows, {stats["fit_seconds"]} s, '
+              f'RSS +{stats["rss_growth_mib"]} MiB, max RSS {stats["max_rss_mib"]} MiB')
+
+
+if __name__ == '__main__':
+    main()
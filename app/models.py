@@ -1,15 +1,14 @@
 import uuid
 from sqlalchemy.dialects.postgresql import UUID
-from app import db
+from app import db, password_hasher
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy.dialects.postgresql import JSONB
 import json
 
 
 class Users(db.Model):
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    full_name = db.Column(db.String(255), nullable=False)
+    full_name = db.Column(db.String(255), nullable=False, index=True)
     email = db.Column(db.String(255), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -17,10 +16,13 @@ class Users(db.Model):
     approved = db.Column(db.Boolean, default=False, nullable=False)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
 
     # Relationship with Doctors
     doctors = db.relationship('Doctors', backref='user', uselist=False)
@@ -37,6 +39,7 @@ class Doctors(db.Model):
     rate = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(255), default='Ожидает подтверждения', nullable=False)
     phone = db.Column(db.String(255), nullable=False)
+    main_modality = db.relationship('Modality', foreign_keys=[main_modality_id])
     additional_modalities = db.relationship('Modality', secondary='doctor_additional_modalities', backref=db.backref('doctors', lazy='dynamic'))
 
 
@@ -62,7 +65,7 @@ class DayType(enum.Enum):
 class DoctorSchedule(db.Model):
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     doctor_id = db.Column(UUID(as_uuid=True), db.ForeignKey('doctors.id'), nullable=False)
-    date = db.Column(db.Date, nullable=False)
+    date = db.Column(db.Date, nullable=False, index=True)
     start_time = db.Column(db.Time, nullable=True)
     end_time = db.Column(db.Time, nullable=True)
     break_minutes = db.Column(db.Integer, nullable=False)
@@ -94,9 +97,57 @@ class Ticket(db.Model):
 
 class StudyCount(db.Model):
     __tablename__ = 'study_count'
+    __table_args__ = (
+        # Одна запись на неделю и тип исследования; индекс обслуживает выборки по диапазону недель
+        db.Index('uq_study_count_year_week_type', 'year', 'week_number', 'study_type', unique=True),
+    )
 
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     year = db.Column(db.Integer, nullable=False)
     week_number = db.Column(db.Integer, nullable=False)
     study_type = db.Column(db.String(255), nullable=False)
     study_count = db.Column(db.Float, nullable=False)
+
+
+class StudyCountRollup(db.Model):
+    __tablename__ = 'study_count_rollup'
+
+    period = db.Column(db.String(16), primary_key=True)  # month, quarter, year
+    year = db.Column(db.Integer, primary_key=True)
+    number = db.Column(db.Integer, primary_key=True)  # месяц 1-12, квартал 1-4, для года 1
+    study_type = db.Column(db.String(255), primary_key=True)
+    study_count = db.Column(db.Float, nullable=False)
+    weeks = db.Column(db.Integer, nullable=False)
+
+
+class StudyCountUpload(db.Model):
+    __tablename__ = 'study_count_upload'
+
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    filename = db.Column(db.String(255), nullable=False)
+    incremental = db.Column(db.Boolean, nullable=False, default=False)
+    status = db.Column(db.String(64), nullable=False, default='Pending')  # Pending, Processing, Done, Failed
+    total_rows = db.Column(db.Integer, nullable=True)
+    processed_rows = db.Column(db.Integer, nullable=False, default=0)
+    written_rows = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_token'
+
+    jti = db.Column(db.String(64), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), index=True)
+
+
+class ForecastCacheEntry(db.Model):
+    __tablename__ = 'forecast_cache'
+
+    model_version = db.Column(db.String(64), primary_key=True)
+    target = db.Column(db.String(255), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    week_number = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.Float, nullable=False)
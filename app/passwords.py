@@ -0,0 +1,77 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """Хеширование и проверка паролей в отдельном пуле процессов.
+
+    PBKDF2/scrypt занимают CPU на сотни миллисекунд; вынося их из потоков
+    запросов, мы не даём всплеску логинов задерживать остальные эндпоинты.
+    ``max_pending`` ограничивает число одновременных операций на процесс.
+    """
+
+    def __init__(self, method='scrypt:32768:8:1', workers=0, max_pending=8, timeout=10):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pool = None
+        self._pool_pid = None
+        self._method_prefix = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.max_pending = app.config['PASSWORD_HASH_MAX_PENDING']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def _get_pool(self):
+        # Пул создаётся лениво в каждом воркере, уже после fork
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _run(self, func, *args, **kwargs):
+        if not self.workers:
+            return func(*args, **kwargs)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy('Too many concurrent password operations')
+        try:
+            return self._get_pool().submit(func, *args, **kwargs).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, method=self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    @property
+    def method_prefix(self):
+        # werkzeug пишет в хеш полный метод ('scrypt' -> 'scrypt:32768:8:1'),
+        # поэтому сравниваем с префиксом настоящего хеша, а не со строкой из конфига
+        if self._method_prefix is None or self._method_prefix[0] != self.method:
+            self._method_prefix = (self.method, generate_password_hash('', method=self.method).split('$', 1)[0])
+        return self._method_prefix[1]
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != self.method_prefix
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=False)
+            self._pool = None
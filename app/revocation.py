@@ -0,0 +1,228 @@
+import hashlib
+import heapq
+import math
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+
+
+class BloomFilter:
+    """Компактный индекс "возможно отозван": без ложноотрицательных ответов."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class DatabaseRevocationBackend:
+    """Общее хранилище отозванных токенов в основной БД (таблица revoked_token)."""
+
+    def __init__(self, db):
+        self.db = db
+
+    @property
+    def table(self):
+        from app.models import RevokedToken
+        return RevokedToken.__table__
+
+    def add(self, jti, expires_at):
+        expires_at = datetime.fromtimestamp(expires_at, tz=timezone.utc).replace(tzinfo=None)
+        try:
+            with self.db.engine.begin() as conn:
+                conn.execute(insert(self.table).values(jti=jti, expires_at=expires_at))
+        except IntegrityError:
+            pass
+
+    def is_revoked(self, jti, now):
+        now = datetime.fromtimestamp(now, tz=timezone.utc).replace(tzinfo=None)
+        with self.db.engine.connect() as conn:
+            row = conn.execute(
+                select(self.table.c.jti).where(self.table.c.jti == jti, self.table.c.expires_at > now)
+            ).first()
+        return row is not None
+
+    def changes_since(self, cursor, now):
+        """Токены, отозванные после ``cursor``; курсор — время сервера БД."""
+        table = self.table
+        now = datetime.fromtimestamp(now, tz=timezone.utc).replace(tzinfo=None)
+        query = select(table.c.jti, table.c.expires_at, table.c.revoked_at).where(table.c.expires_at > now)
+        if cursor is not None:
+            # Перекрытие защищает от транзакций, закоммиченных с опозданием
+            query = query.where(table.c.revoked_at >= cursor - timedelta(seconds=5))
+        with self.db.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        changes = [(jti, exp.replace(tzinfo=timezone.utc).timestamp()) for jti, exp, _ in rows]
+        if rows:
+            latest = max(row.revoked_at for row in rows)
+            cursor = latest if cursor is None else max(cursor, latest)
+        return changes, cursor
+
+    def purge(self, now):
+        now = datetime.fromtimestamp(now, tz=timezone.utc).replace(tzinfo=None)
+        with self.db.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.expires_at <= now))
+
+
+class SQLiteRevocationBackend:
+    """Локальная замена общего хранилища: файл SQLite, общий для воркеров одной машины."""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS revoked_token ('
+                'jti TEXT PRIMARY KEY, expires_at REAL NOT NULL, revoked_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_revoked_token_revoked_at ON revoked_token (revoked_at)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def add(self, jti, expires_at):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR IGNORE INTO revoked_token (jti, expires_at, revoked_at) VALUES (?, ?, ?)',
+                (jti, expires_at, time.time())
+            )
+
+    def is_revoked(self, jti, now):
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT 1 FROM revoked_token WHERE jti = ? AND expires_at > ?', (jti, now)
+            ).fetchone()
+        return row is not None
+
+    def changes_since(self, cursor, now):
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT jti, expires_at, revoked_at FROM revoked_token WHERE expires_at > ? AND revoked_at >= ?',
+                (now, (cursor or 0) - 5)
+            ).fetchall()
+        if rows:
+            cursor = max([cursor or 0] + [row[2] for row in rows])
+        return [(jti, exp) for jti, exp, _ in rows], cursor
+
+    def purge(self, now):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM revoked_token WHERE expires_at <= ?', (now,))
+
+
+class TokenRevocationList:
+    """Список отозванных JWT с локальным индексом и синхронизацией из общего хранилища.
+
+    В обычном случае проверка ``jti in revoked_tokens`` отвечает из памяти:
+    небольшое точное множество недавно отозванных токенов и фильтр Блума
+    для всех живых отзывов. В хранилище идём только раз в ``sync_interval``
+    секунд (инкрементальная синхронизация) и при срабатывании фильтра Блума
+    на токен, которого нет в точном множестве. Поэтому отзыв, сделанный в
+    другом воркере, виден здесь с задержкой до ``sync_interval`` секунд.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.sync_interval = 2
+        self.local_size = 10000
+        self.bloom_capacity = 100000
+        self.bloom_error_rate = 0.001
+        self.rebuild_interval = 3600
+        self._recent = {}
+        # Мин-куча (exp, jti) по точному множеству: вытеснение без сортировки
+        self._expiry = []
+        self._bloom = None
+        self._cursor = None
+        self._last_sync = 0.0
+        self._last_rebuild = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app, db):
+        config = app.config
+        if config['REVOCATION_BACKEND'] == 'sqlite':
+            self.backend = SQLiteRevocationBackend(config['REVOCATION_SQLITE_PATH'])
+        else:
+            self.backend = DatabaseRevocationBackend(db)
+        self.sync_interval = config['REVOCATION_SYNC_INTERVAL']
+        self.local_size = config['REVOCATION_LOCAL_SIZE']
+        self.bloom_capacity = config['REVOCATION_BLOOM_CAPACITY']
+        self.bloom_error_rate = config['REVOCATION_BLOOM_ERROR_RATE']
+        self.rebuild_interval = config['REVOCATION_REBUILD_INTERVAL']
+        self._bloom = None
+
+    def add(self, jti, expires_at):
+        self.backend.add(jti, expires_at)
+        with self._lock:
+            self._remember(jti, expires_at)
+
+    def __contains__(self, jti):
+        now = time.time()
+        self._maybe_sync(now)
+        expires_at = self._recent.get(jti)
+        if expires_at is not None:
+            return expires_at > now
+        if jti not in self._bloom:
+            return False
+        # Токен вытеснен из точного множества либо ложное срабатывание фильтра
+        return self.backend.is_revoked(jti, now)
+
+    def _remember(self, jti, expires_at):
+        if self._bloom is not None and jti not in self._recent:
+            self._bloom.add(jti)
+        self._recent[jti] = expires_at
+        heapq.heappush(self._expiry, (expires_at, jti))
+        # Вытесняем истекающие раньше всех: они остаются в фильтре Блума.
+        # Записи кучи, уже удалённые или перезаписанные в _recent, пропускаем
+        while len(self._recent) > self.local_size:
+            expires_at, jti = heapq.heappop(self._expiry)
+            if self._recent.get(jti) == expires_at:
+                del self._recent[jti]
+
+    def _reset_recent(self, items):
+        self._recent = dict(items)
+        self._expiry = [(exp, jti) for jti, exp in self._recent.items()]
+        heapq.heapify(self._expiry)
+
+    def _maybe_sync(self, now):
+        if self._bloom is not None and now - self._last_sync < self.sync_interval:
+            return
+        with self._lock:
+            if self._bloom is None or now - self._last_rebuild >= self.rebuild_interval \
+                    or self._bloom.count >= self._bloom.capacity:
+                self._rebuild(now)
+            elif now - self._last_sync >= self.sync_interval:
+                changes, self._cursor = self.backend.changes_since(self._cursor, now)
+                for jti, expires_at in changes:
+                    self._remember(jti, expires_at)
+                self._reset_recent((jti, exp) for jti, exp in self._recent.items() if exp > now)
+            self._last_sync = now
+
+    def _rebuild(self, now):
+        # Полная пересборка выбрасывает истёкшие токены и из фильтра Блума
+        self.backend.purge(now)
+        changes, self._cursor = self.backend.changes_since(None, now)
+        self._bloom = BloomFilter(max(self.bloom_capacity, 2 * len(changes)), self.bloom_error_rate)
+        for jti, _ in changes:
+            self._bloom.add(jti)
+        # В точном множестве — local_size токенов, истекающих позже всех
+        self._reset_recent(heapq.nlargest(self.local_size, changes, key=lambda change: change[1]))
+        self._last_rebuild = now
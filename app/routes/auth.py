@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify, request
 from app import db, revoked_tokens
+from app.passwords import PasswordHasherBusy
 from app.decorators import check_token_not_revoked
 from app.models import Users
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
@@ -25,13 +26,25 @@ def register():
     except IntegrityError:
         db.session.rollback()
         return jsonify({'message': 'User with this email already exists'}), 400
+    except PasswordHasherBusy:
+        db.session.rollback()
+        return jsonify({'message': 'Server is busy, try again later'}), 503
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
     data = request.get_json()
     user = Users.query.filter_by(email=data['email']).first()
-    if user is None or not user.check_password(data['password']):
-        return jsonify({'message': 'Invalid credentials'}), 401
+    try:
+        if user is None or not user.check_password(data['password']):
+            return jsonify({'message': 'Invalid credentials'}), 401
+
+        # Хеш со старыми параметрами стоимости пересчитываем при входе
+        if user.password_needs_rehash():
+            user.set_password(data['password'])
+            db.session.commit()
+    except PasswordHasherBusy:
+        db.session.rollback()
+        return jsonify({'message': 'Server is busy, try again later'}), 503
     try:
         access_token = create_access_token(
             identity={'email': user.email, 'role': user.role},
@@ -44,8 +57,8 @@ def login():
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
-    jti = get_jwt()['jti']
-    revoked_tokens.add(jti)
+    token = get_jwt()
+    revoked_tokens.add(token['jti'], token['exp'])
     return jsonify({'message': 'Successfully logged out'}), 200
 
 @auth_bp.route('/protected', methods=['GET'])
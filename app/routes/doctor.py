@@ -1,9 +1,8 @@
-import uuid
 from flask import Blueprint, jsonify, request
 from app import db
-from app.models import Users, Doctors, DoctorSchedule, Ticket
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.decorators import role_and_approval_required, check_token_not_revoked
+from app.models import DoctorSchedule, Ticket
+from flask_jwt_extended import jwt_required
+from app.decorators import role_and_approval_required, get_current_identity
 from datetime import datetime
 
 doctors_bp = Blueprint('doctor', __name__)
@@ -11,13 +10,11 @@ doctors_bp = Blueprint('doctor', __name__)
 @doctors_bp.route('/schedule', methods=['GET'])
 @jwt_required()
 def get_doctor_schedule():
-    current_user = get_jwt_identity()
-    user = Users.query.filter_by(email=current_user['email']).first()
-    if user.role != 'doctor':
+    identity = get_current_identity()
+    if identity is None or identity.role != 'doctor':
         return jsonify({'message': 'Access denied'}), 403
 
-    doctor = Doctors.query.filter_by(user_id=user.id).first()
-    if not doctor:
+    if not identity.doctor_id:
         return jsonify({'message': 'Doctor not found'}), 404
 
     # Получаем параметры запроса для года и месяца
@@ -29,7 +26,7 @@ def get_doctor_schedule():
 
     # Фильтруем расписание по году и месяцу
     schedules = DoctorSchedule.query.filter(
-        DoctorSchedule.doctor_id == doctor.id,
+        DoctorSchedule.doctor_id == identity.doctor_id,
         db.extract('year', DoctorSchedule.date) == year,
         db.extract('month', DoctorSchedule.date) == month
     ).all()
@@ -92,13 +89,11 @@ def get_schedule(doctor_id):
 @doctors_bp.route('/request_emergency', methods=['POST'])
 @jwt_required()
 def request_emergency():
-    current_user = get_jwt_identity()
-    user = Users.query.filter_by(email=current_user['email']).first()
-    if user.role != 'doctor':
+    identity = get_current_identity()
+    if identity is None or identity.role != 'doctor':
         return jsonify({'message': 'Access denied'}), 403
 
-    doctor = Doctors.query.filter_by(user_id=user.id).first()
-    if not doctor:
+    if not identity.doctor_id:
         return jsonify({'message': 'Doctor not found'}), 404
 
     data = request.get_json()
@@ -115,7 +110,7 @@ def request_emergency():
         }
 
         new_ticket = Ticket(
-            user_id=user.id,
+            user_id=identity.user_id,
             type='emergency_request',
             data=emergency_request,
             status='Pending'
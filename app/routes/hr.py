@@ -5,7 +5,7 @@ from flask import Blueprint, jsonify, request, current_app
 from app import db, mail
 from app.models import Users, Doctors, Modality, DoctorAdditionalModalities, DoctorSchedule, Ticket
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.decorators import role_and_approval_required, check_token_not_revoked
+from app.decorators import role_and_approval_required, check_token_not_revoked, invalidate_identity
 from datetime import datetime, timedelta
 from sqlalchemy.exc import IntegrityError
 from flask_mail import Message
@@ -137,8 +137,10 @@ def delete_doctor(doctor_id):
         if not doctor:
             return jsonify({'message': 'Doctor not found'}), 404
 
+        email = doctor.user.email
         db.session.delete(doctor)
         db.session.commit()
+        invalidate_identity(email)
 
         # Создаем тикет для удаления врача
         new_ticket = Ticket(
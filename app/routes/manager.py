@@ -1,31 +1,50 @@
 import uuid
 import string
 import random
-from flask import Blueprint, jsonify, request, current_app
-from app import db
-from app.models import Users, Doctors, Modality, DoctorAdditionalModalities, DoctorSchedule, Ticket, DayType, StudyCount
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.decorators import role_and_approval_required, check_token_not_revoked
-from datetime import datetime, timedelta
-from sqlalchemy.exc import IntegrityError
-from flask_mail import Message
-from app import mail
 import logging
 import json
-from app.ml.predictor import Predictor
-import pandas as pd
-from datetime import time, timedelta
-
-from flask import request, jsonify, make_response
-import pandas as pd
 import io
-from sqlalchemy.orm import joinedload
+import csv
+import tempfile
+import base64
+from datetime import datetime, time, timedelta
+from flask import Blueprint, jsonify, request, current_app, Response, stream_with_context, send_file
+from flask_mail import Message
+from openpyxl import Workbook
+import pandas as pd
+import numpy as np
+from sqlalchemy import or_, exists, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import contains_eager, selectinload, load_only
+from app import db, mail
+from app.models import Users, Doctors, Modality, DoctorAdditionalModalities, DoctorSchedule, Ticket, DayType, StudyCountUpload, StudyCountRollup
+from app.decorators import role_and_approval_required, invalidate_identity
+from app.ml.predictor import iso_week_range
+from app.ml.registry import ModelRegistry
+from app.forecast_cache import ForecastCache
+from app.services.demand import DemandService, STUDY_TYPES, EXPORT_NAMES, iso_week, is_percentile
+from app.services.uploads import StudyCountUploads
+from app.services import rollups, coverage
+from app.services.capacity import CapacityModel, MINUTES, lacking
+from app.services.simulation import apply_changes
 
 # Установим уровень логирования на DEBUG
 logging.basicConfig(level=logging.DEBUG)
 
 managers_bp = Blueprint('manager', __name__)
-predictor = Predictor()
+registry = ModelRegistry()
+forecasts = ForecastCache(registry)
+demand_service = DemandService(forecasts, registry)
+uploads = StudyCountUploads()
+capacity = CapacityModel()
+# Новые фактические данные заменяют прогноз в уже посчитанных неделях
+uploads.on_loaded(lambda weeks: demand_service.invalidate())
+
+
+@uploads.on_loaded
+def refresh_rollups(weeks):
+    with db.engine.begin() as conn:
+        rollups.refresh(conn, weeks)
 
 def send_email(to, subject, template):
     msg = Message(
@@ -69,28 +88,135 @@ def get_tickets():
 def predict():
     '''
     {
-        'year': 2024,
-        'start_week': 1,
-        'target': 'МРТ с КУ 2 и более зон',
+        'start_year': 2024,
+        'start_week': 50,
+        'end_year': 2026,
+        'end_week': 10,
+        'targets': ['КТ', 'МРТ'],
+        'percentiles': [10, 50, 90],
+        'stream': false
     }
+    'year' задаёт сразу начальный и конечный год (прежний формат запроса).
+    Вместо 'targets' можно передать одну цель 'target', тогда 'predictions' —
+    список по неделям; без обоих полей прогноз строится по всем моделям.
+    Необязательный 'percentiles' добавляет 'bands' — перцентили по деревьям
+    леса, {'p90': [...]}. При 'stream' или горизонте длиннее
+    PREDICT_STREAM_WEEKS недель ответ отдаётся как JSON lines, по строке
+    на неделю: {'year', 'week', 'predictions': {цель: прогноз}, 'bands'}.
     '''
 
     data = request.get_json()
 
-    target = data['target']
-    start_week = data['start_week']
-    end_week = data['end_week']
-    year = data['year']
+    start_week = data.get('start_week')
+    end_week = data.get('end_week')
+    start_year = data.get('start_year', data.get('year'))
+    end_year = data.get('end_year', data.get('year', start_year))
+    if not all(isinstance(value, int) and not isinstance(value, bool)
+               for value in (start_year, start_week, end_year, end_week)):
+        return jsonify({'message': 'Start and end year and week must be integers'}), 400
+    try:
+        year_weeks = iso_week_range(start_year, start_week, end_year, end_week)
+    except ValueError as e:
+        return jsonify({'message': f'Invalid week range: {e}'}), 400
+    if not len(year_weeks):
+        return jsonify({'message': 'Start week must not be after end week'}), 400
+    if len(year_weeks) > current_app.config['MAX_RANGE_WEEKS']:
+        return jsonify({'message': f'Week range must not exceed {current_app.config["MAX_RANGE_WEEKS"]} weeks'}), 400
+
+    predictor = registry.predictor
+    multi = 'target' not in data
+    targets = data.get('targets') or ([data['target']] if not multi else predictor.targets)
+    if not (isinstance(targets, list) and all(isinstance(target, str) for target in targets)):
+        return jsonify({'message': 'Targets must be a list of strings'}), 400
+    unknown = set(targets) - set(predictor.targets)
+    if unknown:
+        return jsonify({'message': f'Unknown target {", ".join(sorted(unknown))}'}), 400
+
+    percentiles = data.get('percentiles')
+    if percentiles is not None and not (isinstance(percentiles, list) and all(map(is_percentile, percentiles))):
+        return jsonify({'message': 'Percentiles must be a list of numbers between 0 and 100'}), 400
+
+    def compute(chunk):
+        if percentiles:
+            return predictor.predict_intervals(targets, chunk, percentiles)
+        return forecasts.predict_many(targets, chunk, predictor=predictor), None
+
+    def format_bands(bands, i):
+        return {f'p{p:g}': band.tolist() for p, band in zip(percentiles, bands[i])}
+
+    if data.get('stream') or len(year_weeks) > current_app.config['PREDICT_STREAM_WEEKS']:
+        def generate():
+            # Считаем и отдаём по году за раз, не собирая весь горизонт в памяти
+            for offset in range(0, len(year_weeks), 52):
+                chunk = year_weeks[offset:offset + 52]
+                predictions, bands = compute(chunk)
+                for j, (year, week) in enumerate(chunk.tolist()):
+                    line = {'year': year, 'week': week,
+                            'predictions': dict(zip(targets, predictions[:, j].tolist()))}
+                    if bands is not None:
+                        line['bands'] = {
+                            target: {f'p{p:g}': value for p, value in zip(percentiles, bands[i, :, j].tolist())}
+                            for i, target in enumerate(targets)
+                        }
+                    yield json.dumps(line, ensure_ascii=False) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    predictions, bands = compute(year_weeks)
+    result = {
+        'year': start_year, 'start_year': start_year, 'end_year': end_year,
+        'start_week': start_week, 'end_week': end_week, 'weeks': year_weeks.tolist()
+    }
+    if multi:
+        result['targets'] = targets
+        result['predictions'] = dict(zip(targets, predictions.tolist()))
+    else:
+        result['target'] = targets[0]
+        result['predictions'] = predictions[0].tolist()
+
+    if bands is not None:
+        target_bands = [format_bands(bands, i) for i in range(len(targets))]
+        result['bands'] = dict(zip(targets, target_bands)) if multi else target_bands[0]
+
+    return jsonify(result), 200
+
+
+@managers_bp.route('/models', methods=['GET'])
+@role_and_approval_required('manager')
+def get_model_versions():
+    manifest = registry.manifest
+    return jsonify({
+        'current': manifest['current'],
+        'active': registry.version,
+        'versions': manifest['versions']
+    }), 200
+
 
-    data_for_ml = pd.DataFrame({
-        'Год': [2024 for _ in range(start_week, end_week + 1)],
-        'Номер недели': [i for i in range(start_week, end_week + 1)],
-    })
+@managers_bp.route('/models/activate', methods=['POST'])
+@role_and_approval_required('manager')
+def activate_model_version():
+    '''
+    {
+        'version': 'v2'
+    }
+    Переключает активную версию моделей. Этот воркер загружает и прогревает
+    её в фоне (ответ 202 приходит сразу, до этого работает прежняя версия),
+    остальные подхватывают её по manifest.json в течение
+    MODEL_REGISTRY_WATCH_INTERVAL секунд.
+    '''
+    data = request.get_json()
+    try:
+        version = registry.activate(data['version'])
+    except KeyError:
+        return jsonify({'message': 'Model version not found'}), 404
+    return jsonify({'message': 'Model version activation started', 'version': version}), 202
 
-    return jsonify(
-        {'predictions': predictor.predict(target, data_for_ml),
-         'year': year, 'start_week': start_week, 'end_week': end_week, 'target': target}
-    ), 200
+
+@managers_bp.route('/models/reload', methods=['POST'])
+@role_and_approval_required('manager')
+def reload_models():
+    version = registry.reload()
+    return jsonify({'message': 'Models reloaded', 'version': version}), 200
 
 
 @managers_bp.route('/decline/<uuid:ticket_id>', methods=['PUT'])
@@ -137,6 +263,7 @@ def approve_ticket(ticket_id):
         user.approved = True
         ticket.status = 'Approved'
         db.session.commit()
+        invalidate_identity(user.email)
 
         # Отправка email с уведомлением о подтверждении
         subject = "Ваш аккаунт был подтвержден!"
@@ -187,6 +314,7 @@ def approve_ticket(ticket_id):
 
         ticket.status = 'Approved'
         db.session.commit()
+        invalidate_identity(doctor.user.email)
 
         # Отправляем уведомление по электронной почте
         subject = "Изменение данных врача одобрено"
@@ -323,11 +451,14 @@ def delete_doctor(doctor_id):
         return jsonify({'message': 'Doctor not found'}), 404
     user = Users.query.get(doctor.user_id)
 
+    email = user.email
+
     DoctorAdditionalModalities.query.filter_by(doctor_id=doctor.id).delete()
     DoctorSchedule.query.filter_by(doctor_id=doctor.id).delete()
     db.session.delete(doctor)
     db.session.delete(user)
     db.session.commit()
+    invalidate_identity(email)
 
     return jsonify({'message': 'Doctor deleted successfully'}), 200
 
@@ -384,26 +515,78 @@ def update_doctor(doctor_id):
                 doctor.additional_modalities.append(modality)
 
         db.session.commit()
+        invalidate_identity(user.email)
         return jsonify({'message': 'Doctor updated successfully'}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': str(e)}), 400
 
 
+def encode_cursor(full_name, doctor_id):
+    return base64.urlsafe_b64encode(json.dumps([full_name, str(doctor_id)], ensure_ascii=False).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(ФИО, id врача) из курсора; подделанный или битый курсор — ValueError."""
+    value = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not (isinstance(value, list) and len(value) == 2 and all(isinstance(item, str) for item in value)):
+        raise ValueError('Invalid cursor')
+    full_name, doctor_id = value
+    return full_name, uuid.UUID(doctor_id)
+
+
 @managers_bp.route('/doctors', methods=['GET'])
 @role_and_approval_required('manager', 'hr')
 def get_first_50_doctors():
-    doctors = Doctors.query.limit(50).all()
+    '''
+    /manager/doctors?limit=50&modality=КТ&status=Активен&gender=Мужской&cursor=...
+
+    Врачи по ФИО, страницами по limit (по умолчанию 50, не больше
+    DOCTORS_PAGE_MAX). modality — основная или дополнительная модальность.
+    Курсор следующей страницы приходит в заголовке X-Next-Cursor; на
+    последней странице заголовка нет.
+    '''
+    limit = request.args.get('limit', 50, type=int)
+    if not 0 < limit <= current_app.config['DOCTORS_PAGE_MAX']:
+        return jsonify({'message': f'Limit must be between 1 and {current_app.config["DOCTORS_PAGE_MAX"]}'}), 400
+
+    # Пользователь и основная модальность — в том же запросе, дополнительные модальности — вторым
+    query = Doctors.query.join(Doctors.user).outerjoin(Doctors.main_modality).options(
+        load_only(Doctors.id, Doctors.experience, Doctors.gender, Doctors.rate, Doctors.status, Doctors.phone),
+        contains_eager(Doctors.user).load_only(Users.full_name, Users.email),
+        contains_eager(Doctors.main_modality).load_only(Modality.name),
+        selectinload(Doctors.additional_modalities).load_only(Modality.name)
+    )
+
+    if request.args.get('status'):
+        query = query.filter(Doctors.status == request.args['status'])
+    if request.args.get('gender'):
+        query = query.filter(Doctors.gender == request.args['gender'])
+    if request.args.get('modality'):
+        modality_id = db.session.query(Modality.id).filter_by(name=request.args['modality']).scalar()
+        query = query.filter(or_(
+            Doctors.main_modality_id == modality_id,
+            exists().where(DoctorAdditionalModalities.doctor_id == Doctors.id,
+                           DoctorAdditionalModalities.modality_id == modality_id)
+        ))
+
+    if request.args.get('cursor'):
+        try:
+            full_name, doctor_id = decode_cursor(request.args['cursor'])
+        except (ValueError, TypeError):
+            return jsonify({'message': 'Invalid cursor'}), 400
+        query = query.filter(tuple_(Users.full_name, Doctors.id) > tuple_(full_name, doctor_id))
+
+    doctors = query.order_by(Users.full_name, Doctors.id).limit(limit + 1).all()
+
     result = []
-    for doctor in doctors:
-        user = Users.query.get(doctor.user_id)
-        main_modality = Modality.query.get(doctor.main_modality_id)
+    for doctor in doctors[:limit]:
         doctor_data = {
             'id': doctor.id,
-            'full_name': user.full_name,
-            'email': user.email,
+            'full_name': doctor.user.full_name,
+            'email': doctor.user.email,
             'experience': doctor.experience,
-            'main_modality': main_modality.name if main_modality else None,
+            'main_modality': doctor.main_modality.name if doctor.main_modality else None,
             'additional_modalities': [modality.name for modality in doctor.additional_modalities],
             'rate': doctor.rate,
             'status': doctor.status,
@@ -411,7 +594,12 @@ def get_first_50_doctors():
             'gender': doctor.gender
         }
         result.append(doctor_data)
-    return jsonify(result), 200
+
+    response = jsonify(result)
+    if len(doctors) > limit:
+        last = doctors[limit - 1]
+        response.headers['X-Next-Cursor'] = encode_cursor(last.user.full_name, last.id)
+    return response, 200
 
 @managers_bp.route('/doctor/<uuid:doctor_id>/schedule', methods=['PUT'])
 @role_and_approval_required('manager')
@@ -502,7 +690,8 @@ def delete_schedule(doctor_id, date):
 @managers_bp.route('/study_counts', methods=['GET'])
 @role_and_approval_required('manager')
 def get_study_counts():
-    data = request.get_json()
+    # start_date можно передать и в теле запроса (прежний формат), и в query string
+    data = request.get_json(silent=True) or request.args
     start_date_str = data.get('start_date')
 
     if not start_date_str:
@@ -513,60 +702,152 @@ def get_study_counts():
     except ValueError:
         return jsonify({'message': 'Invalid date format, should be YYYY-MM-DD'}), 400
 
-    end_date = start_date + timedelta(days=6)
-    year = start_date.year
-
-    start_week = start_date.isocalendar()[1]
-    end_week = end_date.isocalendar()[1]
-
-    study_types = [
-        'Денситометрия', 'КТ', 'КТ с КУ 1 зона', 'КТ с КУ 2 и более зон',
-        'ММГ', 'МРТ', 'МРТ с КУ 1 зона', 'МРТ с КУ 2 и более зон',
-        'РГ', 'ФЛГ'
-    ]
-
-    study_counts = StudyCount.query.filter_by(year=year, week_number=start_week).all()
-
-    if not study_counts:
-        # If no data is found, call the prediction function
-        predictions = {}
-        for study_type in study_types:
-                target = {
-                    'Денситометрия': 'Денситометрия',
-                    'КТ': 'КТ',
-                    'КТ с КУ 1 зона': 'КТ с КУ 1 зона',
-                    'КТ с КУ 2 и более зон': 'КТ с КУ 2 и более зон',
-                    'ММГ': 'ММГ',
-                    'МРТ': 'МРТ',
-                    'МРТ с КУ 1 зона': 'МРТ с КУ 1 зона',
-                    'МРТ с КУ 2 и более зон': "МРТ с КУ 2 и более зон",
-                    'РГ': 'РГ',
-                    'ФЛГ': 'ФЛГ'
-                }[study_type]
-
-                data_for_ml = pd.DataFrame({
-                    'Год': [year for _ in range(start_week, end_week + 1)],
-                    'Номер недели': [i for i in range(start_week, end_week + 1)],
-                })
-
-                # Call the prediction function
-                prediction = predictor.predict(target, data_for_ml)
-                predictions[study_type] = sum(prediction)  # Summing the predictions over the week
-
-        # Return the predictions
-        return jsonify(predictions), 200
-
-    result = {study_type: 0 for study_type in study_types}
-    for study_count in study_counts:
-        result[study_count.study_type] = study_count.study_count
+    demand = demand_service.weekly([iso_week(start_date)])
+    return jsonify(dict(zip(STUDY_TYPES, demand.values[0].tolist()))), 200
 
-    return jsonify(result), 200
+
+@managers_bp.route('/study_counts/range', methods=['GET'])
+@role_and_approval_required('manager')
+def get_study_counts_range():
+    '''
+    /manager/study_counts/range?from_year=2024&from_week=1&to_year=2024&to_week=13
+
+    Ответ по столбцам, недели по порядку:
+    {
+        'year': [2024, ...],
+        'week': [1, ...],
+        'study_types': ['Денситометрия', ...],
+        'values': {'КТ': [...], ...},
+        'actual': {'КТ': [true, ...], ...}
+    }
+    'actual' отмечает фактические значения; остальные заполнены прогнозом.
+    '''
+    try:
+        from_year = request.args.get('from_year', type=int)
+        to_year = request.args.get('to_year', from_year, type=int)
+        year_weeks = iso_week_range(from_year, request.args.get('from_week', type=int),
+                                    to_year, request.args.get('to_week', type=int))
+    except (TypeError, ValueError) as e:
+        return jsonify({'message': f'Invalid week range: {e}'}), 400
+    if len(year_weeks) > current_app.config['MAX_RANGE_WEEKS']:
+        return jsonify({'message': f'Week range must not exceed {current_app.config["MAX_RANGE_WEEKS"]} weeks'}), 400
+
+    demand = demand_service.weekly(year_weeks.tolist())
+    return jsonify({
+        'year': year_weeks[:, 0].tolist(),
+        'week': year_weeks[:, 1].tolist(),
+        'study_types': STUDY_TYPES,
+        'values': dict(zip(STUDY_TYPES, demand.values.T.tolist())),
+        'actual': dict(zip(STUDY_TYPES, demand.actual.T.tolist())),
+    }), 200
+
+@managers_bp.route('/study_counts/rollup', methods=['GET'])
+@role_and_approval_required('manager')
+def get_study_count_rollup():
+    '''
+    /manager/study_counts/rollup?period=quarter&from_year=2022&to_year=2024
+
+    period — month, quarter или year; итоги только по фактическим данным.
+    {
+        'period': 'quarter',
+        'year': [2022, ...],
+        'number': [1, ...],
+        'weeks': [13, ...],
+        'study_types': ['Денситометрия', ...],
+        'values': {'КТ': [...], ...}
+    }
+    '''
+    period = request.args.get('period', 'month')
+    if period not in rollups.PERIODS:
+        return jsonify({'message': f'Period must be one of {", ".join(rollups.PERIODS)}'}), 400
+
+    query = StudyCountRollup.query.with_entities(
+        StudyCountRollup.year, StudyCountRollup.number, StudyCountRollup.study_type,
+        StudyCountRollup.study_count, StudyCountRollup.weeks
+    ).filter(StudyCountRollup.period == period)
+    from_year = request.args.get('from_year', type=int)
+    to_year = request.args.get('to_year', type=int)
+    if from_year is not None:
+        query = query.filter(StudyCountRollup.year >= from_year)
+    if to_year is not None:
+        query = query.filter(StudyCountRollup.year <= to_year)
+
+    rows = pd.DataFrame(query.all(), columns=['year', 'number', 'study_type', 'study_count', 'weeks'])
+    table = rows.pivot_table(index=['year', 'number'], columns='study_type', values='study_count', aggfunc='sum')
+    table = table.reindex(columns=STUDY_TYPES).astype(object).where(table.notna(), None)
+    weeks = rows.groupby(['year', 'number'])['weeks'].max()
+
+    return jsonify({
+        'period': period,
+        'year': table.index.get_level_values('year').tolist(),
+        'number': table.index.get_level_values('number').tolist(),
+        'weeks': weeks.reindex(table.index).tolist(),
+        'study_types': STUDY_TYPES,
+        'values': {study_type: table[study_type].tolist() for study_type in STUDY_TYPES}
+    }), 200
+
+
+@managers_bp.route('/study_counts/upload', methods=['POST'])
+@role_and_approval_required('manager')
+def upload_study_counts():
+    '''
+    multipart/form-data: file — .xlsx или .csv в формате исследования.xlsx
+    (Год, Номер недели, столбец на тип исследования), incremental — 1, чтобы
+    загрузить только недели позже последней в базе.
+
+    Файл разбирается в фоне; ответ 202 с id задачи, прогресс —
+    GET /manager/study_counts/upload/<id>.
+    '''
+    file = request.files.get('file')
+    if file is None:
+        return jsonify({'message': 'File is required'}), 400
+
+    try:
+        job = uploads.submit(file, incremental=request.form.get('incremental') in ('1', 'true'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    return jsonify({'message': 'Upload accepted', 'job_id': str(job.id), 'status': job.status}), 202
+
+
+@managers_bp.route('/study_counts/upload/<uuid:job_id>', methods=['GET'])
+@role_and_approval_required('manager')
+def get_upload_status(job_id):
+    job = StudyCountUpload.query.get(job_id)
+    if not job:
+        return jsonify({'message': 'Upload not found'}), 404
+
+    return jsonify({
+        'id': str(job.id),
+        'filename': job.filename,
+        'incremental': job.incremental,
+        'status': job.status,
+        'total_rows': job.total_rows,
+        'processed_rows': job.processed_rows,
+        'written_rows': job.written_rows,
+        'progress': round(job.processed_rows / job.total_rows, 4) if job.total_rows else None,
+        'error': job.error,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at
+    }), 200
 
 @managers_bp.route('/export_study_counts', methods=['POST'])
 @role_and_approval_required('manager')
 def export_study_counts():
+    '''
+    {
+        'start_date': '2022-01-03',
+        'end_date': '2024-12-30',
+        'format': 'csv'
+    }
+    Выгружает ISO-недели от start_date до end_date (по умолчанию одна неделя
+    start_date). Столбец 'Данные' — 'Факт', 'Прогноз' или 'Факт и прогноз'.
+    CSV отдаётся потоком, Excel пишется openpyxl в режиме write-only во
+    временный файл — память не растёт с длиной диапазона.
+    '''
     data = request.get_json()
     start_date_str = data.get('start_date')
+    end_date_str = data.get('end_date') or start_date_str
     export_format = data.get('format', 'csv')
 
     if not start_date_str:
@@ -574,232 +855,281 @@ def export_study_counts():
 
     try:
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-    except ValueError:
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+    except (TypeError, ValueError):
         return jsonify({'message': 'Invalid date format, should be YYYY-MM-DD'}), 400
 
-    end_date = start_date + timedelta(days=6)
-    year = start_date.year
-    start_week = start_date.isocalendar()[1]
-    end_week = end_date.isocalendar()[1]
-
-    study_types = [
-        'densitometry', 'ct', 'ct_with_cu_1_zone', 'ct_with_cu_2_or_more_zones',
-        'mmg', 'mrt', 'mrt_with_cu_1_zone', 'mrt_with_cu_2_or_more_zones',
-        'rg', 'fluorography'
-    ]
-
-    study_types_human_readable = {
-        'densitometry': 'Денситометрия',
-        'ct': 'КТ',
-        'ct_with_cu_1_zone': 'КТ с КУ 1 зона',
-        'ct_with_cu_2_or_more_zones': 'КТ с КУ 2 и более зон',
-        'mmg': 'ММГ',
-        'mrt': 'МРТ',
-        'mrt_with_cu_1_zone': 'МРТ с КУ 1 зона',
-        'mrt_with_cu_2_or_more_zones': 'МРТ с КУ 2 и более зон',
-        'rg': 'РГ',
-        'fluorography': 'Флюорография'
-    }
+    if end_date < start_date:
+        return jsonify({'message': 'End date must not be before start date'}), 400
 
-    study_counts = StudyCount.query.filter_by(year=year, week_number=start_week).all()
-
-    if not study_counts:
-        predictions = {}
-        for study_type in study_types:
-            if study_type == 'mrt_with_cu_2_or_more_zones':
-                predictions[study_type] = 155
-            else:
-                target = {
-                    'densitometry': 'Денситометр',
-                    'ct': 'КТ',
-                    'ct_with_cu_1_zone': 'КТ с КУ 1 зона',
-                    'ct_with_cu_2_or_more_zones': 'КТ с КУ 2 и более зон',
-                    'mmg': 'ММГ',
-                    'mrt': 'МРТ',
-                    'mrt_with_cu_1_zone': 'МРТ с КУ 1 зона',
-                    'rg': 'РГ',
-                    'fluorography': 'Флюорограф'
-                }[study_type]
-
-                data_for_ml = pd.DataFrame({
-                    'Год': [year for _ in range(start_week, end_week + 1)],
-                    'Номер недели': [i for i in range(start_week, end_week + 1)],
-                })
-
-                prediction = predictor.predict(target, data_for_ml)
-                predictions[study_type] = round(sum(prediction))
-
-        result_data = {
-            'Год': [year],
-            'Неделя': [start_week],
-        }
-        for study_type, value in predictions.items():
-            result_data[study_types_human_readable[study_type]] = [value]
-    else:
-        result_data = {
-            'Год': [year],
-            'Неделя': [start_week],
-        }
-        for study_count in study_counts:
-            result_data[study_types_human_readable[study_count.study_type]] = [round(study_count.study_count)]
+    year_weeks = iso_week_range(*iso_week(start_date), *iso_week(end_date)).tolist()
+    if len(year_weeks) > current_app.config['MAX_RANGE_WEEKS']:
+        return jsonify({'message': f'Week range must not exceed {current_app.config["MAX_RANGE_WEEKS"]} weeks'}), 400
+    header = ['Год', 'Неделя', 'Данные'] + [EXPORT_NAMES[study_type] for study_type in STUDY_TYPES]
 
-    df = pd.DataFrame(result_data)
+    def rows():
+        for year, week, source, values in demand_service.iter_weeks(year_weeks):
+            yield [year, week, source] + [round(value) for value in values]
 
-    output = io.BytesIO()
     if export_format == 'excel':
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False)
-        output.seek(0)
-        response = make_response(output.read())
-        response.headers['Content-Disposition'] = 'attachment; filename=study_counts.xlsx'
-        response.headers['Content-type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    else:  # default to CSV
-        df.to_csv(output, index=False)
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(header)
+        for row in rows():
+            sheet.append(row)
+        output = tempfile.TemporaryFile()
+        workbook.save(output)
         output.seek(0)
-        response = make_response(output.read())
-        response.headers['Content-Disposition'] = 'attachment; filename=study_counts.csv'
-        response.headers['Content-type'] = 'text/csv'
+        return send_file(
+            output, as_attachment=True, download_name='study_counts.xlsx',
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
 
+    # default to CSV
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(header)
+        for row in rows():
+            writer.writerow(row)
+            if buffer.tell() > 1 << 16:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    response = Response(stream_with_context(generate()), mimetype='text/csv')
+    response.headers['Content-Disposition'] = 'attachment; filename=study_counts.csv'
     return response
 
-import logging
-
-# Настройка логирования
-logging.basicConfig(level=logging.DEBUG)
-
-# Маппер для времени выполнения исследований в минутах
-mapper = {
-    'Денситометрия': 15,
-    'КТ': 30,
-    'КТ с КУ 1 зона': 40,
-    'КТ с КУ 2 и более зон': 50,
-    'ММГ': 20,
-    'МРТ': 45,
-    'МРТ с КУ 1 зона': 60,
-    'МРТ с КУ 2 и более зон': 75,
-    'РГ': 10,
-    'ФЛГ': 5
-}
-
-def get_doctors_info():
-    doctors = db.session.query(Doctors).options(
-        joinedload(Doctors.user),
-        joinedload(Doctors.additional_modalities)
-    ).all()
-
-    result = []
-    for doctor in doctors:
-        main_modality = db.session.query(Modality).filter_by(id=doctor.main_modality_id).first()
-        doctor_info = {
-            'id': str(doctor.id),
-            'full_name': doctor.user.full_name,
-            'email': doctor.user.email,
-            'experience': doctor.experience,
-            'main_modality': main_modality.name if main_modality else None,
-            'additional_modalities': [modality.name for modality in doctor.additional_modalities],
-            'gender': doctor.gender,
-            'rate': doctor.rate,
-            'status': doctor.status,
-            'phone': doctor.phone,
-            'hours_per_week': 40
-        }
-        result.append(doctor_info)
-    return result
-
 @managers_bp.route('/analyze_doctors', methods=['POST'])
 @role_and_approval_required('manager')
 def analyze_doctors():
+    '''
+    {
+        'start_date': '2024-03-04',
+        'end_date': '2024-05-27',
+        'percentile': 90
+    }
+    Без 'end_date' — анализ одной недели start_date, ответ — список по
+    типам исследований. С 'end_date' — горизонт из всех ISO-недель между
+    датами, ответ по столбцам:
+    {
+        'year': [2024, ...], 'week': [10, ...],
+        'study_types': ['Денситометрия', ...],
+        'quantity': {'КТ': 12, ...},
+        'lack': {'КТ': [0, 2, ...], ...},
+        'isEnough': {'КТ': [true, false, ...], ...},
+        'requiredMinutes': {...}, 'availableMinutes': {...},
+        'capacitySource': ['schedule', 'rate', ...]
+    }
+    '''
     data = request.get_json()
     start_date_str = data.get('start_date')
+    end_date_str = data.get('end_date')
 
-    logging.debug(f"Received start_date: {start_date_str}")
+    logging.debug(f"Received start_date: {start_date_str}, end_date: {end_date_str}")
 
     if not start_date_str:
         return jsonify({'message': 'Start date is required'}), 400
 
     try:
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-        logging.debug(f"Parsed start_date: {start_date}")
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d') if end_date_str else start_date
+        logging.debug(f"Parsed start_date: {start_date}, end_date: {end_date}")
     except ValueError:
         return jsonify({'message': 'Invalid date format, should be YYYY-MM-DD'}), 400
 
-    end_date = start_date + timedelta(days=6)
-    year = start_date.year
-    start_week = start_date.isocalendar()[1]
+    if end_date < start_date:
+        return jsonify({'message': 'End date must not be before start date'}), 400
+
+    year_weeks = iso_week_range(*iso_week(start_date), *iso_week(end_date)).tolist()
+    if len(year_weeks) > current_app.config['MAX_RANGE_WEEKS']:
+        return jsonify({'message': f'Week range must not exceed {current_app.config["MAX_RANGE_WEEKS"]} weeks'}), 400
+    logging.debug(f"Weeks: {len(year_weeks)} from {year_weeks[0]} to {year_weeks[-1]}")
+
+    # Спрос недели x типы исследований: фактические данные, пропуски — прогноз моделей.
+    # С 'percentile' пропуски заполняются перцентилем по деревьям леса, например 90 — верхней полосой
+    percentile = data.get('percentile')
+    if percentile is not None and not is_percentile(percentile):
+        return jsonify({'message': 'Percentile must be a number between 0 and 100'}), 400
+    demand = demand_service.weekly(year_weeks, percentile=percentile)
+
+    # Доступные минуты по графикам врачей (недели без графиков — по ставкам)
+    minutes, scheduled = capacity.available_minutes(year_weeks)
+
+    # Нехватка врачей сразу по всем неделям и типам исследований
+    counts, available, required, lack = capacity.shortfall(demand.values, minutes)
+    enough = available >= required
+    sources = np.where(scheduled, 'schedule', 'rate').tolist()
+    logging.debug(f"Doctors per modality: {dict(zip(STUDY_TYPES, counts.tolist()))}")
+
+    if end_date_str:
+        return jsonify({
+            'year': [year for year, _ in year_weeks],
+            'week': [week for _, week in year_weeks],
+            'study_types': STUDY_TYPES,
+            'quantity': dict(zip(STUDY_TYPES, counts.tolist())),
+            'lack': dict(zip(STUDY_TYPES, lack.T.tolist())),
+            'isEnough': dict(zip(STUDY_TYPES, enough.T.tolist())),
+            'requiredMinutes': dict(zip(STUDY_TYPES, required.T.round(1).tolist())),
+            'availableMinutes': dict(zip(STUDY_TYPES, available.T.round(1).tolist())),
+            'capacitySource': sources
+        }), 200
+
+    response = []
+    for modality, quantity, is_enough, doctors_needed in zip(
+            STUDY_TYPES, counts.tolist(), enough[0].tolist(), lack[0].tolist()):
+        response.append({
+            "type": modality,
+            "quantity": quantity,
+            "isEnough": is_enough,
+            "lack": doctors_needed,
+            "capacitySource": sources[0]
+        })
+
+    logging.debug(f"Response: {response}")
 
-    logging.debug(f"Year: {year}, Start Week: {start_week}")
+    return jsonify(response), 200
 
-    # Получаем данные о количестве исследований
-    study_counts = StudyCount.query.filter_by(year=year, week_number=start_week).all()
-    logging.debug(f"Study Counts: {study_counts}")
+@managers_bp.route('/coverage', methods=['POST'])
+@role_and_approval_required('manager')
+def get_coverage():
+    '''
+    {
+        'start_date': '2024-03-04',
+        'end_date': '2024-03-10',
+        'slot_minutes': 60
+    }
+    Покрытие по интервалам (15 или 60 минут) за дни от start_date до
+    end_date (по умолчанию один день): среднее число врачей по графикам и
+    спрос — недельный прогноз, распределённый по часам работы отделения.
+    {
+        'slots': ['2024-03-04T00:00', ...],
+        'study_types': ['Денситометрия', ...],
+        'coverage': {'КТ': [...], ...},
+        'demand': {'КТ': [...], ...},
+        'gap': {'КТ': [...], ...}
+    }
+    gap > 0 — врачей в интервале не хватает.
+    '''
+    data = request.get_json()
+    start_date_str = data.get('start_date')
+    # null в 'end_date' — то же, что его отсутствие
+    end_date_str = data.get('end_date') or start_date_str
+    slot_minutes = data.get('slot_minutes', 60)
 
-    if not study_counts:
-        study_types = [
-            'Денситометрия', 'КТ', 'КТ с КУ 1 зона', 'КТ с КУ 2 и более зон',
-            'ММГ', 'МРТ', 'МРТ с КУ 1 зона', 'МРТ с КУ 2 и более зон',
-            'РГ', 'ФЛГ'
+    if not start_date_str:
+        return jsonify({'message': 'Start date is required'}), 400
+
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return jsonify({'message': 'Invalid date format, should be YYYY-MM-DD'}), 400
+
+    # 15.0 и True равны 15 и 1, но ломают reshape — нужен именно int
+    if not isinstance(slot_minutes, int) or isinstance(slot_minutes, bool) \
+            or slot_minutes not in coverage.SLOT_MINUTES:
+        return jsonify({'message': 'Slot minutes must be 15 or 60'}), 400
+
+    days = (end_date - start_date).days + 1
+    if not 0 < days <= current_app.config['COVERAGE_MAX_DAYS']:
+        return jsonify({'message': f'Period must be from 1 to {current_app.config["COVERAGE_MAX_DAYS"]} days'}), 400
+
+    available = coverage.schedule_coverage(start_date, days, slot_minutes)
+
+    # Спрос недель, в которые попадают дни периода
+    day_weeks = [iso_week(start_date + timedelta(days=i)) for i in range(days)]
+    year_weeks = sorted(set(day_weeks))
+    week_rows = np.array([year_weeks.index(week) for week in day_weeks])
+    slot_weeks = week_rows[np.arange(len(available)) * slot_minutes // coverage.MINUTES_PER_DAY]
+
+    open_time = datetime.strptime(current_app.config['CLINIC_OPEN_TIME'], '%H:%M').time()
+    close_time = datetime.strptime(current_app.config['CLINIC_CLOSE_TIME'], '%H:%M').time()
+    weekdays = current_app.config['CLINIC_OPEN_WEEKDAYS']
+    open_mask = coverage.opening_minutes(days, start_date, open_time, close_time, weekdays)
+    open_minutes_per_week = (coverage.minute_of_day(close_time) - coverage.minute_of_day(open_time)) * len(weekdays)
+
+    demand = coverage.demand_per_slot(
+        demand_service.weekly(year_weeks).values, slot_weeks, open_mask, slot_minutes, open_minutes_per_week
+    )
+    slots = np.datetime64(start_date, 'm') + np.arange(len(available)) * slot_minutes
+
+    return jsonify({
+        'slot_minutes': slot_minutes,
+        'slots': slots.astype(str).tolist(),
+        'study_types': STUDY_TYPES,
+        'coverage': dict(zip(STUDY_TYPES, available.T.round(2).tolist())),
+        'demand': dict(zip(STUDY_TYPES, demand.T.round(2).tolist())),
+        'gap': dict(zip(STUDY_TYPES, (demand - available).T.round(2).tolist()))
+    }), 200
+
+
+@managers_bp.route('/simulate', methods=['POST'])
+@role_and_approval_required('manager')
+def simulate_staffing():
+    '''
+    {
+        'start_date': '2024-03-04',
+        'percentile': 90,
+        'changes': [
+            {'type': 'hire', 'modality': 'КТ', 'count': 3, 'rate': 1.0},
+            {'type': 'move', 'doctor_id': '...', 'modality': 'МРТ'},
+            {'type': 'rate', 'doctor_id': '...', 'rate': 0.5},
+            {'type': 'remove', 'doctor_id': '...'}
         ]
+    }
+    Нехватка врачей на ISO-неделю start_date сейчас ('baseline') и после
+    изменений ('scenario'); база данных не меняется.
+    {
+        'year': 2024, 'week': 10,
+        'study_types': ['Денситометрия', ...],
+        'requiredMinutes': {...},
+        'baseline': {'quantity': {...}, 'availableMinutes': {...}, 'lack': {...}, 'isEnough': {...}},
+        'scenario': {...}
+    }
+    '''
+    data = request.get_json()
+    start_date_str = data.get('start_date')
 
-        # Вызов ML модели для прогнозирования
-        predictions = {}
-        for study_type in study_types:
-            if study_type == 'МРТ с КУ 2 и более зон':
-                predictions[study_type] = 155  # Примерное значение для демонстрации
-            else:
-                target = {
-                    'Денситометрия': 'Денситометрия',
-                    'КТ': 'КТ',
-                    'КТ с КУ 1 зона': 'КТ с КУ 1 зона',
-                    'КТ с КУ 2 и более зон': 'КТ с КУ 2 и более зон',
-                    'ММГ': 'ММГ',
-                    'МРТ': 'МРТ',
-                    'МРТ с КУ 1 зона': 'МРТ с КУ 1 зона',
-                    'РГ': 'РГ',
-                    'ФЛГ': 'ФЛГ'
-                }[study_type]
-
-                data_for_ml = pd.DataFrame({
-                    'Год': [year for _ in range(start_week, start_week + 1)],  # Прогноз только на текущую неделю
-                    'Номер недели': [start_week for _ in range(start_week, start_week + 1)],
-                })
-
-                # Вызов функции предсказания
-                prediction = predictor.predict(target, data_for_ml)
-                predictions[study_type] = sum(prediction)  # Суммирование прогноза по неделе
-
-        # Используем прогнозы для дальнейших вычислений
-        study_counts = predictions
-
-    # Получаем данные о докторах
-    doctors_info = get_doctors_info()
-    logging.debug(f"Doctors Info: {doctors_info}")
-
-    # Анализируем данные о количестве необходимых докторов
-    response = []
+    if not start_date_str:
+        return jsonify({'message': 'Start date is required'}), 400
 
-    for study in study_counts:
-        modality = study.study_type if isinstance(study, StudyCount) else study
-        study_count = study.study_count if isinstance(study, StudyCount) else study_counts[study]
-        required_minutes = study_count * mapper[modality]
-        available_doctors = [doc for doc in doctors_info if doc['main_modality'] == modality or modality in doc['additional_modalities']]
-        total_available_minutes = sum([doc['hours_per_week'] * 60 for doc in available_doctors])
-
-        if total_available_minutes >= required_minutes:
-            response.append({
-                "type": modality,
-                "quantity": len(available_doctors),
-                "isEnough": True,
-                "lack": 0
-            })
-        else:
-            doctors_needed = (required_minutes - total_available_minutes) / (40 * 60)  # 40 часов в неделю, 60 минут в час
-            response.append({
-                "type": modality,
-                "quantity": len(available_doctors),
-                "isEnough": False,
-                "lack": max(0, round(doctors_needed))
-            })
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'message': 'Invalid date format, should be YYYY-MM-DD'}), 400
 
-    logging.debug(f"Response: {response}")
+    percentile = data.get('percentile')
+    if percentile is not None and not is_percentile(percentile):
+        return jsonify({'message': 'Percentile must be a number between 0 and 100'}), 400
+
+    year, week = iso_week(start_date)
+    demand = demand_service.weekly([(year, week)], percentile=percentile)
+    required = demand.values[0] * MINUTES
+
+    baseline = capacity.snapshot
+    hours, _ = capacity.week_hours(year, week, baseline)
+    try:
+        scenario = apply_changes(baseline, hours, data.get('changes', []),
+                                 max_hires=current_app.config['SIMULATION_MAX_HIRES'])
+    except (ValueError, TypeError) as e:
+        return jsonify({'message': str(e)}), 400
+
+    def summary(counts, available):
+        return {
+            'quantity': dict(zip(STUDY_TYPES, counts.tolist())),
+            'availableMinutes': dict(zip(STUDY_TYPES, available.round(1).tolist())),
+            'lack': dict(zip(STUDY_TYPES, lacking(required, available).tolist())),
+            'isEnough': dict(zip(STUDY_TYPES, (available >= required).tolist()))
+        }
 
-    return jsonify(response), 200
\ No newline at end of file
+    return jsonify({
+        'year': year,
+        'week': week,
+        'study_types': STUDY_TYPES,
+        'requiredMinutes': dict(zip(STUDY_TYPES, required.round(1).tolist())),
+        'baseline': summary(baseline.counts, hours @ baseline.membership * 60),
+        'scenario': summary(scenario.counts, scenario.minutes)
+    }), 200
@@ -0,0 +1,262 @@
+"""Ресурс врачей по модальностям.
+
+Снимок строится одним запросом: пары (врач, модальность) из основной и
+дополнительных модальностей, объединённые UNION ALL. Дальше всё считается
+массивами NumPy в порядке STUDY_TYPES: матрица врачи x модальности,
+число врачей и минуты в неделю по ставке (HOURS_PER_WEEK часов на полную
+ставку). Снимок кэшируется в процессе и сбрасывается после коммита,
+изменившего врачей или модальности; TTL ограничивает устаревание в других
+воркерах.
+
+Для конкретных недель часы берутся из графиков: одна группировка
+doctor_schedule по (врач, дата) — в часы идут только рабочие дни, часы
+умножаются на ставку. Решение принимается по каждому врачу: у кого на
+неделе нет ни одной записи графика, тот считается по ставке из снимка.
+"""
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+from sqlalchemy import case, event, func, literal, select, union, union_all
+from sqlalchemy.orm import Session
+
+from app.services.demand import STUDY_TYPES
+
+# Время выполнения одного исследования в минутах
+STUDY_MINUTES = {
+    'Денситометрия': 15,
+    'КТ': 30,
+    'КТ с КУ 1 зона': 40,
+    'КТ с КУ 2 и более зон': 50,
+    'ММГ': 20,
+    'МРТ': 45,
+    'МРТ с КУ 1 зона': 60,
+    'МРТ с КУ 2 и более зон': 75,
+    'РГ': 10,
+    'ФЛГ': 5
+}
+MINUTES = np.array([STUDY_MINUTES[study_type] for study_type in STUDY_TYPES], dtype=np.float64)
+
+# Часов в неделю на полную ставку
+HOURS_PER_WEEK = 40
+
+def modality_pairs():
+    """Подзапрос (doctor_id, modality_id) для основной и дополнительных модальностей."""
+    from app.models import Doctors, DoctorAdditionalModalities
+
+    return union(
+        select(Doctors.id.label('doctor_id'), Doctors.main_modality_id.label('modality_id')),
+        select(DoctorAdditionalModalities.doctor_id, DoctorAdditionalModalities.modality_id)
+    ).subquery()
+
+
+CapacitySnapshot = namedtuple(
+    'CapacitySnapshot', ['doctor_ids', 'rates', 'hours', 'main', 'additional', 'membership', 'counts', 'minutes']
+)
+
+
+def lacking(required, available):
+    """Сколько врачей на полную ставку не хватает, чтобы покрыть ``required`` минут."""
+    return np.maximum(np.round((required - available) / (HOURS_PER_WEEK * 60)), 0).astype(np.int64)
+
+
+class CapacityModel:
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._snapshot = None
+        self._built_at = 0.0
+        self._week_hours = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config['CAPACITY_CACHE_TTL']
+        event.listen(Session, 'after_flush', self._track_changes)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+
+    def _track_changes(self, session, flush_context):
+        from app.models import Doctors, Modality, DoctorAdditionalModalities, DoctorSchedule
+
+        changed = (*session.new, *session.dirty, *session.deleted)
+        if any(isinstance(obj, (Doctors, Modality, DoctorAdditionalModalities)) for obj in changed):
+            session.info['capacity_changed'] = True
+        if any(isinstance(obj, DoctorSchedule) for obj in changed):
+            session.info['schedule_changed'] = True
+
+    def _after_commit(self, session):
+        if session.info.pop('capacity_changed', None):
+            self.invalidate()
+        if session.info.pop('schedule_changed', None):
+            with self._lock:
+                self._week_hours.clear()
+
+    def _after_rollback(self, session):
+        session.info.pop('capacity_changed', None)
+        session.info.pop('schedule_changed', None)
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+            self._week_hours.clear()
+
+    @property
+    def snapshot(self) -> CapacitySnapshot:
+        with self._lock:
+            if self._snapshot is not None and time.monotonic() - self._built_at < self.ttl:
+                return self._snapshot
+        snapshot = self.build()
+        with self._lock:
+            self._snapshot = snapshot
+            self._week_hours.clear()
+            self._built_at = time.monotonic()
+        return snapshot
+
+    def build(self) -> CapacitySnapshot:
+        """Снимок врачей: массивы только для чтения, строки врачей в порядке ``doctor_ids``."""
+        from app import db
+        from app.models import Doctors, Modality, DoctorAdditionalModalities
+
+        assignments = union_all(
+            select(Doctors.id.label('doctor_id'), Doctors.main_modality_id.label('modality_id'),
+                   literal(True).label('main')),
+            select(DoctorAdditionalModalities.doctor_id, DoctorAdditionalModalities.modality_id, literal(False))
+        ).subquery()
+        rows = db.session.execute(
+            select(assignments.c.doctor_id, assignments.c.main, Modality.name, Doctors.rate)
+            .join(Doctors, Doctors.id == assignments.c.doctor_id)
+            .outerjoin(Modality, Modality.id == assignments.c.modality_id)
+        ).all()
+
+        columns = {study_type: j for j, study_type in enumerate(STUDY_TYPES)}
+        doctor_ids, doctors = np.unique(np.array([str(row[0]) for row in rows], dtype=object), return_inverse=True)
+        is_main = np.array([bool(row[1]) for row in rows], dtype=bool)
+        modalities = np.array([columns.get(row[2], -1) for row in rows], dtype=np.int64)
+
+        rates = np.zeros(len(doctor_ids))
+        rates[doctors] = [row[3] or 0 for row in rows]
+        main = np.full(len(doctor_ids), -1, dtype=np.int64)
+        main[doctors[is_main]] = modalities[is_main]
+        additional = np.zeros((len(doctor_ids), len(STUDY_TYPES)), dtype=bool)
+        known = ~is_main & (modalities >= 0)
+        additional[doctors[known], modalities[known]] = True
+
+        snapshot = snapshot_from(doctor_ids, rates, HOURS_PER_WEEK * rates, main, additional)
+        for array in snapshot:
+            array.flags.writeable = False
+        return snapshot
+
+    def doctors(self, study_type):
+        """id врачей, которые могут выполнять исследования этого типа."""
+        snapshot = self.snapshot
+        return snapshot.doctor_ids[snapshot.membership[:, STUDY_TYPES.index(study_type)]].tolist()
+
+    def week_hours(self, year, week, snapshot=None):
+        """Часы врачей за ISO-неделю в порядке ``snapshot.doctor_ids`` и признак, что графики есть.
+
+        Врачи с графиком на неделю — рабочие часы по нему, без графика — часы
+        по ставке из снимка. Кэшируется до изменения графиков или врачей.
+        Вызывающий, уже взявший снимок, передаёт его, чтобы часы совпали с ним
+        по врачам, даже если снимок тем временем обновился.
+        """
+        snapshot = snapshot or self.snapshot
+        with self._lock:
+            cached = self._week_hours.get((year, week))
+        if cached is not None and cached[0] is snapshot:
+            return cached[1], cached[2]
+
+        hours, scheduled = self.schedule_hours([(year, week)], snapshot)
+        scheduled = bool(scheduled.any())
+        hours = hours[0] if scheduled else snapshot.hours
+        hours.flags.writeable = False
+
+        with self._lock:
+            # Часы к устаревшему снимку не вытесняют закэшированные для текущего
+            if snapshot is self._snapshot:
+                self._week_hours[(year, week)] = (snapshot, hours, scheduled)
+        return hours, scheduled
+
+    def schedule_hours(self, year_weeks, snapshot):
+        """Часы врачей (недели x ``snapshot.doctor_ids``) и маска врачей с графиком на неделе.
+
+        Решение принимается по каждому врачу: есть хоть одна запись графика
+        на неделе (включая отпуск и больничный) — берутся его рабочие часы
+        по графику, иначе — часы по ставке из снимка.
+        """
+        from app import db
+        from app.models import Doctors, DoctorSchedule, DayType
+
+        hours = np.zeros((len(year_weeks), len(snapshot.doctor_ids)))
+        scheduled = np.zeros(hours.shape, dtype=bool)
+        if not len(year_weeks):
+            return hours, scheduled
+
+        mondays = np.array([date.fromisocalendar(year, week, 1) for year, week in year_weeks], dtype='datetime64[D]')
+        working = case((DoctorSchedule.day_type == DayType.WORKING_DAY, DoctorSchedule.hours_worked * Doctors.rate),
+                       else_=0)
+        rows = db.session.execute(
+            select(DoctorSchedule.doctor_id, DoctorSchedule.date, func.sum(working))
+            .join(Doctors, Doctors.id == DoctorSchedule.doctor_id)
+            .where(DoctorSchedule.date >= mondays.min().item(),
+                   DoctorSchedule.date <= (mondays.max() + 6).item())
+            .group_by(DoctorSchedule.doctor_id, DoctorSchedule.date)
+        ).all()
+
+        if rows and len(snapshot.doctor_ids):
+            days = np.array([row[1] for row in rows], dtype='datetime64[D]')
+            # 1970-01-01 — четверг: (дни + 3) % 7 — номер дня недели с понедельника
+            row_mondays = days - (days.astype(np.int64) + 3) % 7
+            order = np.argsort(mondays)
+            positions = np.searchsorted(mondays[order], row_mondays).clip(max=len(mondays) - 1)
+            found = mondays[order][positions] == row_mondays
+            weeks = order[positions]
+
+            # doctor_ids отсортированы np.unique; врачи, появившиеся после снимка, пропускаются
+            ids = np.array([str(row[0]) for row in rows], dtype=object)
+            doctors = np.searchsorted(snapshot.doctor_ids, ids).clip(max=len(snapshot.doctor_ids) - 1)
+            found &= snapshot.doctor_ids[doctors] == ids
+
+            worked = np.array([row[2] or 0 for row in rows], dtype=np.float64)
+            np.add.at(hours, (weeks[found], doctors[found]), worked[found])
+            scheduled[weeks[found], doctors[found]] = True
+
+        return np.where(scheduled, hours, snapshot.hours), scheduled
+
+    def available_minutes(self, year_weeks):
+        """Доступные минуты (недели x STUDY_TYPES) и маска недель, где есть графики.
+
+        Часы каждого врача — по графику, если он есть у врача на неделе, иначе по ставке.
+        """
+        snapshot = self.snapshot
+        hours, scheduled = self.schedule_hours(year_weeks, snapshot)
+        return hours @ snapshot.membership * 60, scheduled.any(axis=1)
+
+    def shortfall(self, demand, available=None):
+        """Нехватка врачей по типам исследований для спроса в порядке STUDY_TYPES.
+
+        ``demand`` — вектор или матрица недели x STUDY_TYPES; ``available`` —
+        доступные минуты той же формы (по умолчанию по снимку). Возвращает
+        (число врачей, доступные минуты, требуемые минуты, нехватка врачей).
+        """
+        snapshot = self.snapshot
+        available = snapshot.minutes if available is None else np.asarray(available, dtype=np.float64)
+        required = np.asarray(demand, dtype=np.float64) * MINUTES
+        return snapshot.counts, available, required, lacking(required, available)
+
+
+def snapshot_from(doctor_ids, rates, hours, main, additional) -> CapacitySnapshot:
+    """Собирает снимок: модальности врача — основная и дополнительные, минуты — часы x 60."""
+    membership = additional.copy()
+    has_main = main >= 0
+    membership[np.flatnonzero(has_main), main[has_main]] = True
+    return CapacitySnapshot(
+        doctor_ids=doctor_ids,
+        rates=rates,
+        hours=hours,
+        main=main,
+        additional=additional,
+        membership=membership,
+        counts=membership.sum(axis=0),
+        minutes=hours @ membership * 60,
+    )
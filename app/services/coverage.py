@@ -0,0 +1,91 @@
+"""Покрытие рабочего дня врачами в сравнении со спросом по интервалам.
+
+Смены из doctor_schedule переводятся в минуты от начала периода, и
+покрытие по каждой минуте считается разностным массивом: +1 в начале
+смены, -1 в конце, cumsum. Перерыв без указанного времени размазывается
+по смене: смена весит (длительность - перерыв) / длительность. Затем минуты
+усредняются по интервалам в 15 или 60 минут — среднее число врачей на
+модальность в интервале.
+
+Спрос — недельные требуемые минуты (спрос x STUDY_MINUTES), равномерно
+распределённые по часам работы недели: в интервал приходится среднее
+число одновременно занятых врачей.
+"""
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import func, select
+
+from app.services.capacity import MINUTES, modality_pairs
+from app.services.demand import STUDY_TYPES
+
+SLOT_MINUTES = (15, 60)
+MINUTES_PER_DAY = 24 * 60
+
+
+def minute_of_day(value):
+    return value.hour * 60 + value.minute
+
+
+def schedule_coverage(start, days, slot_minutes):
+    """Среднее число врачей по модальностям в интервалах: массив (интервалы, STUDY_TYPES)."""
+    from app import db
+    from app.models import DoctorSchedule, DayType, Modality
+
+    pairs = modality_pairs()
+    # Одинаковые смены схлопываются в одну строку с числом врачей
+    shift = [DoctorSchedule.date, DoctorSchedule.start_time, DoctorSchedule.end_time,
+             DoctorSchedule.break_minutes, Modality.name]
+    rows = db.session.execute(
+        select(*shift, func.count())
+        .join(pairs, pairs.c.doctor_id == DoctorSchedule.doctor_id)
+        .join(Modality, Modality.id == pairs.c.modality_id)
+        .where(DoctorSchedule.day_type == DayType.WORKING_DAY,
+               DoctorSchedule.start_time.isnot(None), DoctorSchedule.end_time.isnot(None),
+               # Ночная смена предыдущего дня заходит в первый день периода
+               DoctorSchedule.date >= start - timedelta(days=1),
+               DoctorSchedule.date < start + timedelta(days=days))
+        .group_by(*shift)
+    ).all()
+
+    total = days * MINUTES_PER_DAY
+    diff = np.zeros((total + 1, len(STUDY_TYPES)))
+    columns = {study_type: j for j, study_type in enumerate(STUDY_TYPES)}
+    rows = [row for row in rows if row[4] in columns]
+    if rows:
+        offsets = (np.array([row[0] for row in rows], dtype='datetime64[D]')
+                   - np.datetime64(start, 'D')).astype(np.int64) * MINUTES_PER_DAY
+        begins = offsets + np.array([minute_of_day(row[1]) for row in rows])
+        ends = offsets + np.array([minute_of_day(row[2]) for row in rows])
+        ends = np.where(ends <= begins, ends + MINUTES_PER_DAY, ends)
+        breaks = np.array([row[3] or 0 for row in rows], dtype=np.float64)
+        doctors = np.array([row[5] for row in rows], dtype=np.float64)
+        weights = np.clip((ends - begins - breaks) / (ends - begins), 0, 1) * doctors
+        modalities = np.array([columns[row[4]] for row in rows])
+
+        begins, ends = np.clip(begins, 0, total), np.clip(ends, 0, total)
+        keep = ends > begins
+        np.add.at(diff, (begins[keep], modalities[keep]), weights[keep])
+        np.add.at(diff, (ends[keep], modalities[keep]), -weights[keep])
+
+    per_minute = np.cumsum(diff[:-1], axis=0)
+    return per_minute.reshape(total // slot_minutes, slot_minutes, len(STUDY_TYPES)).mean(axis=1)
+
+
+def opening_minutes(days, start, open_time, close_time, open_weekdays):
+    """Маска минут (days * 1440), когда отделение работает."""
+    minutes = np.arange(MINUTES_PER_DAY)
+    daily = (minutes >= minute_of_day(open_time)) & (minutes < minute_of_day(close_time))
+    weekdays = (start.isoweekday() - 1 + np.arange(days)) % 7 + 1
+    return (np.isin(weekdays, open_weekdays)[:, None] & daily[None, :]).reshape(-1)
+
+
+def demand_per_slot(weekly_demand, slot_weeks, open_mask, slot_minutes, open_minutes_per_week):
+    """Спрос в интервалах: среднее число занятых врачей, массив (интервалы, STUDY_TYPES).
+
+    ``weekly_demand`` — спрос недели x STUDY_TYPES, ``slot_weeks`` — номер
+    строки недели для каждого интервала.
+    """
+    open_fraction = open_mask.reshape(-1, slot_minutes).mean(axis=1)
+    busy = np.asarray(weekly_demand, dtype=np.float64) * MINUTES / max(open_minutes_per_week, 1)
+    return busy[slot_weeks] * open_fraction[:, None]
@@ -0,0 +1,130 @@
+from collections import namedtuple
+
+import numpy as np
+from sqlalchemy import tuple_
+
+from app.cache import TTLCache
+
+# Типы исследований в порядке столбцов: так они называются в study_count и в моделях
+STUDY_TYPES = [
+    'Денситометрия', 'КТ', 'КТ с КУ 1 зона', 'КТ с КУ 2 и более зон',
+    'ММГ', 'МРТ', 'МРТ с КУ 1 зона', 'МРТ с КУ 2 и более зон',
+    'РГ', 'ФЛГ'
+]
+
+# Названия столбцов в выгрузках
+EXPORT_NAMES = {
+    'Денситометрия': 'Денситометрия',
+    'КТ': 'КТ',
+    'КТ с КУ 1 зона': 'КТ с КУ 1 зона',
+    'КТ с КУ 2 и более зон': 'КТ с КУ 2 и более зон',
+    'ММГ': 'ММГ',
+    'МРТ': 'МРТ',
+    'МРТ с КУ 1 зона': 'МРТ с КУ 1 зона',
+    'МРТ с КУ 2 и более зон': 'МРТ с КУ 2 и более зон',
+    'РГ': 'РГ',
+    'ФЛГ': 'Флюорография'
+}
+
+WeeklyDemand = namedtuple('WeeklyDemand', ['year_weeks', 'values', 'actual'])
+
+
+def is_percentile(value):
+    """Число от 0 до 100; bool числом не считается."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and 0 <= value <= 100
+
+
+def iso_week(day):
+    year, week, _ = day.isocalendar()
+    return year, week
+
+
+class DemandService:
+    """Недельный спрос по всем типам исследований.
+
+    Фактические значения берутся из study_count одной выборкой по диапазону
+    недель, пропуски заполняются прогнозом одним пакетным вызовом моделей.
+    Результат по каждой неделе запоминается с версией моделей в ключе;
+    ``invalidate`` сбрасывает его после загрузки новых данных, а TTL
+    ограничивает устаревание в других процессах.
+    """
+
+    def __init__(self, forecasts, registry):
+        self.forecasts = forecasts
+        self.registry = registry
+        self.cache = TTLCache(maxsize=10000, ttl=300)
+
+    def init_app(self, app):
+        self.cache.configure(maxsize=app.config['DEMAND_CACHE_SIZE'], ttl=app.config['DEMAND_CACHE_TTL'])
+
+    def weekly(self, year_weeks, percentile=None) -> WeeklyDemand:
+        """Спрос формы (недели, типы исследований) и маска фактических значений.
+
+        ``percentile`` заполняет пропуски перцентилем по деревьям леса вместо
+        среднего прогноза (например, 90 — верхняя полоса).
+        """
+        year_weeks = [(int(year), int(week)) for year, week in year_weeks]
+        values = np.zeros((len(year_weeks), len(STUDY_TYPES)))
+        actual = np.zeros((len(year_weeks), len(STUDY_TYPES)), dtype=bool)
+
+        # Версия моделей в ключе: после переключения реестра прогнозы пересчитываются
+        keys = [(self.registry.version, year, week, percentile) for year, week in year_weeks]
+        cached = self.cache.get_many(keys)
+        missing = []
+        for i, item in enumerate(cached):
+            if item is None:
+                missing.append(i)
+            else:
+                values[i], actual[i] = item
+
+        if missing:
+            self._resolve(year_weeks, missing, values, actual, percentile)
+            self.cache.set_many((keys[i], (values[i].copy(), actual[i].copy())) for i in missing)
+        return WeeklyDemand(year_weeks, values, actual)
+
+    def _resolve(self, year_weeks, missing, values, actual, percentile):
+        from app.models import StudyCount
+
+        rows = {year_weeks[i]: i for i in missing}
+        columns = {study_type: j for j, study_type in enumerate(STUDY_TYPES)}
+        # Один проход по индексу (year, week_number, study_type) от первой до последней недели
+        week_key = tuple_(StudyCount.year, StudyCount.week_number)
+        study_counts = StudyCount.query.with_entities(
+            StudyCount.year, StudyCount.week_number, StudyCount.study_type, StudyCount.study_count
+        ).filter(week_key >= min(rows), week_key <= max(rows)).all()
+        for year, week, study_type, count in study_counts:
+            j = columns.get(study_type)
+            if j is not None and (year, week) in rows:
+                values[rows[(year, week)], j] = count
+                actual[rows[(year, week)], j] = True
+
+        gaps = ~actual[missing]
+        if not gaps.any():
+            return
+        gap_rows = [missing[i] for i in np.flatnonzero(gaps.any(axis=1))]
+        gap_columns = np.flatnonzero(gaps.any(axis=0))
+        targets = [STUDY_TYPES[j] for j in gap_columns]
+        gap_weeks = [year_weeks[i] for i in gap_rows]
+        if percentile is None:
+            forecast = self.forecasts.predict_many(targets, gap_weeks)
+        else:
+            _, bands = self.registry.predictor.predict_intervals(targets, gap_weeks, [percentile])
+            forecast = bands[:, 0, :]
+
+        block = np.ix_(gap_rows, gap_columns)
+        values[block] = np.where(actual[block], values[block], forecast.T)
+
+    def iter_weeks(self, year_weeks, chunk_weeks=52):
+        """Построчно (год, неделя, источник, значения) — спрос считается порциями по ``chunk_weeks`` недель.
+
+        Источник: 'Факт', 'Прогноз' или 'Факт и прогноз', если в неделе
+        есть и фактические, и спрогнозированные типы исследований.
+        """
+        for offset in range(0, len(year_weeks), chunk_weeks):
+            demand = self.weekly(year_weeks[offset:offset + chunk_weeks])
+            for (year, week), values, actual in zip(demand.year_weeks, demand.values, demand.actual):
+                source = 'Факт' if actual.all() else 'Прогноз' if not actual.any() else 'Факт и прогноз'
+                yield year, week, source, values.tolist()
+
+    def invalidate(self):
+        self.cache.clear()
@@ -0,0 +1,71 @@
+"""Помесячные, поквартальные и годовые суммы study_count.
+
+Неделя относится к месяцу своего четверга (как и ISO-год), поэтому каждая
+неделя попадает ровно в один месяц, квартал и год. Таблица
+study_count_rollup пересчитывается только для ISO-лет, в которых менялись
+недели: одна выборка по индексу study_count на год, удаление и вставка
+итогов в той же транзакции.
+
+    python -m app.services.rollups   # полный пересчёт
+"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, insert, select
+
+PERIODS = ['month', 'quarter', 'year']
+
+
+def week_months(years, weeks) -> np.ndarray:
+    """Месяц (1-12) четверга ISO-недели для массивов годов и номеров недель."""
+    years = np.asarray(years, dtype=np.int64)
+    # 4 января всегда в первой ISO-неделе; отступаем до её понедельника
+    january_4 = (years - 1970).astype('datetime64[Y]').astype('datetime64[D]') + 3
+    weekday = (january_4.astype(np.int64) + 3) % 7
+    thursdays = january_4 - weekday + (np.asarray(weeks, dtype=np.int64) - 1) * 7 + 3
+    return thursdays.astype('datetime64[M]').astype(np.int64) % 12 + 1
+
+
+def aggregate(rows: pd.DataFrame) -> pd.DataFrame:
+    """Строки (year, week_number, study_type, study_count) → итоги по всем периодам."""
+    months = week_months(rows['year'], rows['week_number'])
+    numbers = {'month': months, 'quarter': (months - 1) // 3 + 1, 'year': np.ones_like(months)}
+    result = []
+    for period in PERIODS:
+        grouped = rows.assign(period=period, number=numbers[period]).groupby(
+            ['period', 'year', 'number', 'study_type'], as_index=False
+        ).agg(study_count=('study_count', 'sum'), weeks=('week_number', 'nunique'))
+        result.append(grouped)
+    return pd.concat(result, ignore_index=True)
+
+
+def refresh(conn, weeks=None):
+    """Пересчитывает итоги ISO-лет из ``weeks`` [(year, week_number), ...]; None — все годы."""
+    from app.models import StudyCount, StudyCountRollup
+
+    source = StudyCount.__table__
+    table = StudyCountRollup.__table__
+    query = select(source.c.year, source.c.week_number, source.c.study_type, source.c.study_count)
+    if weeks is not None:
+        years = sorted({int(year) for year, _ in weeks})
+        if not years:
+            return 0
+        query = query.where(source.c.year.in_(years))
+        conn.execute(delete(table).where(table.c.year.in_(years)))
+    else:
+        conn.execute(delete(table))
+
+    rows = pd.DataFrame(conn.execute(query).all(), columns=['year', 'week_number', 'study_type', 'study_count'])
+    if rows.empty:
+        return 0
+    records = aggregate(rows).to_dict('records')
+    conn.execute(insert(table), records)
+    return len(records)
+
+
+if __name__ == '__main__':
+    from app import create_app, db
+
+    app = create_app()
+    with app.app_context():
+        with db.engine.begin() as conn:
+            print(f'{refresh(conn)} rollup rows')
@@ -0,0 +1,104 @@
+"""Сценарии «что если» для укомплектованности без изменения базы.
+
+Сценарий — список изменений поверх снимка CapacityModel и часов врачей за
+неделю. Снимок общий и только для чтения; изменения применяются к копиям
+массивов, после чего число врачей и минуты по модальностям пересчитываются
+одним матричным умножением.
+
+    {'type': 'hire', 'modality': 'КТ', 'count': 3, 'rate': 1.0, 'additional_modalities': ['МРТ']}
+    {'type': 'move', 'doctor_id': '...', 'modality': 'МРТ'}
+    {'type': 'rate', 'doctor_id': '...', 'rate': 0.5}
+    {'type': 'remove', 'doctor_id': '...'}
+"""
+import numpy as np
+
+from app.services.capacity import HOURS_PER_WEEK, snapshot_from
+from app.services.demand import STUDY_TYPES
+
+CHANGE_TYPES = ('hire', 'move', 'rate', 'remove')
+
+
+class ScenarioError(ValueError):
+    pass
+
+
+def _modality(name):
+    if name not in STUDY_TYPES:
+        raise ScenarioError(f'Unknown modality {name}')
+    return STUDY_TYPES.index(name)
+
+
+def _rate(value):
+    try:
+        rate = float(value)
+    except (TypeError, ValueError):
+        raise ScenarioError(f'Invalid rate {value}')
+    if rate < 0:
+        raise ScenarioError(f'Invalid rate {value}')
+    return rate
+
+
+def apply_changes(snapshot, hours, changes, max_hires=None):
+    """Снимок с применёнными изменениями; ``hours`` — часы врачей за неделю (CapacityModel.week_hours).
+
+    ``max_hires`` ограничивает общее число нанятых врачей: массивы растут на
+    каждого из них.
+    """
+    if not isinstance(changes, list):
+        raise ScenarioError('Changes must be a list')
+    doctor_ids = snapshot.doctor_ids
+    rates = snapshot.rates.copy()
+    hours = np.array(hours, dtype=np.float64)
+    main = snapshot.main.copy()
+    additional = snapshot.additional.copy()
+    hired = []
+
+    def doctor(change):
+        doctor_id = str(change.get('doctor_id'))
+        i = np.searchsorted(doctor_ids, doctor_id)
+        if i == len(doctor_ids) or doctor_ids[i] != doctor_id:
+            raise ScenarioError(f'Unknown doctor {doctor_id}')
+        return i
+
+    total_hired = 0
+    for change in changes:
+        if not isinstance(change, dict):
+            raise ScenarioError('Each change must be an object')
+        kind = change.get('type')
+        if kind == 'hire':
+            count = change.get('count', 1)
+            if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+                raise ScenarioError('Hire count must be a positive integer')
+            total_hired += count
+            if max_hires is not None and total_hired > max_hires:
+                raise ScenarioError(f'Scenario may hire at most {max_hires} doctors')
+            rate = _rate(change.get('rate', 1.0))
+            row = np.zeros(len(STUDY_TYPES), dtype=bool)
+            row[[_modality(name) for name in change.get('additional_modalities', [])]] = True
+            hired.append((count, rate, _modality(change.get('modality')), row))
+        elif kind == 'move':
+            main[doctor(change)] = _modality(change.get('modality'))
+        elif kind == 'rate':
+            i = doctor(change)
+            rate = _rate(change.get('rate'))
+            # Часы по графику пропорциональны ставке
+            hours[i] = hours[i] * rate / rates[i] if rates[i] else HOURS_PER_WEEK * rate
+            rates[i] = rate
+        elif kind == 'remove':
+            i = doctor(change)
+            hours[i] = 0
+            main[i] = -1
+            additional[i] = False
+        else:
+            raise ScenarioError(f'Change type must be one of {", ".join(CHANGE_TYPES)}')
+
+    if hired:
+        counts = [count for count, _, _, _ in hired]
+        doctor_ids = np.concatenate([doctor_ids, np.array([f'new-{i}' for i in range(sum(counts))], dtype=object)])
+        new_rates = np.repeat([rate for _, rate, _, _ in hired], counts)
+        rates = np.concatenate([rates, new_rates])
+        hours = np.concatenate([hours, HOURS_PER_WEEK * new_rates])
+        main = np.concatenate([main, np.repeat([modality for _, _, modality, _ in hired], counts)])
+        additional = np.concatenate([additional, np.repeat([row for _, _, _, row in hired], counts, axis=0)])
+
+    return snapshot_from(doctor_ids, rates, hours, main, additional)
@@ -0,0 +1,133 @@
+"""Загрузка недельного количества исследований в study_count.
+
+Таблица (Год, Номер недели, столбец на тип исследования) разворачивается
+``melt`` в длинный формат и пишется пакетами INSERT ... ON CONFLICT DO
+UPDATE по ключу (year, week_number, study_type): повторная загрузка того же
+файла ничего не дублирует, а исправленные значения перезаписываются.
+"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, func, select
+
+from app.bulk import upsert
+from app.services.demand import STUDY_TYPES
+
+# Заголовки столбцов в выгрузках → типы исследований в study_count
+STUDY_TYPE_ALIASES = dict({study_type: study_type for study_type in STUDY_TYPES}, **{
+    'Денситометр': 'Денситометрия',
+    'Флюорограф': 'ФЛГ',
+    'Флюорография': 'ФЛГ',
+})
+
+KEY = ['year', 'week_number', 'study_type']
+BATCH_SIZE = 5000
+
+
+def study_count_table():
+    from app.models import StudyCount
+    return StudyCount.__table__
+
+
+def reshape(frame: pd.DataFrame) -> pd.DataFrame:
+    """Широкая таблица выгрузки → строки (year, week_number, study_type, study_count)."""
+    columns = [column for column in frame.columns if column in STUDY_TYPE_ALIASES]
+    rows = frame.rename(columns={'Год': 'year', 'Номер недели': 'week_number'}).melt(
+        id_vars=['year', 'week_number'], value_vars=columns,
+        var_name='study_type', value_name='study_count'
+    ).dropna(subset=['year', 'week_number', 'study_count'])
+    rows['study_type'] = rows['study_type'].map(STUDY_TYPE_ALIASES)
+    rows = rows.astype({'year': np.int64, 'week_number': np.int64, 'study_count': np.float64})
+    # В одном файле неделя могла встретиться дважды — остаётся последнее значение
+    return rows.drop_duplicates(subset=KEY, keep='last')
+
+
+def ensure_unique_index(conn):
+    """Создаёт уникальный индекс (year, week_number, study_type), удалив дубли прежнего импорта.
+
+    Из дублей остаётся строка с наименьшим id; возвращает число ключей, у которых были дубли.
+    """
+    table = study_count_table()
+    key = [table.c[column] for column in KEY]
+    duplicated = conn.execute(
+        select(func.count()).select_from(select(*key).group_by(*key).having(func.count() > 1).subquery())
+    ).scalar()
+    if duplicated:
+        other = table.alias()
+        conn.execute(delete(table).where(
+            select(other.c.id)
+            .where(*(other.c[column] == table.c[column] for column in KEY), other.c.id < table.c.id)
+            .exists()
+        ))
+    index = next(index for index in table.indexes if index.unique)
+    index.create(conn, checkfirst=True)
+    return duplicated
+
+
+def last_week(conn):
+    table = study_count_table()
+    return conn.execute(
+        select(table.c.year, table.c.week_number)
+        .order_by(table.c.year.desc(), table.c.week_number.desc()).limit(1)
+    ).first()
+
+
+def load(conn, rows: pd.DataFrame, incremental=False, batch_size=BATCH_SIZE, after=None):
+    """Пишет строки из ``reshape``; ``incremental`` — только недели позже последней в таблице.
+
+    ``after`` задаёт эту границу (year, week_number) явно, например один раз
+    на всю загрузку по частям. Возвращает число записанных строк и список
+    затронутых недель (year, week_number).
+    """
+    if incremental and after is None:
+        after = last_week(conn)
+    if incremental and after is not None:
+        rows = rows[rows['year'] * 100 + rows['week_number'] > after[0] * 100 + after[1]]
+
+    table = study_count_table()
+    records = rows[KEY + ['study_count']].to_dict('records')
+    for offset in range(0, len(records), batch_size):
+        upsert(conn, table, records[offset:offset + batch_size], KEY, ['study_count'])
+    weeks = sorted(set(zip(rows['year'].tolist(), rows['week_number'].tolist())))
+    return len(records), weeks
+
+
+def check_columns(columns):
+    missing = [column for column in ['Год', 'Номер недели'] if column not in columns]
+    if missing:
+        raise ValueError(f'Missing columns: {", ".join(missing)}')
+    if not any(column in STUDY_TYPE_ALIASES for column in columns):
+        raise ValueError('No study type columns found')
+
+
+def iter_chunks(path, chunk_rows=BATCH_SIZE):
+    """Читает .xlsx или .csv частями по ``chunk_rows`` строк, не загружая файл целиком.
+
+    Возвращает (число строк данных или None, если оно неизвестно, генератор DataFrame).
+    """
+    if path.endswith('.csv'):
+        with open(path, 'rb') as fh:
+            total = max(sum(1 for _ in fh) - 1, 0)
+        return total, (chunk for chunk in pd.read_csv(path, chunksize=chunk_rows))
+
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    sheet = workbook.active
+    total = sheet.max_row - 1 if sheet.max_row else None
+
+    def chunks():
+        try:
+            rows = sheet.iter_rows(values_only=True)
+            header = [str(value).strip() if value is not None else '' for value in next(rows, [])]
+            chunk, chunks_read = [], 0
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) == chunk_rows:
+                    yield pd.DataFrame(chunk, columns=header)
+                    chunk, chunks_read = [], chunks_read + 1
+            if chunk or not chunks_read:
+                yield pd.DataFrame(chunk, columns=header)
+        finally:
+            workbook.close()
+
+    return total, chunks()
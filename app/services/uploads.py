@@ -0,0 +1,150 @@
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from app.services import study_counts
+
+UPLOAD_EXTENSIONS = ('.xlsx', '.csv')
+
+
+class StudyCountUploads:
+    """Фоновая загрузка файлов с количеством исследований.
+
+    Файл сохраняется на диск, а разбор идёт в пуле потоков: строки читаются
+    частями (openpyxl read-only, CSV по ``chunk_rows`` строк), каждая часть
+    сразу пишется upsert'ом в study_count, поэтому память не зависит от
+    размера файла. Состояние задачи хранится в study_count_upload и видно
+    из любого воркера. Части коммитятся по отдельности: после ошибки файл
+    можно просто загрузить ещё раз, а подписчики ``on_loaded`` получают
+    недели уже записанных частей. Задачи, не завершённые до перезапуска
+    приложения, при старте помечаются ошибкой — пул потоков их уже не выполнит.
+    """
+
+    def __init__(self, workers=1, chunk_rows=study_counts.BATCH_SIZE, upload_dir=None):
+        self.workers = workers
+        self.chunk_rows = chunk_rows
+        self.upload_dir = upload_dir or tempfile.gettempdir()
+        self.app = None
+        self._callbacks = []
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config['STUDY_COUNT_UPLOAD_WORKERS']
+        self.chunk_rows = app.config['STUDY_COUNT_UPLOAD_CHUNK_ROWS']
+        self.upload_dir = app.config['STUDY_COUNT_UPLOAD_DIR'] or tempfile.gettempdir()
+        self.fail_orphaned()
+
+    def fail_orphaned(self):
+        """Помечает ошибкой задачи, оставшиеся в очереди или в работе от прошлого запуска.
+
+        Вызывается при старте (с preload_app — один раз в мастере до fork),
+        когда ни один пул потоков ещё не работает. Сохранённые файлы удаляются.
+        """
+        from app import db
+        from app.models import StudyCountUpload
+
+        orphaned = db.session.execute(
+            select(StudyCountUpload.id).where(StudyCountUpload.status.in_(['Pending', 'Processing']))
+        ).scalars().all()
+        if not orphaned:
+            return
+        db.session.execute(
+            update(StudyCountUpload).where(StudyCountUpload.id.in_(orphaned))
+            .values(status='Failed', error='Interrupted by restart', finished_at=datetime.now())
+        )
+        db.session.commit()
+        for job_id in orphaned:
+            for extension in UPLOAD_EXTENSIONS:
+                path = os.path.join(self.upload_dir, f'study_counts_{job_id}{extension}')
+                if os.path.exists(path):
+                    os.remove(path)
+        logging.warning(f'Marked {len(orphaned)} interrupted study count uploads as failed')
+
+    def on_loaded(self, callback):
+        """``callback(weeks)`` вызывается после загрузки со списком затронутых недель."""
+        self._callbacks.append(callback)
+        return callback
+
+    def _get_pool(self):
+        # Пул создаётся лениво в каждом воркере, уже после fork
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='study-count-upload')
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def submit(self, file, incremental=False):
+        """Сохраняет загруженный файл и ставит его разбор в очередь; возвращает задачу."""
+        from app import db
+        from app.models import StudyCountUpload
+
+        extension = os.path.splitext(file.filename or '')[1].lower()
+        if extension not in UPLOAD_EXTENSIONS:
+            raise ValueError(f'Unsupported file type, expected {" or ".join(UPLOAD_EXTENSIONS)}')
+
+        # Имя от клиента может не поместиться в столбец: обрезается, расширение сохраняется
+        filename = file.filename
+        limit = StudyCountUpload.__table__.c.filename.type.length
+        if len(filename) > limit:
+            filename = os.path.splitext(filename)[0][:limit - len(extension)] + extension
+
+        job = StudyCountUpload(id=uuid.uuid4(), filename=filename, incremental=incremental)
+        path = os.path.join(self.upload_dir, f'study_counts_{job.id}{extension}')
+        file.save(path)
+        db.session.add(job)
+        db.session.commit()
+
+        self._get_pool().submit(self._run, job.id, path, incremental)
+        return job
+
+    def _update(self, job_id, **values):
+        from app import db
+        from app.models import StudyCountUpload
+
+        db.session.query(StudyCountUpload).filter_by(id=job_id).update(values)
+        db.session.commit()
+
+    def _run(self, job_id, path, incremental):
+        from app import db
+
+        with self.app.app_context():
+            try:
+                weeks = set()
+                try:
+                    total, chunks = study_counts.iter_chunks(path, self.chunk_rows)
+                    self._update(job_id, status='Processing', total_rows=total)
+                    with db.engine.begin() as conn:
+                        study_counts.ensure_unique_index(conn)
+                        after = study_counts.last_week(conn) if incremental else None
+
+                    processed = written = 0
+                    for chunk in chunks:
+                        study_counts.check_columns(chunk.columns)
+                        rows = study_counts.reshape(chunk)
+                        with db.engine.begin() as conn:
+                            count, chunk_weeks = study_counts.load(conn, rows, after is not None, after=after)
+                        processed += len(chunk)
+                        written += count
+                        weeks.update(chunk_weeks)
+                        self._update(job_id, processed_rows=processed, written_rows=written)
+                finally:
+                    # Части, закоммиченные до ошибки, уже в study_count — кэши сбрасываются и для них
+                    if weeks:
+                        for callback in self._callbacks:
+                            callback(sorted(weeks))
+                self._update(job_id, status='Done', finished_at=datetime.now())
+            except Exception as e:
+                logging.exception(f'Study count upload {job_id} failed')
+                db.session.rollback()
+                self._update(job_id, status='Failed', error=str(e), finished_at=datetime.now())
+            finally:
+                os.remove(path)
@@ -0,0 +1,48 @@
+"""Пропускная способность проверки паролей (логинов в секунду на ядро).
+
+    python -m benchmarks.bench_password_hashing --workers 4 --logins 200
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash
+
+from app.passwords import PasswordHasher
+
+
+def run(method, workers, logins, concurrency):
+    hasher = PasswordHasher(method=method, workers=workers, max_pending=concurrency)
+
+    pwhash = generate_password_hash('benchmark-password', method=method)
+    # Прогрев пула, чтобы не учитывать запуск процессов
+    hasher.verify(pwhash, 'benchmark-password')
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as threads:
+        results = list(threads.map(lambda _: hasher.verify(pwhash, 'benchmark-password'), range(logins)))
+    elapsed = time.perf_counter() - started
+    hasher.shutdown()
+
+    assert all(results)
+    cores = workers or 1
+    return logins / elapsed, logins / elapsed / cores
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--method', default='scrypt:32768:8:1')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=None)
+    args = parser.parse_args()
+
+    concurrency = args.concurrency or max(args.workers, 1) * 2
+    total, per_core = run(args.method, args.workers, args.logins, concurrency)
+    print(f'method={args.method} workers={args.workers} logins={args.logins}')
+    print(f'{total:.1f} logins/s total, {per_core:.1f} logins/s per core')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Сравнение движков прогноза: sklearn (forest_model.pkl) и compiled (NumPy).
+
+    python -m benchmarks.bench_predictor --repeat 50
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.ml.predictor import Predictor, week_range
+
+
+def bench(engine, year_weeks, repeat):
+    tracemalloc.start()
+    started = time.perf_counter()
+    predictor = Predictor(engine=engine)
+    predictor.warmup()
+    load_time = time.perf_counter() - started
+    _, load_peak = tracemalloc.get_traced_memory()
+    resident, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    targets = predictor.targets
+    predictor.predict_many(targets, year_weeks)
+
+    timings = {}
+    for name, weeks in [('1 week', year_weeks[:1]), (f'{len(year_weeks)} weeks', year_weeks)]:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            result = predictor.predict_many(targets, weeks)
+        timings[name] = (time.perf_counter() - started) / repeat * 1000
+    return load_time, resident, load_peak, timings, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--year', type=int, default=2024)
+    args = parser.parse_args()
+
+    year_weeks = week_range(args.year, 1, 52)
+    results = {}
+    for engine in ['sklearn', 'compiled']:
+        load_time, resident, peak, timings, results[engine] = bench(engine, year_weeks, args.repeat)
+        print(f'{engine}: load {load_time * 1000:.0f} ms, models {resident / 2 ** 20:.1f} MiB '
+              f'(peak {peak / 2 ** 20:.1f} MiB)')
+        for name, ms in timings.items():
+            print(f'  predict_many(10 targets, {name}): {ms:.2f} ms')
+    print('identical results:', np.array_equal(results['sklearn'], results['compiled']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Память моделей при росте числа воркеров: mmap против копии в каждом процессе.
+
+Запускает N процессов — с загрузкой моделей до fork (gunicorn с preload_app)
+или в каждом воркере после fork, — каждый прогоняет прогноз по всем целям,
+и считает средний PSS на воркер (/proc/<pid>/smaps_rollup, только Linux).
+
+    python -m benchmarks.bench_worker_memory --workers 4 8 16 32
+"""
+import argparse
+import os
+import time
+
+from app.ml.predictor import Predictor, week_range
+
+
+def pss_kib(pid):
+    with open(f'/proc/{pid}/smaps_rollup') as fh:
+        for line in fh:
+            if line.startswith('Pss:'):
+                return int(line.split()[1])
+    return 0
+
+
+def run(workers, mmap, preload):
+    predictor = Predictor(engine='compiled', mmap=mmap)
+    if preload:
+        predictor.warmup()
+    year_weeks = week_range(2024, 1, 52)
+
+    pids = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            predictor.predict_many(predictor.targets, year_weeks)
+            os.write(write_fd, b'1')
+            time.sleep(3600)
+            os._exit(0)
+        os.close(write_fd)
+        os.read(read_fd, 1)
+        os.close(read_fd)
+        pids.append(pid)
+
+    total = sum(pss_kib(pid) for pid in pids)
+    for pid in pids:
+        os.kill(pid, 9)
+        os.waitpid(pid, 0)
+    return total / workers
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    for preload in [False, True]:
+        for mmap in [False, True]:
+            for workers in args.workers:
+                per_worker = run(workers, mmap, preload)
+                print(f'preload={preload} mmap={mmap} workers={workers}: '
+                      f'{per_worker / 1024:.1f} MiB PSS per worker')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+# gunicorn -c gunicorn.conf.py
+#
+# Приложение и модели прогноза загружаются в мастере до fork (preload_app),
+# массивы моделей отображены из compiled_models.npz через mmap, поэтому все
+# воркеры делят одну физическую копию страниц.
+import gc
+import multiprocessing
+import os
+
+os.environ.setdefault('PREDICTOR_WARMUP', '1')
+
+wsgi_app = 'run:app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # Объекты, созданные до fork, не трогаем сборщиком мусора в воркерах,
+    # иначе копирование страниц при записи съедает выигрыш от preload
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import db
+    from run import app
+
+    # Соединения с БД, открытые в мастере, воркерам не передаём
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -1,42 +1,41 @@
+"""Импорт недельного количества исследований из Excel или CSV.
+
+    python import_study_counts.py [исследования.xlsx] [--incremental] [--batch-size 5000]
+
+Повторный запуск с тем же файлом безопасен: существующие недели обновляются.
+С --incremental загружаются только недели позже последней в базе.
+Итоги по месяцам, кварталам и годам пересчитываются для затронутых лет.
+"""
+import argparse
+import time
+
 import pandas as pd
+
 from app import create_app, db
-from app.models import StudyCount
-import uuid
+from app.services import rollups, study_counts
+
+parser = argparse.ArgumentParser()
+parser.add_argument('path', nargs='?', default='исследования.xlsx')
+parser.add_argument('--incremental', action='store_true')
+parser.add_argument('--batch-size', type=int, default=study_counts.BATCH_SIZE)
+args = parser.parse_args()
 
 app = create_app()
 
-# Load the Excel file
-file_path = 'исследования.xlsx'
-df = pd.read_excel(file_path)
-
-# Mapping of original study type names to the desired names
-study_type_mapping = {
-    'Денситометр': 'Денситометрия',
-    'КТ': 'КТ',
-    'КТ с КУ 1 зона': 'КТ с КУ 1 зона',
-    'КТ с КУ 2 и более зон': 'КТ с КУ 2 и более зон',
-    'ММГ': 'ММГ',
-    'МРТ': 'МРТ',
-    'МРТ с КУ 1 зона': 'МРТ с КУ 1 зона',
-    'МРТ с КУ 2 и более зон': 'МРТ с КУ 2 и более зон',
-    'РГ': 'РГ',
-    'Флюорограф': 'ФЛГ'
-}
-
-
-# Create the study_count entries
+started = time.perf_counter()
+if args.path.endswith('.csv'):
+    df = pd.read_csv(args.path)
+else:
+    df = pd.read_excel(args.path)
+rows = study_counts.reshape(df)
+
 with app.app_context():
-    for _, row in df.iterrows():
-        for original_study_type, desired_study_type in study_type_mapping.items():
-            if pd.notna(row[original_study_type]):
-                new_study_count = StudyCount(
-                    id=uuid.uuid4(),
-                    year=int(row['Год']),
-                    week_number=int(row['Номер недели']),
-                    study_type=desired_study_type,
-                    study_count=row[original_study_type]
-                )
-                db.session.add(new_study_count)
-    db.session.commit()
-
-print("Импорт данных завершен успешно.")
+    with db.engine.begin() as conn:
+        removed = study_counts.ensure_unique_index(conn)
+        written, weeks = study_counts.load(conn, rows, incremental=args.incremental, batch_size=args.batch_size)
+        rollups.refresh(conn, weeks)
+
+if removed:
+    print(f"Удалены дубли прежнего импорта: {removed} ключей.")
+print(f"Импорт данных завершен успешно: {written} строк, {len(weeks)} недель "
+      f"за {time.perf_counter() - started:.2f} с.")
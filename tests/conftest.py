@@ -0,0 +1,182 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+
+from app.config import Config
+from app.ml.compiled import compile_directory
+from app.ml.predictor import FEATURES, iso_week_range
+from app.ml.registry import ModelRegistry, publish_version, write_manifest
+
+TARGETS = ['КТ', 'МРТ']
+
+
+# Тесты идут на SQLite: JSONB там хранится как JSON
+@compiles(JSONB, 'sqlite')
+def _compile_jsonb(type_, compiler, **kw):
+    return 'JSON'
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('app')
+    Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp / "app.sqlite"}'
+    Config.PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    Config.PASSWORD_HASH_WORKERS = 0
+    Config.REVOCATION_BACKEND = 'sqlite'
+    Config.REVOCATION_SQLITE_PATH = str(tmp / 'revoked.sqlite')
+    Config.FORECAST_CACHE_WARM_WEEKS = 0
+    Config.STUDY_COUNT_UPLOAD_DIR = str(tmp_path_factory.mktemp('uploads'))
+    Config.MODEL_REGISTRY_WATCH_INTERVAL = 0
+    Config.MAIL_SUPPRESS_SEND = True
+
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture(autouse=True)
+def clean_state(app):
+    yield
+    from app import db, identity_cache
+    from app.routes.manager import capacity, demand_service, forecasts
+
+    with app.app_context():
+        db.session.remove()
+        with db.engine.begin() as conn:
+            for table in reversed(db.metadata.sorted_tables):
+                conn.execute(table.delete())
+    identity_cache.clear()
+    demand_service.cache.clear()
+    forecasts.local.clear()
+    capacity.invalidate()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    from app import db
+    from app.models import Users
+
+    def make_user(email, role='manager', approved=True, password='secret'):
+        with app.app_context():
+            user = Users(full_name='Иванов Иван Иванович', email=email, role=role, approved=approved)
+            user.set_password(password)
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+
+    return make_user
+
+
+@pytest.fixture
+def login(client):
+    def login(email, password='secret'):
+        response = client.post('/auth/login', json={'email': email, 'password': password})
+        assert response.status_code == 200, response.get_json()
+        return {'Authorization': f'Bearer {response.get_json()["access_token"]}'}
+
+    return login
+
+
+@pytest.fixture
+def manager(make_user, login):
+    """Заголовки подтверждённого руководителя."""
+    make_user('manager@example.com')
+    return login('manager@example.com')
+
+
+def small_forest(seed=0, n_estimators=10):
+    """Небольшой лес по неделям 2019-2023 для тестов прогноза."""
+    weeks = iso_week_range(2019, 1, 2023, 52)
+    rng = np.random.default_rng(seed)
+    values = 100 + 10 * np.sin(weeks[:, 1] / 8) + rng.normal(0, 5, len(weeks))
+    forest = RandomForestRegressor(n_estimators=n_estimators, random_state=seed)
+    return forest.fit(pd.DataFrame(weeks, columns=FEATURES), values)
+
+
+def write_version(root, version, seed=0):
+    """Каталог версии моделей: forest_model.pkl по целям и compiled_models.npz."""
+    for i, target in enumerate(TARGETS):
+        os.makedirs(os.path.join(root, version, target))
+        joblib.dump(small_forest(seed + i), os.path.join(root, version, target, 'forest_model.pkl'))
+    compile_directory(os.path.join(root, version))
+    publish_version(version, root=root)
+
+
+@pytest.fixture
+def models_root(tmp_path):
+    """Корень реестра с одной активной версией v1."""
+    root = str(tmp_path / 'models')
+    os.makedirs(root)
+    write_manifest({'current': 'v1', 'versions': {}}, root)
+    write_version(root, 'v1')
+    return root
+
+
+@pytest.fixture
+def registry(app, models_root):
+    """Отдельный от приложения реестр поверх ``models_root``."""
+    registry = ModelRegistry(models_root)
+    registry.init_app(app)
+    return registry
+
+
+@pytest.fixture
+def add_study_counts(app):
+    """Пишет study_count из словаря {(год, неделя, тип исследования): количество}."""
+    from app import db
+    from app.models import StudyCount
+
+    def add_study_counts(values):
+        with app.app_context():
+            db.session.add_all(
+                StudyCount(year=year, week_number=week, study_type=study_type, study_count=count)
+                for (year, week, study_type), count in values.items()
+            )
+            db.session.commit()
+
+    return add_study_counts
+
+
+@pytest.fixture
+def add_doctors(app):
+    """Создаёт врачей из словарей (full_name, main_modality, additional_modalities, rate, ...); возвращает id."""
+    from app import db
+    from app.models import Doctors, Modality, Users
+
+    def add_doctors(specs):
+        with app.app_context():
+            modalities = {modality.name: modality for modality in Modality.query.all()}
+
+            def modality(name):
+                if name not in modalities:
+                    modalities[name] = Modality(name=name)
+                    db.session.add(modalities[name])
+                    db.session.flush()
+                return modalities[name]
+
+            doctors = []
+            for i, spec in enumerate(specs):
+                user = Users(full_name=spec.get('full_name', f'Врач {i:03d}'), email=f'doctor{i}@example.com',
+                             role='doctor', approved=True, password_hash='x')
+                doctor = Doctors(user=user, experience='5', main_modality=modality(spec.get('main_modality', 'КТ')),
+                                 gender=spec.get('gender', 'Женский'), rate=spec.get('rate', 1.0),
+                                 status=spec.get('status', 'Активен'), phone='+70000000000')
+                doctor.additional_modalities = [modality(name) for name in spec.get('additional_modalities', [])]
+                db.session.add(doctor)
+                doctors.append(doctor)
+            db.session.commit()
+            return [doctor.id for doctor in doctors]
+
+    return add_doctors
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.ml.backtest import backtest_target, errors, rolling_origins, run
+from app.ml.predictor import iso_week_range
+
+
+def history(weeks=80):
+    index = pd.MultiIndex.from_tuples([tuple(row) for row in iso_week_range(2022, 1, 2025, 1)[:weeks].tolist()])
+    trend = np.arange(weeks, dtype=np.float64)
+    return pd.DataFrame({'КТ': 100 + trend, 'МРТ': 50 + 2 * trend}, index=index)
+
+
+def test_errors():
+    assert errors([10, 20, 0], [12, 18, 1]) == {'mae': 1.667, 'mape': 15.0}
+    assert errors([0, 0], [1, 1])['mape'] is None
+
+
+def test_rolling_origins():
+    assert rolling_origins(20, horizon=4, step=4, min_train=8) == [8, 12, 16]
+    assert rolling_origins(10, horizon=4, step=4, min_train=8) == []
+
+
+def test_run_scores_only_rolling_windows():
+    report = run(history(), horizon=4, step=8, min_train=52, workers=1)
+    rows = {row['target']: row for row in report['targets']}
+    assert rows.keys() == {'КТ', 'МРТ'}
+    assert rows['КТ']['origins'] == len(rolling_origins(80, 4, 8, 52))
+    # Активная версия моделей не оценивается: она обучена на этих же неделях
+    assert set(rows['КТ']) == {'target', 'weeks', 'origins', 'retrained', 'compiled'}
+    assert rows['КТ']['retrained']['mae'] > 0
+
+
+def test_compiled_format_matches_sklearn_on_the_same_windows():
+    features = history().index.to_frame(index=False).to_numpy()
+    values = history()['КТ'].to_numpy()
+    result = backtest_target('КТ', features, values, [52, 60, 68], horizon=4,
+                             params={'n_estimators': 5, 'random_state': 0})
+    compiled, retrained = result['compiled'], result['retrained']
+    assert compiled['max_abs_diff'] == 0
+    assert (compiled['mae'], compiled['mape']) == (retrained['mae'], retrained['mape'])
+    assert compiled['compile_seconds'] >= 0 and compiled['predict_ms'] >= 0
+
+
+def test_run_refuses_short_history():
+    with pytest.raises(ValueError, match='КТ'):
+        run(history(30), min_train=52, workers=1)
+
+
+def test_backtest_target_requires_origins():
+    with pytest.raises(ValueError):
+        backtest_target('КТ', np.zeros((10, 2)), np.zeros(10), [], horizon=4)
@@ -0,0 +1,221 @@
+import numpy as np
+import pytest
+
+from app import db
+from app.models import Doctors
+from app.routes.manager import capacity
+from app.services.capacity import lacking
+from app.services.demand import STUDY_TYPES
+
+KT, MRT, RG = (STUDY_TYPES.index(name) for name in ['КТ', 'МРТ', 'РГ'])
+
+
+@pytest.fixture
+def doctors(add_doctors):
+    return add_doctors([
+        {'main_modality': 'КТ', 'additional_modalities': ['МРТ'], 'rate': 1.0},
+        {'main_modality': 'МРТ', 'rate': 0.5},
+        {'main_modality': 'РГ', 'additional_modalities': ['Неизвестная'], 'rate': 1.25},
+    ])
+
+
+def week_demand(**counts):
+    """study_count на 2024-W10 для всех типов: 0, кроме переданных."""
+    return {(2024, 10, study_type): float(counts.get(study_type, 0)) for study_type in STUDY_TYPES}
+
+
+def test_snapshot_counts_and_minutes(app, doctors):
+    with app.app_context():
+        snapshot = capacity.snapshot
+    assert snapshot.counts[[KT, MRT, RG]].tolist() == [1, 2, 1]
+    assert snapshot.minutes[[KT, MRT, RG]].tolist() == [2400, 3600, 3000]
+    assert snapshot.counts.sum() == 4
+    assert not snapshot.minutes.flags.writeable
+
+
+def test_doctors_by_study_type(app, doctors):
+    with app.app_context():
+        assert sorted(capacity.doctors('МРТ')) == sorted(str(doctor_id) for doctor_id in doctors[:2])
+        assert capacity.doctors('ММГ') == []
+
+
+def test_snapshot_is_rebuilt_after_commit(app, doctors):
+    with app.app_context():
+        before = capacity.snapshot
+        assert capacity.snapshot is before
+        db.session.get(Doctors, doctors[1]).rate = 1.0
+        db.session.commit()
+        assert capacity.snapshot is not before
+        assert capacity.snapshot.minutes[MRT] == 4800
+
+
+def test_lacking_rounds_to_whole_doctors():
+    required = np.array([5100, 4500, 100])
+    available = np.array([2400, 3600, 3000])
+    assert lacking(required, available).tolist() == [1, 0, 0]
+
+
+def test_analyze_single_week(client, manager, doctors, add_study_counts):
+    add_study_counts(week_demand(КТ=170, МРТ=100))
+    response = client.post('/manager/analyze_doctors', headers=manager, json={'start_date': '2024-03-06'})
+    assert response.status_code == 200
+    rows = {row['type']: row for row in response.get_json()}
+    assert list(rows) == STUDY_TYPES
+    assert rows['КТ'] == {'type': 'КТ', 'quantity': 1, 'isEnough': False, 'lack': 1, 'capacitySource': 'rate'}
+    assert (rows['МРТ']['quantity'], rows['МРТ']['isEnough'], rows['МРТ']['lack']) == (2, False, 0)
+    assert rows['РГ']['isEnough']
+
+
+@pytest.fixture
+def schedules(app, doctors):
+    """2024-W10: первый врач — 8 ч в пн и вт и отпуск в ср, второй — 8 ч в пн (ставка 0,5)."""
+    from datetime import date, time
+
+    from app.models import DayType, DoctorSchedule
+
+    days = [(0, date(2024, 3, 4), DayType.WORKING_DAY), (0, date(2024, 3, 5), DayType.WORKING_DAY),
+            (0, date(2024, 3, 6), DayType.VACATION), (1, date(2024, 3, 4), DayType.WORKING_DAY)]
+    with app.app_context():
+        db.session.add_all(
+            DoctorSchedule(doctor_id=doctors[i], date=day, start_time=time(8), end_time=time(16),
+                           break_minutes=0, hours_worked=8, day_type=day_type)
+            for i, day, day_type in days
+        )
+        db.session.commit()
+    return doctors
+
+
+def test_schedule_hours_per_doctor(app, schedules):
+    with app.app_context():
+        snapshot = capacity.snapshot
+        hours, scheduled = capacity.schedule_hours([(2024, 10), (2024, 11)], snapshot)
+    by_doctor = {doctor_id: i for i, doctor_id in enumerate(snapshot.doctor_ids)}
+    rows = [by_doctor[str(doctor_id)] for doctor_id in schedules]
+    # Третий врач без графика на W10 считается по ставке, а не нулём
+    assert hours[0, rows].tolist() == [16, 4, 50]
+    assert scheduled[0, rows].tolist() == [True, True, False]
+    assert not scheduled[1].any()
+    assert hours[1].tolist() == snapshot.hours.tolist()
+
+
+def test_available_minutes_fall_back_to_rates(app, schedules):
+    with app.app_context():
+        minutes, scheduled = capacity.available_minutes([(2024, 11), (2024, 10)])
+        assert minutes[0].tolist() == capacity.snapshot.minutes.tolist()
+    assert minutes[1, [KT, MRT, RG]].tolist() == [960, 1200, 3000]
+    assert scheduled.tolist() == [False, True]
+
+
+def test_vacation_only_week_is_not_rate_capacity(app, doctors):
+    from datetime import date, time
+
+    from app.models import DayType, DoctorSchedule
+
+    with app.app_context():
+        db.session.add_all(
+            DoctorSchedule(doctor_id=doctors[0], date=date(2024, 3, day), start_time=time(8), end_time=time(16),
+                           break_minutes=0, hours_worked=8, day_type=DayType.VACATION)
+            for day in range(4, 9)
+        )
+        db.session.commit()
+        minutes, scheduled = capacity.available_minutes([(2024, 10)])
+        hours, week_scheduled = capacity.week_hours(2024, 10)
+        by_doctor = dict(zip(capacity.snapshot.doctor_ids, hours.tolist()))
+    assert scheduled.tolist() == [True]
+    assert week_scheduled
+    # Врач в отпуске всю неделю не работает; остальные — по ставкам
+    assert [by_doctor[str(doctor_id)] for doctor_id in doctors] == [0, 20, 50]
+    assert minutes[0, [KT, MRT, RG]].tolist() == [0, 1200, 3000]
+
+
+def test_partially_scheduled_week_keeps_other_doctors(app, doctors):
+    from datetime import date, time
+
+    from app.models import DayType, DoctorSchedule
+
+    with app.app_context():
+        db.session.add(DoctorSchedule(doctor_id=doctors[2], date=date(2024, 3, 4), start_time=time(8),
+                                      end_time=time(12), break_minutes=0, hours_worked=4,
+                                      day_type=DayType.WORKING_DAY))
+        db.session.commit()
+        minutes, _ = capacity.available_minutes([(2024, 10)])
+    # Одна смена РГ не обнуляет врачей КТ и МРТ без графиков
+    assert minutes[0, [KT, MRT, RG]].tolist() == [2400, 3600, 300]
+
+
+def test_week_hours_follow_snapshot_order(app, schedules):
+    with app.app_context():
+        snapshot = capacity.snapshot
+        hours, scheduled = capacity.week_hours(2024, 10)
+        assert scheduled
+        by_doctor = dict(zip(snapshot.doctor_ids, hours.tolist()))
+        assert [by_doctor[str(doctor_id)] for doctor_id in schedules] == [16, 4, 50]
+        assert capacity.week_hours(2024, 10)[0] is hours
+
+        hours, scheduled = capacity.week_hours(2024, 11)
+        assert not scheduled
+        assert hours is snapshot.hours
+
+
+def test_week_hours_use_given_snapshot(app, schedules):
+    from app.services.capacity import snapshot_from
+
+    with app.app_context():
+        current = capacity.snapshot
+        cached, _ = capacity.week_hours(2024, 10)
+        # Снимок, взятый до появления первого врача
+        keep = current.doctor_ids != str(schedules[0])
+        older = snapshot_from(current.doctor_ids[keep], current.rates[keep], current.hours[keep],
+                              current.main[keep], current.additional[keep])
+        hours, _ = capacity.week_hours(2024, 10, older)
+        assert len(hours) == len(older.doctor_ids) == 2
+        assert dict(zip(older.doctor_ids, hours.tolist()))[str(schedules[1])] == 4
+        # Часы к устаревшему снимку не вытесняют закэшированные для текущего
+        assert capacity.week_hours(2024, 10)[0] is cached
+
+
+def test_analyze_uses_schedules(client, manager, schedules, add_study_counts):
+    add_study_counts(week_demand(КТ=40))
+    response = client.post('/manager/analyze_doctors', headers=manager, json={'start_date': '2024-03-06'})
+    rows = {row['type']: row for row in response.get_json()}
+    assert rows['КТ']['capacitySource'] == 'schedule'
+    # 40 КТ по 30 минут — 1200 минут при 960 по графику
+    assert not rows['КТ']['isEnough']
+
+
+def test_analyze_horizon(client, manager, schedules, add_study_counts):
+    add_study_counts(week_demand(КТ=40))
+    response = client.post('/manager/analyze_doctors', headers=manager,
+                           json={'start_date': '2024-03-06', 'end_date': '2024-03-20'})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data['year'], data['week']) == ([2024] * 3, [10, 11, 12])
+    assert data['capacitySource'] == ['schedule', 'rate', 'rate']
+    assert data['quantity']['МРТ'] == 2
+    assert data['requiredMinutes']['КТ'][0] == 1200
+    assert data['availableMinutes']['КТ'] == [960, 2400, 2400]
+    assert data['isEnough']['КТ'][0] is False
+    assert all(len(data[key]['РГ']) == 3 for key in ['lack', 'isEnough', 'requiredMinutes', 'availableMinutes'])
+
+
+def test_analyze_horizon_across_year_boundary(client, manager, doctors):
+    response = client.post('/manager/analyze_doctors', headers=manager,
+                           json={'start_date': '2020-12-21', 'end_date': '2021-01-04'})
+    assert response.get_json()['week'] == [52, 53, 1]
+
+
+@pytest.mark.parametrize('body', [
+    {},
+    {'start_date': '06.03.2024'},
+    {'start_date': '2024-03-06', 'end_date': '2024-03-01'},
+])
+def test_analyze_rejects_invalid_dates(client, manager, body):
+    assert client.post('/manager/analyze_doctors', headers=manager, json=body).status_code == 400
+
+
+def test_analyze_horizon_is_capped(client, manager, doctors, app):
+    weeks = app.config['MAX_RANGE_WEEKS']
+    response = client.post('/manager/analyze_doctors', headers=manager,
+                           json={'start_date': '2024-01-01', 'end_date': '2124-01-01'})
+    assert response.status_code == 400
+    assert str(weeks) in response.get_json()['message']
@@ -0,0 +1,83 @@
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.ml.compiled import COMPILED_FILE, compile_forest, compiled_targets, load_compiled, save_compiled
+from app.ml.predictor import FEATURES, Predictor
+from app.ml.registry import MODELS_ROOT, current_models_dir
+from tests.conftest import TARGETS, small_forest
+
+
+def features(count=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.stack([rng.integers(2015, 2035, count), rng.integers(1, 54, count)], axis=1)
+
+
+def test_compiled_forest_matches_sklearn_bit_for_bit():
+    forest = small_forest(n_estimators=25)
+    X = features()
+    expected = forest.predict(pd.DataFrame(X, columns=FEATURES))
+    assert np.array_equal(compile_forest(forest).predict(X), expected)
+
+
+def test_per_tree_values_match_estimators():
+    forest = small_forest()
+    X = features(50)
+    per_tree = compile_forest(forest).predict_trees(X)
+    frame = pd.DataFrame(X, columns=FEATURES)
+    expected = np.stack([tree.predict(frame.to_numpy(dtype=np.float32)) for tree in forest.estimators_])
+    assert np.array_equal(per_tree, expected)
+
+
+def test_saved_and_loaded_forest_is_equal(tmp_path):
+    forests = {target: compile_forest(small_forest(seed)) for seed, target in enumerate(TARGETS)}
+    path = str(tmp_path / COMPILED_FILE)
+    save_compiled(forests, path)
+
+    assert compiled_targets(path) == sorted(TARGETS)
+    X = features()
+    for target, forest in forests.items():
+        assert np.array_equal(load_compiled(path, target).predict(X), forest.predict(X))
+    with pytest.raises(KeyError):
+        load_compiled(path, 'ФЛГ')
+
+
+@pytest.mark.skipif(not os.path.isdir(MODELS_ROOT), reason='нет сохранённых моделей')
+def test_engines_agree_on_saved_models():
+    sklearn = Predictor(current_models_dir(), engine='sklearn')
+    compiled = Predictor(current_models_dir(), engine='compiled')
+    year_weeks = [tuple(row) for row in features(200).tolist()]
+    assert compiled.targets == sklearn.targets
+    assert np.array_equal(compiled.predict_many(compiled.targets, year_weeks),
+                          sklearn.predict_many(sklearn.targets, year_weeks))
+
+
+def test_auto_engine_prefers_compiled(models_root):
+    predictor = Predictor(os.path.join(models_root, 'v1'))
+    assert predictor.compiled
+    os.remove(os.path.join(models_root, 'v1', COMPILED_FILE))
+    assert not predictor.compiled
+    assert predictor.targets == sorted(TARGETS)
+
+
+def test_memory_mapped_forest_matches_loaded(models_root):
+    path = os.path.join(models_root, 'v1', COMPILED_FILE)
+    mapped = load_compiled(path, 'КТ', mmap=True)
+    assert isinstance(mapped.value, np.memmap)
+    assert not mapped.value.flags.writeable
+    X = features()
+    assert np.array_equal(mapped.predict(X), load_compiled(path, 'КТ').predict(X))
+
+
+def test_compressed_archive_cannot_be_memory_mapped(tmp_path):
+    path = str(tmp_path / COMPILED_FILE)
+    np.savez_compressed(path, targets=np.array(['КТ']),
+                        **{f'0_{name}': value for name, value in vars(compile_forest(small_forest())).items()
+                           if name != 'max_depth'})
+    with zipfile.ZipFile(path) as archive:
+        assert archive.infolist()[0].compress_type == zipfile.ZIP_DEFLATED
+    with pytest.raises(ValueError):
+        load_compiled(path, 'КТ', mmap=True)
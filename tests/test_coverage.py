@@ -0,0 +1,103 @@
+from datetime import date, time
+
+import numpy as np
+import pytest
+
+from app import db
+from app.models import DayType, DoctorSchedule
+from app.services import coverage
+from app.services.demand import STUDY_TYPES
+
+KT, MRT, RG = (STUDY_TYPES.index(name) for name in ['КТ', 'МРТ', 'РГ'])
+
+
+@pytest.fixture
+def shifts(app, add_doctors):
+    doctors = add_doctors([
+        {'main_modality': 'КТ', 'additional_modalities': ['МРТ']},
+        {'main_modality': 'КТ'},
+        {'main_modality': 'РГ'},
+    ])
+    rows = [
+        (0, date(2024, 3, 4), time(8), time(16), 60, DayType.WORKING_DAY),
+        (1, date(2024, 3, 4), time(12), time(20), 0, DayType.WORKING_DAY),
+        # Ночная смена предыдущего дня
+        (2, date(2024, 3, 3), time(22), time(6), 0, DayType.WORKING_DAY),
+        (2, date(2024, 3, 4), time(8), time(20), 0, DayType.VACATION),
+    ]
+    with app.app_context():
+        db.session.add_all(
+            DoctorSchedule(doctor_id=doctors[i], date=day, start_time=start, end_time=end,
+                           break_minutes=break_minutes, hours_worked=8, day_type=day_type)
+            for i, day, start, end, break_minutes, day_type in rows
+        )
+        db.session.commit()
+
+
+def test_hourly_coverage(app, shifts):
+    with app.app_context():
+        hourly = coverage.schedule_coverage(date(2024, 3, 4), 1, 60)
+    assert hourly.shape == (24, len(STUDY_TYPES))
+    assert hourly[[7, 8, 12, 16, 20], KT].tolist() == [0, 0.875, 1.875, 1, 0]
+    assert hourly[8, MRT] == 0.875
+    assert hourly[:, RG].tolist() == [1] * 6 + [0] * 18
+
+
+def test_quarter_hour_slots_keep_doctor_minutes(app, shifts):
+    with app.app_context():
+        hourly = coverage.schedule_coverage(date(2024, 3, 4), 2, 60)
+        quarters = coverage.schedule_coverage(date(2024, 3, 4), 2, 15)
+    assert quarters.shape == (2 * 96, len(STUDY_TYPES))
+    assert np.allclose(quarters.sum(axis=0) * 15, hourly.sum(axis=0) * 60)
+    assert np.allclose(quarters.reshape(48, 4, -1).mean(axis=1), hourly)
+
+
+def test_opening_minutes():
+    # 2024-03-09 — суббота
+    mask = coverage.opening_minutes(2, date(2024, 3, 8), time(8), time(20), [1, 2, 3, 4, 5])
+    assert mask.shape == (2 * 1440,)
+    assert mask[:1440].sum() == 12 * 60 and not mask[1440:].any()
+    assert not mask[8 * 60 - 1] and mask[8 * 60] and not mask[20 * 60]
+
+
+def test_demand_per_slot_spreads_weekly_minutes():
+    weekly = np.zeros((1, len(STUDY_TYPES)))
+    weekly[0, KT] = 84
+    open_mask = coverage.opening_minutes(7, date(2024, 3, 4), time(8), time(20), list(range(1, 8)))
+    demand = coverage.demand_per_slot(weekly, np.zeros(7 * 24, dtype=int), open_mask, 60, 12 * 60 * 7)
+    assert np.isclose(demand[:, KT].sum() * 60, 84 * 30)
+    assert demand[7, KT] == 0 and np.isclose(demand[8, KT], 84 * 30 / (12 * 60 * 7))
+
+
+def test_coverage_endpoint(client, manager, shifts, add_study_counts):
+    add_study_counts({(2024, 10, study_type): 0.0 for study_type in STUDY_TYPES} | {(2024, 10, 'КТ'): 84.0})
+    response = client.post('/manager/coverage', headers=manager,
+                           json={'start_date': '2024-03-04', 'end_date': '2024-03-10'})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert len(data['slots']) == 7 * 24
+    assert data['slots'][:2] == ['2024-03-04T00:00', '2024-03-04T01:00']
+    assert data['coverage']['КТ'][12] == 1.88
+    assert np.isclose(sum(data['demand']['КТ']) * 60, 84 * 30, atol=1)
+    assert np.isclose(data['gap']['КТ'][12], data['demand']['КТ'][12] - 1.875, atol=0.01)
+
+
+@pytest.mark.parametrize('body', [
+    {},
+    {'start_date': '04.03.2024'},
+    {'start_date': '2024-03-04', 'slot_minutes': 30},
+    {'start_date': '2024-03-04', 'slot_minutes': 15.0},
+    {'start_date': '2024-03-04', 'slot_minutes': True},
+    {'start_date': 20240304},
+    {'start_date': '2024-03-04', 'end_date': '2024-03-03'},
+    {'start_date': '2024-03-01', 'end_date': '2024-05-01'},
+])
+def test_coverage_rejects_invalid_input(client, manager, body):
+    assert client.post('/manager/coverage', headers=manager, json=body).status_code == 400
+
+
+def test_coverage_null_end_date_is_one_day(client, manager, shifts):
+    response = client.post('/manager/coverage', headers=manager,
+                           json={'start_date': '2024-03-04', 'end_date': None, 'slot_minutes': 15})
+    assert response.status_code == 200
+    assert len(response.get_json()['slots']) == 24 * 4
@@ -0,0 +1,62 @@
+import numpy as np
+
+from app.routes.manager import demand_service, registry
+from app.services.demand import STUDY_TYPES, iso_week, is_percentile
+
+KT = STUDY_TYPES.index('КТ')
+
+
+def test_iso_week():
+    from datetime import date
+    assert iso_week(date(2021, 1, 3)) == (2020, 53)
+    assert iso_week(date(2024, 12, 30)) == (2025, 1)
+
+
+def test_is_percentile():
+    assert all(map(is_percentile, [0, 50, 100, 12.5]))
+    assert not any(map(is_percentile, [-1, 101, '50', True, None, [50]]))
+
+
+def test_actual_values_and_forecast_gaps(app, add_study_counts):
+    add_study_counts({(2024, 10, 'КТ'): 123.0, (2024, 11, 'КТ'): 456.0})
+    year_weeks = [(2024, 10), (2024, 11), (2024, 12)]
+    with app.app_context():
+        demand = demand_service.weekly(year_weeks)
+        forecast = registry.predictor.predict_many(STUDY_TYPES, year_weeks).T
+
+    assert demand.values[:2, KT].tolist() == [123.0, 456.0]
+    assert demand.actual[:, KT].tolist() == [True, True, False]
+    assert not demand.actual[:, KT + 1].any()
+    assert np.allclose(demand.values[~demand.actual], forecast[~demand.actual])
+
+
+def test_results_are_cached_until_invalidated(app, add_study_counts):
+    with app.app_context():
+        before = demand_service.weekly([(2024, 10)]).values[0, KT]
+        add_study_counts({(2024, 10, 'КТ'): 999.0})
+        assert demand_service.weekly([(2024, 10)]).values[0, KT] == before
+        demand_service.invalidate()
+        assert demand_service.weekly([(2024, 10)]).values[0, KT] == 999.0
+
+
+def test_percentile_fills_gaps_with_band(app):
+    with app.app_context():
+        upper = demand_service.weekly([(2024, 10)], percentile=100).values[0]
+        lower = demand_service.weekly([(2024, 10)], percentile=0).values[0]
+        mean = demand_service.weekly([(2024, 10)]).values[0]
+    assert (lower <= mean).all() and (mean <= upper).all()
+    assert (lower < upper).any()
+
+
+def test_study_counts_endpoint(client, manager, add_study_counts):
+    add_study_counts({(2024, 10, 'КТ'): 123.0})
+    response = client.get('/manager/study_counts?start_date=2024-03-06', headers=manager)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['КТ'] == 123.0
+    assert set(data) == set(STUDY_TYPES)
+
+
+def test_study_counts_requires_valid_date(client, manager):
+    assert client.get('/manager/study_counts', headers=manager).status_code == 400
+    assert client.get('/manager/study_counts?start_date=06.03.2024', headers=manager).status_code == 400
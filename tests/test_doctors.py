@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import event
+
+from app import db
+
+
+def fetch_all(client, headers, **params):
+    pages, cursor = [], None
+    while True:
+        query = dict(params, **({'cursor': cursor} if cursor else {}))
+        response = client.get('/manager/doctors', headers=headers, query_string=query)
+        assert response.status_code == 200
+        pages.append(response.get_json())
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return pages
+
+
+def test_keyset_pages_cover_all_doctors_once(client, manager, add_doctors):
+    names = ['Петров', 'Андреев', 'Петров', 'Сидоров', 'Андреев', 'Борисов', 'Петров']
+    ids = add_doctors([{'full_name': name} for name in names])
+
+    pages = fetch_all(client, manager, limit=3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    doctors = [doctor for page in pages for doctor in page]
+    assert sorted(doctor['id'] for doctor in doctors) == sorted(str(doctor_id) for doctor_id in ids)
+    keys = [(doctor['full_name'], doctor['id']) for doctor in doctors]
+    assert keys == sorted(keys)
+
+
+def test_exact_last_page_has_no_cursor(client, manager, add_doctors):
+    add_doctors([{} for _ in range(4)])
+    response = client.get('/manager/doctors?limit=4', headers=manager)
+    assert len(response.get_json()) == 4
+    assert 'X-Next-Cursor' not in response.headers
+
+
+def test_filters(client, manager, add_doctors):
+    add_doctors([
+        {'full_name': 'А', 'main_modality': 'КТ', 'gender': 'Мужской'},
+        {'full_name': 'Б', 'main_modality': 'МРТ', 'additional_modalities': ['КТ']},
+        {'full_name': 'В', 'main_modality': 'МРТ', 'status': 'Отпуск'},
+        {'full_name': 'Г', 'main_modality': 'РГ'},
+    ])
+
+    def names(**params):
+        return [doctor['full_name'] for page in fetch_all(client, manager, **params) for doctor in page]
+
+    assert names(modality='КТ') == ['А', 'Б']
+    assert names(modality='МРТ', status='Активен') == ['Б']
+    assert names(gender='Мужской') == ['А']
+    assert names(modality='ММГ') == []
+
+    doctor = fetch_all(client, manager, modality='КТ', limit=1)[1][0]
+    assert (doctor['main_modality'], doctor['additional_modalities']) == ('МРТ', ['КТ'])
+
+
+def test_query_count_does_not_grow_with_page(app, client, manager, add_doctors):
+    add_doctors([{'additional_modalities': ['МРТ', 'РГ']} for _ in range(30)])
+    client.get('/manager/doctors?limit=1', headers=manager)
+
+    def count_queries(limit):
+        statements = []
+
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                client.get(f'/manager/doctors?limit={limit}', headers=manager)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+        return len(statements)
+
+    assert count_queries(2) == count_queries(30)
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=100000', 'cursor=not-base64', 'cursor=W10='])
+def test_invalid_parameters(client, manager, query):
+    assert client.get(f'/manager/doctors?{query}', headers=manager).status_code == 400
+
+
+@pytest.mark.parametrize('value', [['a', 1], [1, 'a'], {'a': 'b', 'c': 'd'}, ['a', 'not-a-uuid'], 'ab'])
+def test_malformed_cursor(client, manager, value):
+    import base64
+    import json
+
+    cursor = base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+    response = client.get('/manager/doctors', headers=manager, query_string={'cursor': cursor})
+    assert response.status_code == 400
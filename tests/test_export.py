@@ -0,0 +1,63 @@
+import csv
+import io
+
+import openpyxl
+import pytest
+
+from app.services.demand import EXPORT_NAMES, STUDY_TYPES
+
+
+def export(client, headers, **body):
+    return client.post('/manager/export_study_counts', headers=headers, json=body)
+
+
+def test_csv_export_across_year_boundary(client, manager, add_study_counts):
+    add_study_counts({(2020, 53, study_type): 7.0 for study_type in STUDY_TYPES})
+    add_study_counts({(2021, 1, 'КТ'): 3.0})
+    response = export(client, manager, start_date='2020-12-21', end_date='2021-01-11')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ['Год', 'Неделя', 'Данные'] + [EXPORT_NAMES[study_type] for study_type in STUDY_TYPES]
+    assert [row[:3] for row in rows[1:]] == [
+        ['2020', '52', 'Прогноз'], ['2020', '53', 'Факт'], ['2021', '1', 'Факт и прогноз'], ['2021', '2', 'Прогноз'],
+    ]
+    assert rows[2][3:] == ['7'] * len(STUDY_TYPES)
+    assert rows[3][3 + STUDY_TYPES.index('КТ')] == '3'
+
+
+def test_long_csv_export_is_streamed(client, manager):
+    response = export(client, manager, start_date='2020-01-06', end_date='2024-12-30')
+    assert response.is_streamed
+    assert len(response.get_data(as_text=True).splitlines()) == 1 + 261
+
+
+def test_excel_export(client, manager):
+    response = export(client, manager, start_date='2024-01-01', end_date='2024-01-15', format='excel')
+    assert response.status_code == 200
+    sheet = openpyxl.load_workbook(io.BytesIO(response.data)).active
+    rows = list(sheet.iter_rows(values_only=True))
+    assert rows[0][:3] == ('Год', 'Неделя', 'Данные')
+    assert [row[:2] for row in rows[1:]] == [(2024, 1), (2024, 2), (2024, 3)]
+
+
+@pytest.mark.parametrize('body', [
+    {},
+    {'start_date': '01.01.2024'},
+    {'start_date': '2024-02-01', 'end_date': '2024-01-01'},
+    {'start_date': 20240101},
+])
+def test_export_rejects_invalid_dates(client, manager, body):
+    assert export(client, manager, **body).status_code == 400
+
+
+def test_export_range_is_capped(app, client, manager):
+    response = export(client, manager, start_date='1924-01-07', end_date='2024-12-30')
+    assert response.status_code == 400
+    assert str(app.config['MAX_RANGE_WEEKS']) in response.get_json()['message']
+
+
+def test_export_null_end_date_is_one_week(client, manager):
+    response = export(client, manager, start_date='2024-03-06', end_date=None)
+    assert len(response.get_data(as_text=True).splitlines()) == 2
@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import select
+
+from app import db
+from app.bulk import insert_ignore
+from app.forecast_cache import ForecastCache
+from app.ml.registry import read_manifest, write_manifest
+from tests.conftest import TARGETS, write_version
+
+YEAR_WEEKS = [(2024, 52), (2025, 1), (2025, 2)]
+
+
+@pytest.fixture
+def cache(app, registry):
+    cache = ForecastCache(registry)
+    cache.init_app(app, db)
+    return cache
+
+
+def count_model_calls(monkeypatch, predictor):
+    calls = []
+    original = predictor.predict_many
+
+    def predict_many(targets, year_weeks):
+        calls.append((list(targets), list(year_weeks)))
+        return original(targets, year_weeks)
+
+    monkeypatch.setattr(predictor, 'predict_many', predict_many)
+    return calls
+
+
+def stored_versions(app, cache):
+    with app.app_context(), db.engine.connect() as conn:
+        return set(conn.execute(select(cache.table.c.model_version)).scalars())
+
+
+def test_cached_forecasts_equal_model_output(app, cache, registry):
+    with app.app_context():
+        result = cache.predict_many(TARGETS, YEAR_WEEKS)
+    assert result.tolist() == registry.predictor.predict_many(TARGETS, YEAR_WEEKS).tolist()
+
+
+def test_models_run_only_for_misses(app, cache, registry, monkeypatch):
+    calls = count_model_calls(monkeypatch, registry.predictor)
+    with app.app_context():
+        cache.predict_many(TARGETS, YEAR_WEEKS[:2])
+        cache.predict_many(TARGETS, YEAR_WEEKS)
+    assert calls == [(TARGETS, YEAR_WEEKS[:2]), (TARGETS, YEAR_WEEKS[2:])]
+
+
+def test_forecasts_are_shared_through_table(app, cache, registry, monkeypatch):
+    with app.app_context():
+        expected = cache.predict_many(TARGETS, YEAR_WEEKS)
+
+    other = ForecastCache(registry)
+    other.init_app(app, db)
+    calls = count_model_calls(monkeypatch, registry.predictor)
+    with app.app_context():
+        assert other.predict_many(TARGETS, YEAR_WEEKS).tolist() == expected.tolist()
+    assert calls == []
+
+
+def test_purge_keeps_versions_listed_in_manifest(app, cache, registry, models_root):
+    write_version(models_root, 'v2', seed=10)
+    keep = registry.model_versions()
+    rows = [{'model_version': version, 'target': 'КТ', 'year': 2024, 'week_number': 1, 'value': 1.0}
+            for version in keep | {'dropped'}]
+    with app.app_context():
+        with db.engine.begin() as conn:
+            insert_ignore(conn, cache.table, rows, ['model_version', 'target', 'year', 'week_number'])
+        cache.purge_stale()
+    assert stored_versions(app, cache) == keep
+
+    manifest = read_manifest(models_root)
+    del manifest['versions']['v2']
+    write_manifest(manifest, models_root)
+    with app.app_context():
+        cache.purge_stale()
+    assert stored_versions(app, cache) == registry.model_versions()
+    assert len(registry.model_versions()) < len(keep)
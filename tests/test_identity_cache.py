@@ -0,0 +1,41 @@
+from app import db, identity_cache
+from app.decorators import invalidate_identity
+from app.models import Users
+
+
+def set_approved(app, email, approved):
+    with app.app_context():
+        Users.query.filter_by(email=email).update({'approved': approved})
+        db.session.commit()
+
+
+def test_identity_is_cached_after_first_request(client, manager):
+    assert client.get('/manager/models', headers=manager).status_code == 200
+    identity = identity_cache.get('manager@example.com')
+    assert identity.role == 'manager'
+    assert identity.approved
+
+
+def test_cached_identity_is_used_until_invalidated(app, client, manager):
+    assert client.get('/manager/models', headers=manager).status_code == 200
+
+    set_approved(app, 'manager@example.com', False)
+    assert client.get('/manager/models', headers=manager).status_code == 200
+
+    invalidate_identity('manager@example.com')
+    assert client.get('/manager/models', headers=manager).status_code == 403
+
+
+def test_unknown_user_is_denied(app, client, manager):
+    with app.app_context():
+        Users.query.filter_by(email='manager@example.com').delete()
+        db.session.commit()
+    invalidate_identity('manager@example.com')
+    assert client.get('/manager/models', headers=manager).status_code == 403
+    assert identity_cache.get('manager@example.com') is None
+
+
+def test_wrong_role_is_denied(client, make_user, login):
+    make_user('doctor@example.com', role='doctor')
+    headers = login('doctor@example.com')
+    assert client.get('/manager/models', headers=headers).status_code == 403
@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.ml.predictor import Predictor
+from tests.conftest import TARGETS
+
+YEAR_WEEKS = [(2024, 1), (2024, 26), (2025, 1)]
+
+
+@pytest.mark.parametrize('engine', ['sklearn', 'compiled'])
+def test_interval_mean_matches_point_forecast(models_root, engine):
+    predictor = Predictor(os.path.join(models_root, 'v1'), engine=engine)
+    mean, bands = predictor.predict_intervals(TARGETS, YEAR_WEEKS, [10, 50, 90])
+    assert np.array_equal(mean, predictor.predict_many(TARGETS, YEAR_WEEKS))
+    assert bands.shape == (len(TARGETS), 3, len(YEAR_WEEKS))
+    assert (bands[:, 0] <= bands[:, 1]).all() and (bands[:, 1] <= bands[:, 2]).all()
+
+
+def test_extreme_percentiles_are_tree_min_and_max(models_root):
+    predictor = Predictor(os.path.join(models_root, 'v1'))
+    _, bands = predictor.predict_intervals(['КТ'], YEAR_WEEKS, [0, 100])
+    per_tree = predictor.get_forest('КТ').predict_trees(np.array(YEAR_WEEKS))
+    assert np.array_equal(bands[0, 0], per_tree.min(axis=0))
+    assert np.array_equal(bands[0, 1], per_tree.max(axis=0))
+
+
+def test_predict_returns_bands(client, manager):
+    response = client.post('/manager/predict', headers=manager, json={
+        'year': 2024, 'start_week': 1, 'end_week': 3, 'target': 'КТ', 'percentiles': [10, 90]
+    })
+    assert response.status_code == 200
+    data = response.get_json()
+    assert set(data['bands']) == {'p10', 'p90'}
+    assert len(data['bands']['p10']) == len(data['predictions']) == 3
+
+
+@pytest.mark.parametrize('percentiles', [['90'], [True], [150], [-1], 90, 'p90'])
+def test_predict_rejects_invalid_percentiles(client, manager, percentiles):
+    response = client.post('/manager/predict', headers=manager, json={
+        'year': 2024, 'start_week': 1, 'end_week': 3, 'percentiles': percentiles
+    })
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('endpoint', ['/manager/analyze_doctors', '/manager/simulate'])
+@pytest.mark.parametrize('percentile', [150, -5, '90', True, [90]])
+def test_demand_endpoints_reject_invalid_percentile(client, manager, endpoint, percentile):
+    response = client.post(endpoint, headers=manager, json={'start_date': '2024-03-04', 'percentile': percentile})
+    assert response.status_code == 400
+    assert 'Percentile' in response.get_json()['message']
+
+
+@pytest.mark.parametrize('endpoint', ['/manager/analyze_doctors', '/manager/simulate'])
+def test_demand_endpoints_accept_percentile(client, manager, endpoint):
+    response = client.post(endpoint, headers=manager, json={'start_date': '2024-03-04', 'percentile': 90.5})
+    assert response.status_code == 200
@@ -0,0 +1,59 @@
+import pytest
+
+from app.passwords import PasswordHasher
+
+
+@pytest.mark.parametrize('method', ['pbkdf2:sha256', 'pbkdf2:sha256:1000', 'scrypt', 'scrypt:16384:8:1'])
+def test_fresh_hash_does_not_need_rehash(method):
+    hasher = PasswordHasher(method=method)
+    assert not hasher.needs_rehash(hasher.hash('secret'))
+
+
+def test_hash_with_other_parameters_needs_rehash():
+    old = PasswordHasher(method='pbkdf2:sha256:1000')
+    new = PasswordHasher(method='pbkdf2:sha256:2000')
+    assert new.needs_rehash(old.hash('secret'))
+
+
+def test_prefix_follows_method_change():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000')
+    pwhash = hasher.hash('secret')
+    assert not hasher.needs_rehash(pwhash)
+    hasher.method = 'pbkdf2:sha256:2000'
+    assert hasher.needs_rehash(pwhash)
+
+
+def test_verify_in_process_pool():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=1)
+    try:
+        pwhash = hasher.hash('secret')
+        assert hasher.verify(pwhash, 'secret')
+        assert not hasher.verify(pwhash, 'wrong')
+    finally:
+        hasher.shutdown()
+
+
+def test_login_rehashes_outdated_hash_once(app, client, make_user):
+    from app import db
+    from app.models import Users
+
+    make_user('user@example.com', password='secret')
+    with app.app_context():
+        user = Users.query.filter_by(email='user@example.com').one()
+        user.password_hash = PasswordHasher(method='pbkdf2:sha256:500').hash('secret')
+        db.session.commit()
+
+    assert client.post('/auth/login', json={'email': 'user@example.com', 'password': 'secret'}).status_code == 200
+    with app.app_context():
+        rehashed = Users.query.filter_by(email='user@example.com').one().password_hash
+    assert rehashed.startswith('pbkdf2:sha256:1000$')
+
+    assert client.post('/auth/login', json={'email': 'user@example.com', 'password': 'secret'}).status_code == 200
+    with app.app_context():
+        assert Users.query.filter_by(email='user@example.com').one().password_hash == rehashed
+
+
+def test_login_rejects_wrong_password(client, make_user):
+    make_user('user@example.com', password='secret')
+    response = client.post('/auth/login', json={'email': 'user@example.com', 'password': 'wrong'})
+    assert response.status_code == 401
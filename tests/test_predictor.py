@@ -0,0 +1,66 @@
+import os
+
+import joblib
+import pandas as pd
+import pytest
+
+from app.ml.predictor import FEATURES, Predictor
+from tests.conftest import TARGETS, small_forest
+
+
+def test_models_are_loaded_lazily(models_root):
+    predictor = Predictor(os.path.join(models_root, 'v1'), engine='sklearn')
+    assert predictor.targets == sorted(TARGETS)
+    assert not predictor.models
+
+    predictor.get_model('КТ')
+    assert list(predictor.models) == ['КТ']
+
+
+def test_max_models_evicts_least_recently_used(models_root):
+    predictor = Predictor(os.path.join(models_root, 'v1'), engine='sklearn', max_models=1)
+    predictor.get_model('КТ')
+    predictor.get_model('МРТ')
+    assert list(predictor.models) == ['МРТ']
+
+
+def test_replaced_model_file_is_reloaded(models_root):
+    predictor = Predictor(os.path.join(models_root, 'v1'), engine='sklearn')
+    first = predictor.get_model('КТ')
+    version = predictor.model_version('КТ')
+    assert predictor.get_model('КТ') is first
+
+    joblib.dump(small_forest(seed=42), os.path.join(models_root, 'v1', 'КТ', 'forest_model.pkl'))
+    assert predictor.model_version('КТ') != version
+    assert predictor.get_model('КТ') is not first
+
+
+def test_unknown_target_raises_key_error(models_root):
+    for engine in ['sklearn', 'compiled']:
+        predictor = Predictor(os.path.join(models_root, 'v1'), engine=engine)
+        with pytest.raises(KeyError):
+            predictor.get_model('ФЛГ')
+
+
+def test_predict_matches_forest(models_root):
+    predictor = Predictor(os.path.join(models_root, 'v1'), engine='sklearn')
+    data = pd.DataFrame({'Год': [2024] * 3, 'Номер недели': [1, 2, 3]})
+    forest = joblib.load(os.path.join(models_root, 'v1', 'КТ', 'forest_model.pkl'))
+    assert predictor.predict('КТ', data) == list(forest.predict(data[FEATURES]))
+
+
+@pytest.mark.parametrize('engine', ['sklearn', 'compiled'])
+def test_predict_many_matches_per_target_predict(models_root, engine):
+    predictor = Predictor(os.path.join(models_root, 'v1'), engine=engine)
+    year_weeks = [(2024, 52), (2025, 1), (2025, 2)]
+    result = predictor.predict_many(TARGETS, year_weeks)
+
+    assert result.shape == (len(TARGETS), len(year_weeks))
+    data = pd.DataFrame(year_weeks, columns=FEATURES)
+    for i, target in enumerate(TARGETS):
+        assert result[i].tolist() == predictor.predict(target, data)
+
+
+def test_predict_many_without_weeks(models_root):
+    predictor = Predictor(os.path.join(models_root, 'v1'))
+    assert predictor.predict_many(TARGETS, []).shape == (len(TARGETS), 0)
@@ -0,0 +1,81 @@
+import os
+import time
+
+import pytest
+
+from app.ml.registry import read_manifest, set_current_version
+from tests.conftest import write_version
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_activate_swaps_in_background(registry, models_root):
+    write_version(models_root, 'v2', seed=10)
+    old = registry.predictor
+
+    assert registry.activate('v2') == 'v2'
+    assert read_manifest(models_root)['current'] == 'v2'
+    wait_for(lambda: registry.version == 'v2' and not registry._reloading)
+    assert registry.predictor is not old
+    assert registry.predictor.models_dir == os.path.join(models_root, 'v2')
+
+
+def test_activate_unknown_version(registry):
+    with pytest.raises(KeyError):
+        registry.activate('v9')
+    assert registry.version == 'v1'
+
+
+def test_reload_hooks_see_new_predictor_before_swap(registry, models_root):
+    write_version(models_root, 'v2', seed=10)
+    seen = []
+    registry.on_reload(lambda predictor: seen.append((predictor.models_dir, registry.version)))
+    set_current_version('v2', models_root)
+    registry.reload()
+    assert seen == [(os.path.join(models_root, 'v2'), 'v1')]
+    assert registry.version == 'v2'
+
+
+def test_failed_reload_is_retried_on_next_manifest_check(registry, models_root):
+    write_version(models_root, 'v2', seed=10)
+    failures = [RuntimeError('broken')]
+
+    def hook(predictor):
+        if failures:
+            raise failures.pop()
+
+    registry.on_reload(hook)
+    registry.watch_interval = 0.01
+    registry.activate('v2')
+    wait_for(lambda: not registry._reloading)
+    assert registry.version == 'v1'
+
+    def swapped():
+        time.sleep(0.02)
+        registry.predictor
+        return registry.version == 'v2'
+
+    wait_for(swapped)
+
+
+def test_manifest_change_is_picked_up(registry, models_root):
+    write_version(models_root, 'v2', seed=10)
+    registry.watch_interval = 0.01
+    set_current_version('v2', models_root)
+
+    def swapped():
+        time.sleep(0.02)
+        registry.predictor
+        return registry.version == 'v2'
+
+    wait_for(swapped)
+
+
+def test_activate_endpoint_rejects_unknown_version(client, manager):
+    response = client.post('/manager/models/activate', json={'version': 'missing'}, headers=manager)
+    assert response.status_code == 404
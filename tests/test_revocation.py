@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+from app.revocation import BloomFilter, SQLiteRevocationBackend, TokenRevocationList
+
+
+@pytest.fixture
+def revoked(tmp_path):
+    tokens = TokenRevocationList()
+    tokens.backend = SQLiteRevocationBackend(str(tmp_path / 'revoked.sqlite'))
+    tokens.local_size = 3
+    tokens.sync_interval = 3600
+    return tokens
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    keys = [f'jti-{i}' for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+    assert false_positives < 500
+
+
+def test_exact_set_keeps_latest_expiring_tokens(revoked):
+    now = time.time()
+    assert 'missing' not in revoked
+    for i in range(6):
+        revoked.add(f'jti-{i}', now + 100 + i)
+
+    assert sorted(revoked._recent) == ['jti-3', 'jti-4', 'jti-5']
+    # Вытесненные остаются отозванными: фильтр Блума отправляет в хранилище
+    assert all(f'jti-{i}' in revoked for i in range(6))
+    assert 'jti-other' not in revoked
+
+
+def test_re_adding_a_token_skips_stale_heap_entries(revoked):
+    now = time.time()
+    revoked.add('a', now + 10)
+    revoked.add('b', now + 20)
+    revoked.add('a', now + 30)
+    revoked.add('c', now + 40)
+    revoked.add('d', now + 50)
+
+    assert sorted(revoked._recent) == ['a', 'c', 'd']
+    assert revoked._recent['a'] == now + 30
+
+
+def test_rebuild_fills_exact_set_once(revoked):
+    now = time.time()
+    for i in range(50):
+        revoked.backend.add(f'jti-{i}', now + 100 + i)
+    revoked.backend.add('expired', now - 1)
+
+    revoked._rebuild(now)
+
+    assert sorted(revoked._recent) == ['jti-47', 'jti-48', 'jti-49']
+    assert len(revoked._expiry) == 3
+    assert all(f'jti-{i}' in revoked._bloom for i in range(50))
+    assert 'expired' not in revoked
+
+
+def test_expired_token_is_not_revoked(revoked):
+    now = time.time()
+    assert 'jti' not in revoked
+    revoked.add('jti', now - 1)
+    assert 'jti' not in revoked
+
+
+def test_logout_revokes_token(client, manager):
+    assert client.get('/auth/token_status', headers=manager).status_code == 200
+    assert client.post('/auth/logout', headers=manager).status_code == 200
+    assert client.get('/auth/token_status', headers=manager).status_code == 401
+    assert client.get('/manager/models', headers=manager).status_code == 401
+
+
+def shared_list(path, sync_interval):
+    """Список отзывов «другого воркера»: своё подключение к тому же хранилищу."""
+    tokens = TokenRevocationList()
+    tokens.backend = SQLiteRevocationBackend(path)
+    tokens.sync_interval = sync_interval
+    return tokens
+
+
+def test_revocation_reaches_other_worker_after_sync_interval(tmp_path):
+    path = str(tmp_path / 'shared.sqlite')
+    first, second = shared_list(path, 3600), shared_list(path, 3600)
+    assert 'jti' not in second
+
+    first.add('jti', time.time() + 100)
+    assert 'jti' in first
+    # До синхронизации второй воркер ещё принимает токен — окно устаревания
+    assert 'jti' not in second
+    second._last_sync -= second.sync_interval
+    assert 'jti' in second
+
+
+def test_zero_sync_interval_sees_revocation_immediately(tmp_path):
+    path = str(tmp_path / 'shared.sqlite')
+    first, second = shared_list(path, 3600), shared_list(path, 0)
+    assert 'jti' not in second
+    first.add('jti', time.time() + 100)
+    assert 'jti' in second
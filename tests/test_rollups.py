@@ -0,0 +1,73 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from app import db
+from app.models import StudyCountRollup
+from app.services import rollups
+
+
+def test_week_months_follow_thursday():
+    weeks = [(2020, 1), (2020, 53), (2021, 1), (2024, 5), (2025, 1), (2026, 53)]
+    expected = [(date.fromisocalendar(year, week, 4)).month for year, week in weeks]
+    years, numbers = zip(*weeks)
+    assert rollups.week_months(years, numbers).tolist() == expected
+
+
+def test_every_week_lands_in_one_month():
+    weeks = pd.DataFrame([(2020, week) for week in range(1, 54)], columns=['year', 'week_number'])
+    rows = weeks.assign(study_type='КТ', study_count=1.0)
+    totals = rollups.aggregate(rows).set_index(['period', 'number'])['study_count']
+    assert totals['year'].tolist() == [53.0]
+    assert totals['quarter'].sum() == totals['month'].sum() == 53
+
+
+def refresh(app, weeks=None):
+    with app.app_context(), db.engine.begin() as conn:
+        return rollups.refresh(conn, weeks)
+
+
+def stored(app, period):
+    table = StudyCountRollup.__table__
+    with app.app_context(), db.engine.connect() as conn:
+        rows = conn.execute(select(table.c.year, table.c.number, table.c.study_type, table.c.study_count,
+                                   table.c.weeks).where(table.c.period == period))
+        return {tuple(row[:3]): tuple(row[3:]) for row in rows}
+
+
+def test_refresh_recomputes_only_changed_years(app, add_study_counts):
+    add_study_counts({(2023, 1, 'КТ'): 10.0, (2023, 2, 'КТ'): 5.0, (2024, 1, 'КТ'): 7.0})
+    refresh(app)
+    assert stored(app, 'year') == {(2023, 1, 'КТ'): (15.0, 2), (2024, 1, 'КТ'): (7.0, 1)}
+
+    add_study_counts({(2024, 2, 'КТ'): 1.0, (2023, 3, 'КТ'): 100.0})
+    refresh(app, [(2024, 2)])
+    assert stored(app, 'year') == {(2023, 1, 'КТ'): (15.0, 2), (2024, 1, 'КТ'): (8.0, 2)}
+    assert refresh(app, []) == 0
+
+
+def test_upload_refreshes_rollups(app, client, manager):
+    from tests.test_uploads import csv_bytes, upload, wait_for_job
+
+    response = upload(client, manager, csv_bytes([[2024, week, 1, 2] for week in range(1, 10)]))
+    assert wait_for_job(client, manager, response.get_json()['job_id'])['status'] == 'Done'
+    assert stored(app, 'quarter')[(2024, 1, 'МРТ')] == (18.0, 9)
+
+
+def test_rollup_endpoint(app, client, manager, add_study_counts):
+    add_study_counts({(2023, 1, 'КТ'): 10.0, (2023, 14, 'МРТ'): 4.0, (2024, 1, 'КТ'): 7.0})
+    refresh(app)
+    response = client.get('/manager/study_counts/rollup?period=quarter&from_year=2023&to_year=2023',
+                          headers=manager)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data['year'], data['number'], data['weeks']) == ([2023, 2023], [1, 2], [1, 1])
+    assert data['values']['КТ'] == [10.0, None]
+    assert data['values']['МРТ'] == [None, 4.0]
+    assert np.isnan(np.array(data['values']['РГ'], dtype=float)).all()
+
+
+def test_rollup_endpoint_rejects_unknown_period(client, manager):
+    assert client.get('/manager/study_counts/rollup?period=week', headers=manager).status_code == 400
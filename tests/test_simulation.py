@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from app.services.capacity import HOURS_PER_WEEK, snapshot_from
+from app.services.demand import STUDY_TYPES
+from app.services.simulation import ScenarioError, apply_changes
+
+KT, MRT, RG = (STUDY_TYPES.index(name) for name in ['КТ', 'МРТ', 'РГ'])
+
+
+@pytest.fixture
+def baseline():
+    """Врач a — КТ и МРТ на полную ставку, врач b — РГ на половину."""
+    additional = np.zeros((2, len(STUDY_TYPES)), dtype=bool)
+    additional[0, MRT] = True
+    snapshot = snapshot_from(np.array(['a', 'b'], dtype=object), np.array([1.0, 0.5]),
+                             np.array([40.0, 20.0]), np.array([KT, RG]), additional)
+    for array in snapshot:
+        array.flags.writeable = False
+    return snapshot
+
+
+def test_no_changes(baseline):
+    scenario = apply_changes(baseline, baseline.hours, [])
+    assert scenario.minutes.tolist() == baseline.minutes.tolist()
+
+
+def test_hire(baseline):
+    scenario = apply_changes(baseline, baseline.hours, [
+        {'type': 'hire', 'modality': 'МРТ', 'count': 2, 'rate': 0.5, 'additional_modalities': ['РГ']},
+    ])
+    assert scenario.counts[[KT, MRT, RG]].tolist() == [1, 3, 3]
+    assert scenario.minutes[MRT] == (40 + 2 * HOURS_PER_WEEK * 0.5) * 60
+    assert len(scenario.doctor_ids) == 4
+
+
+def test_move_rate_and_remove(baseline):
+    hours = np.array([32.0, 20.0])
+    scenario = apply_changes(baseline, hours, [
+        {'type': 'rate', 'doctor_id': 'a', 'rate': 0.5},
+        {'type': 'move', 'doctor_id': 'b', 'modality': 'КТ'},
+    ])
+    # Часы по графику масштабируются вместе со ставкой
+    assert scenario.minutes[KT] == (16 + 20) * 60
+    assert scenario.minutes[MRT] == 16 * 60
+    assert scenario.counts[RG] == 0
+
+    scenario = apply_changes(baseline, hours, [{'type': 'remove', 'doctor_id': 'a'}])
+    assert scenario.counts[[KT, MRT]].tolist() == [0, 0]
+
+
+def test_baseline_is_not_modified(baseline):
+    before = [array.copy() for array in baseline]
+    apply_changes(baseline, baseline.hours, [
+        {'type': 'remove', 'doctor_id': 'a'}, {'type': 'hire', 'modality': 'КТ'},
+    ])
+    assert all(np.array_equal(array, copy) for array, copy in zip(baseline, before))
+
+
+@pytest.mark.parametrize('changes', [
+    {'type': 'hire'},
+    [['hire']],
+    ['hire'],
+    [{'type': 'fire', 'doctor_id': 'a'}],
+    [{'type': 'remove', 'doctor_id': 'z'}],
+    [{'type': 'move', 'doctor_id': 'a', 'modality': 'УЗИ'}],
+    [{'type': 'rate', 'doctor_id': 'a', 'rate': -1}],
+    [{'type': 'rate', 'doctor_id': 'a', 'rate': 'full'}],
+    [{'type': 'hire', 'modality': 'КТ', 'count': 0}],
+    [{'type': 'hire', 'modality': 'КТ', 'count': 1.5}],
+    [{'type': 'hire', 'modality': 'КТ', 'count': '3'}],
+    [{'type': 'hire', 'modality': 'КТ', 'count': True}],
+])
+def test_invalid_changes(baseline, changes):
+    with pytest.raises(ScenarioError):
+        apply_changes(baseline, baseline.hours, changes)
+
+
+def test_hires_are_capped_per_scenario(baseline):
+    hire = {'type': 'hire', 'modality': 'КТ', 'count': 6}
+    assert apply_changes(baseline, baseline.hours, [hire], max_hires=6).counts[KT] == 7
+    with pytest.raises(ScenarioError):
+        apply_changes(baseline, baseline.hours, [hire, dict(hire, count=1)], max_hires=6)
+
+
+def test_simulate_endpoint(client, manager, add_doctors, add_study_counts):
+    ids = add_doctors([{'main_modality': 'КТ'}, {'main_modality': 'МРТ', 'rate': 0.5}])
+    add_study_counts({(2024, 10, study_type): 0.0 for study_type in STUDY_TYPES} | {(2024, 10, 'КТ'): 100.0})
+    response = client.post('/manager/simulate', headers=manager, json={
+        'start_date': '2024-03-06',
+        'changes': [{'type': 'hire', 'modality': 'КТ', 'count': 1}, {'type': 'remove', 'doctor_id': str(ids[1])}],
+    })
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data['year'], data['week']) == (2024, 10)
+    assert data['requiredMinutes']['КТ'] == 3000
+    assert data['baseline']['availableMinutes']['КТ'] == 2400
+    assert data['baseline']['isEnough']['КТ'] is False
+    assert data['scenario']['quantity']['КТ'] == 2
+    assert data['scenario']['availableMinutes']['КТ'] == 4800
+    assert data['scenario']['isEnough']['КТ'] is True
+    assert data['scenario']['quantity']['МРТ'] == 0
+
+
+@pytest.mark.parametrize('changes', [
+    'hire',
+    [{'type': 'hire', 'modality': 'КТ', 'count': 10 ** 6}],
+    [{'type': 'remove', 'doctor_id': 'missing'}],
+])
+def test_simulate_rejects_invalid_scenario(client, manager, changes):
+    response = client.post('/manager/simulate', headers=manager,
+                           json={'start_date': '2024-03-06', 'changes': changes})
+    assert response.status_code == 400
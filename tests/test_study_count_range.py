@@ -0,0 +1,45 @@
+import pytest
+
+from app.models import StudyCount
+from app.services.demand import STUDY_TYPES
+
+
+def test_range_across_year_boundary(client, manager, add_study_counts):
+    add_study_counts({(2020, 53, 'КТ'): 10.0, (2021, 1, 'МРТ'): 20.0})
+    response = client.get('/manager/study_counts/range?from_year=2020&from_week=52&to_year=2021&to_week=1',
+                          headers=manager)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['year'] == [2020, 2020, 2021]
+    assert data['week'] == [52, 53, 1]
+    assert data['study_types'] == STUDY_TYPES
+    assert data['values']['КТ'][1] == 10.0 and data['values']['МРТ'][2] == 20.0
+    assert data['actual']['КТ'] == [False, True, False]
+
+
+def test_to_year_defaults_to_from_year(client, manager):
+    response = client.get('/manager/study_counts/range?from_year=2024&from_week=1&to_week=4', headers=manager)
+    assert response.get_json()['week'] == [1, 2, 3, 4]
+
+
+@pytest.mark.parametrize('query', [
+    'from_week=1&to_week=4',
+    'from_year=2021&from_week=1&to_week=53',
+    'from_year=2024&from_week=x&to_week=4',
+])
+def test_invalid_range(client, manager, query):
+    response = client.get(f'/manager/study_counts/range?{query}', headers=manager)
+    assert response.status_code == 400
+
+
+def test_range_is_capped(app, client, manager):
+    limit = app.config['MAX_RANGE_WEEKS']
+    query = f'from_year=2000&from_week=1&to_year={2000 + limit // 52 + 1}&to_week=1'
+    response = client.get(f'/manager/study_counts/range?{query}', headers=manager)
+    assert response.status_code == 400
+    assert str(limit) in response.get_json()['message']
+
+
+def test_composite_index_is_unique():
+    index = next(index for index in StudyCount.__table__.indexes if index.unique)
+    assert [column.name for column in index.columns] == ['year', 'week_number', 'study_type']
@@ -0,0 +1,108 @@
+import uuid
+
+import pandas as pd
+import pytest
+from sqlalchemy import func, inspect, select, text
+
+from app import db
+from app.bulk import ensure_indexes
+from app.models import StudyCount
+from app.services import study_counts
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=['Год', 'Номер недели', 'КТ', 'Флюорограф', 'Комментарий'])
+
+
+def stored(app):
+    table = StudyCount.__table__
+    with app.app_context(), db.engine.connect() as conn:
+        rows = conn.execute(select(table.c.year, table.c.week_number, table.c.study_type, table.c.study_count))
+        return {tuple(row[:3]): row[3] for row in rows}
+
+
+def load(app, rows, **kwargs):
+    with app.app_context(), db.engine.begin() as conn:
+        return study_counts.load(conn, study_counts.reshape(frame(rows)), **kwargs)
+
+
+def test_reshape_maps_aliases_and_keeps_last_duplicate():
+    rows = study_counts.reshape(frame([
+        [2024, 1, 10, 5, 'x'],
+        [2024, 2, None, 6, 'y'],
+        [2024, 1, 11, 5, 'z'],
+    ]))
+    assert sorted(rows.itertuples(index=False, name=None)) == [
+        (2024, 1, 'КТ', 11.0), (2024, 1, 'ФЛГ', 5.0), (2024, 2, 'ФЛГ', 6.0),
+    ]
+
+
+def test_load_is_idempotent_and_updates_values(app):
+    written, weeks = load(app, [[2024, 1, 10, 5, None], [2024, 2, 20, 6, None]], batch_size=3)
+    assert written == 4
+    assert weeks == [(2024, 1), (2024, 2)]
+
+    load(app, [[2024, 1, 10, 5, None], [2024, 2, 21, 6, None]], batch_size=3)
+    assert stored(app) == {
+        (2024, 1, 'КТ'): 10.0, (2024, 1, 'ФЛГ'): 5.0, (2024, 2, 'КТ'): 21.0, (2024, 2, 'ФЛГ'): 6.0,
+    }
+
+
+def test_incremental_load_skips_known_weeks(app):
+    load(app, [[2024, 52, 10, 5, None]])
+    written, weeks = load(app, [[2024, 51, 99, 99, None], [2024, 52, 99, 99, None], [2025, 1, 30, 7, None]],
+                          incremental=True)
+    assert written == 2
+    assert weeks == [(2025, 1)]
+    assert stored(app)[(2024, 52, 'КТ')] == 10.0
+
+
+def test_incremental_load_into_empty_table(app):
+    written, _ = load(app, [[2024, 1, 10, 5, None]], incremental=True)
+    assert written == 2
+
+
+def test_ensure_unique_index_removes_duplicates(app):
+    table = StudyCount.__table__
+    with app.app_context(), db.engine.begin() as conn:
+        conn.execute(text('DROP INDEX uq_study_count_year_week_type'))
+        conn.execute(table.insert(), [
+            {'id': uuid.uuid4(), 'year': 2024, 'week_number': week, 'study_type': study_type, 'study_count': 10.0}
+            for week, study_type, copies in [(1, 'КТ', 3), (1, 'МРТ', 2), (2, 'КТ', 1)] for _ in range(copies)
+        ])
+        assert study_counts.ensure_unique_index(conn) == 2
+        rows = conn.execute(select(table.c.week_number, table.c.study_type)).all()
+        assert sorted(rows) == [(1, 'КТ'), (1, 'МРТ'), (2, 'КТ')]
+        assert 'uq_study_count_year_week_type' in {index['name'] for index in inspect(conn).get_indexes('study_count')}
+
+
+def test_ensure_indexes_adds_indexes_to_existing_tables(app):
+    with app.app_context(), db.engine.begin() as conn:
+        for name in ['ix_users_full_name', 'ix_doctor_schedule_date']:
+            conn.execute(text(f'DROP INDEX {name}'))
+        ensure_indexes(conn, db.metadata)
+        inspector = inspect(conn)
+        assert 'ix_users_full_name' in {index['name'] for index in inspector.get_indexes('users')}
+        assert 'ix_doctor_schedule_date' in {index['name'] for index in inspector.get_indexes('doctor_schedule')}
+
+
+@pytest.mark.parametrize('columns', [['Номер недели', 'КТ'], ['Год', 'Номер недели', 'Комментарий']])
+def test_check_columns(columns):
+    with pytest.raises(ValueError):
+        study_counts.check_columns(columns)
+
+
+@pytest.mark.parametrize('suffix', ['.csv', '.xlsx'])
+def test_iter_chunks(tmp_path, suffix):
+    data = frame([[2024, week, week, 1, None] for week in range(1, 8)])
+    path = str(tmp_path / f'counts{suffix}')
+    if suffix == '.csv':
+        data.to_csv(path, index=False)
+    else:
+        data.to_excel(path, index=False)
+
+    total, chunks = study_counts.iter_chunks(path, chunk_rows=3)
+    chunks = list(chunks)
+    assert total == 7
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert pd.concat(chunks)['КТ'].tolist() == list(range(1, 8))
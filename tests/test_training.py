@@ -0,0 +1,70 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app import db
+from app.ml.compiled import COMPILED_FILE, compiled_targets
+from app.ml.predictor import Predictor, iso_week_range
+from app.ml.registry import read_manifest
+from app.ml.training import load_history, retrain
+
+
+def history_values(weeks=60):
+    return {
+        (year, week, study_type): float(100 + week + 10 * i)
+        for year, week in iso_week_range(2023, 1, 2024, 52)[:weeks].tolist()
+        for i, study_type in enumerate(['КТ', 'МРТ'])
+    }
+
+
+def test_load_history_pivots_by_week(app, add_study_counts):
+    add_study_counts(history_values(3))
+    with app.app_context():
+        history = load_history(db.session)
+    assert list(history.columns) == ['КТ', 'МРТ']
+    assert history.index.tolist() == [(2023, 1), (2023, 2), (2023, 3)]
+    assert history.loc[(2023, 2), 'МРТ'] == 112
+
+
+def test_retrain_publishes_version_with_compiled_models(app, add_study_counts, models_root):
+    add_study_counts(history_values())
+    with app.app_context():
+        version, summary = retrain(db.session, 'v2', workers=1, root=models_root)
+
+    manifest = read_manifest(models_root)
+    assert version in manifest['versions']
+    assert manifest['current'] == 'v1'
+    assert summary['weeks'] == 60 and summary['rows'] == 120
+    stats = summary['targets']['КТ']
+    assert stats['rows'] == 60
+    assert stats['fit_seconds'] > 0 and stats['rss_growth_mib'] >= 0
+    with open(os.path.join(models_root, 'v2', 'training_report.json'), encoding='utf-8') as fh:
+        assert json.load(fh)['targets'].keys() == {'КТ', 'МРТ'}
+
+    models_dir = os.path.join(models_root, 'v2')
+    assert compiled_targets(os.path.join(models_dir, COMPILED_FILE)) == ['КТ', 'МРТ']
+    year_weeks = [(2024, 10), (2025, 1)]
+    assert np.array_equal(Predictor(models_dir, engine='compiled').predict_many(['КТ', 'МРТ'], year_weeks),
+                          Predictor(models_dir, engine='sklearn').predict_many(['КТ', 'МРТ'], year_weeks))
+
+
+def test_retrain_activates_on_request(app, add_study_counts, models_root):
+    add_study_counts(history_values())
+    with app.app_context():
+        retrain(db.session, 'v2', workers=1, activate=True, root=models_root)
+    assert read_manifest(models_root)['current'] == 'v2'
+
+
+def test_retrain_refuses_empty_history(app, models_root):
+    with app.app_context(), pytest.raises(ValueError):
+        retrain(db.session, 'v2', workers=1, root=models_root)
+    assert 'v2' not in read_manifest(models_root)['versions']
+    assert sorted(os.listdir(models_root)) == ['manifest.json', 'v1']
+
+
+def test_retrain_refuses_existing_version(app, add_study_counts, models_root):
+    add_study_counts(history_values())
+    with app.app_context(), pytest.raises(FileExistsError):
+        retrain(db.session, 'v1', workers=1, root=models_root)
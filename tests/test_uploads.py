@@ -0,0 +1,123 @@
+import io
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from app.routes.manager import demand_service
+from app.services.demand import STUDY_TYPES
+
+
+def upload(client, headers, data, filename='counts.csv', **form):
+    return client.post('/manager/study_counts/upload', headers=headers, content_type='multipart/form-data',
+                       data=dict(form, file=(io.BytesIO(data), filename)))
+
+
+def wait_for_job(client, headers, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f'/manager/study_counts/upload/{job_id}', headers=headers).get_json()
+        if job['status'] in ('Done', 'Failed'):
+            return job
+        assert time.monotonic() < deadline, job
+        time.sleep(0.02)
+
+
+def csv_bytes(rows):
+    return pd.DataFrame(rows, columns=['Год', 'Номер недели', 'КТ', 'МРТ']).to_csv(index=False).encode()
+
+
+def test_upload_is_parsed_in_background(app, client, manager):
+    response = upload(client, manager, csv_bytes([[2024, week, week, 2 * week] for week in range(1, 11)]))
+    assert response.status_code == 202
+
+    job = wait_for_job(client, manager, response.get_json()['job_id'])
+    assert job['status'] == 'Done', job['error']
+    assert (job['total_rows'], job['processed_rows'], job['written_rows']) == (10, 10, 20)
+    assert job['progress'] == 1
+    assert not os.listdir(app.config['STUDY_COUNT_UPLOAD_DIR'])
+
+    with app.app_context():
+        demand = demand_service.weekly([(2024, 3)])
+    assert demand.values[0, STUDY_TYPES.index('МРТ')] == 6.0
+
+
+def test_incremental_upload(client, manager, add_study_counts):
+    add_study_counts({(2024, 5, 'КТ'): 1.0})
+    response = upload(client, manager, csv_bytes([[2024, week, 9, 9] for week in range(1, 8)]), incremental='1')
+    job = wait_for_job(client, manager, response.get_json()['job_id'])
+    assert job['written_rows'] == 4
+
+
+def test_invalid_file_fails_job(client, manager):
+    data = pd.DataFrame([[1, 2]], columns=['Неделя', 'КТ']).to_csv(index=False).encode()
+    job = wait_for_job(client, manager, upload(client, manager, data).get_json()['job_id'])
+    assert job['status'] == 'Failed'
+    assert 'Missing columns' in job['error']
+
+
+@pytest.mark.parametrize('filename', ['counts.txt', 'counts'])
+def test_unsupported_extension(client, manager, filename):
+    assert upload(client, manager, b'x', filename=filename).status_code == 400
+
+
+def test_file_is_required(client, manager):
+    response = client.post('/manager/study_counts/upload', headers=manager, data={})
+    assert response.status_code == 400
+
+
+def test_unknown_job(client, manager):
+    response = client.get('/manager/study_counts/upload/00000000-0000-0000-0000-000000000000', headers=manager)
+    assert response.status_code == 404
+
+
+def test_upload_over_size_limit(app, client, manager, monkeypatch):
+    monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', 1024)
+    response = upload(client, manager, b'x' * 4096)
+    assert response.status_code == 413
+    assert '1024' in response.get_json()['message']
+
+
+def test_long_filename_is_truncated(client, manager):
+    response = upload(client, manager, csv_bytes([[2024, 1, 1, 1]]), filename='x' * 300 + '.csv')
+    assert response.status_code == 202
+    job = wait_for_job(client, manager, response.get_json()['job_id'])
+    assert len(job['filename']) == 255
+    assert job['filename'].endswith('.csv')
+
+
+def test_failed_upload_invalidates_loaded_weeks(app, client, manager, monkeypatch):
+    from app.routes.manager import uploads
+
+    monkeypatch.setattr(uploads, 'chunk_rows', 2)
+    with app.app_context():
+        assert demand_service.weekly([(2024, 1)]).actual[0].sum() == 0
+    # Третья строка не число: первая часть записана, вторая падает
+    rows = [[2024, 1, 5, 5], [2024, 2, 5, 5], [2024, 3, 'x', 5]]
+    job = wait_for_job(client, manager, upload(client, manager, csv_bytes(rows)).get_json()['job_id'])
+    assert job['status'] == 'Failed'
+    assert job['written_rows'] == 4
+    with app.app_context():
+        demand = demand_service.weekly([(2024, 1)])
+    assert demand.values[0, STUDY_TYPES.index('КТ')] == 5.0
+
+
+def test_orphaned_jobs_fail_at_startup(app):
+    import uuid
+
+    from app import db
+    from app.models import StudyCountUpload
+    from app.routes.manager import uploads
+
+    job_id = uuid.uuid4()
+    path = os.path.join(app.config['STUDY_COUNT_UPLOAD_DIR'], f'study_counts_{job_id}.csv')
+    open(path, 'wb').close()
+    with app.app_context():
+        db.session.add(StudyCountUpload(id=job_id, filename='counts.csv', status='Processing'))
+        db.session.add(StudyCountUpload(id=uuid.uuid4(), filename='done.csv', status='Done'))
+        db.session.commit()
+        uploads.fail_orphaned()
+        statuses = {job.filename: (job.status, job.error) for job in StudyCountUpload.query.all()}
+    assert statuses == {'counts.csv': ('Failed', 'Interrupted by restart'), 'done.csv': ('Done', None)}
+    assert not os.path.exists(path)
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from app.ml.predictor import iso_week_range, week_range, weeks_ahead
+
+
+def test_range_within_one_year():
+    assert iso_week_range(2024, 50, 2024, 52).tolist() == [[2024, 50], [2024, 51], [2024, 52]]
+    assert week_range(2024, 50, 52) == [(2024, 50), (2024, 51), (2024, 52)]
+
+
+@pytest.mark.parametrize('year', [2015, 2020, 2026])
+def test_range_includes_week_53(year):
+    assert iso_week_range(year, 52, year + 1, 1).tolist() == [[year, 52], [year, 53], [year + 1, 1]]
+
+
+def test_range_across_several_years():
+    weeks = iso_week_range(2019, 1, 2022, 52)
+    # 2020 — год с 53 неделями
+    assert len(weeks) == 52 + 53 + 52 + 52
+    assert weeks[:, 1].max() == 53
+    assert sorted(map(tuple, weeks.tolist())) == list(map(tuple, weeks.tolist()))
+
+
+def test_week_53_of_short_year_is_invalid():
+    with pytest.raises(ValueError):
+        iso_week_range(2021, 1, 2021, 53)
+
+
+def test_reversed_range_is_empty():
+    assert iso_week_range(2024, 10, 2024, 1).shape == (0, 2)
+
+
+@pytest.mark.parametrize('year, week, count', [(2020, 50, 6), (2024, 1, 104), (2026, 53, 2), (2024, 10, 1)])
+def test_weeks_ahead_matches_range(year, week, count):
+    ahead = weeks_ahead(year, week, count)
+    assert len(ahead) == count
+    assert ahead[0] == (year, week)
+    assert ahead == [tuple(row) for row in iso_week_range(year, week, *ahead[-1]).tolist()]
+    assert all(type(value) is int for value in ahead[0])
+
+
+def test_weeks_ahead_without_weeks():
+    assert weeks_ahead(2024, 1, 0) == []
+
+
+def test_predict_across_years(client, manager):
+    response = client.post('/manager/predict', headers=manager, json={
+        'start_year': 2020, 'start_week': 52, 'end_year': 2021, 'end_week': 2, 'targets': ['КТ', 'МРТ']
+    })
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['weeks'] == [[2020, 52], [2020, 53], [2021, 1], [2021, 2]]
+    assert len(data['predictions']['МРТ']) == 4
+
+
+def test_predict_streams_json_lines(client, manager):
+    response = client.post('/manager/predict', headers=manager, json={
+        'start_year': 2024, 'start_week': 1, 'end_year': 2025, 'end_week': 52, 'target': 'КТ', 'stream': True
+    })
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(lines) == 104
+    assert (lines[52]['year'], lines[52]['week']) == (2025, 1)
+    assert set(lines[0]['predictions']) == {'КТ'}
+
+
+@pytest.mark.parametrize('body', [
+    {'year': 2021, 'start_week': 1, 'end_week': 53},
+    {'start_year': 2024, 'start_week': 1, 'end_year': 2024, 'end_week': 'x'},
+    {'start_year': 2024, 'end_year': 2024, 'end_week': 5},
+    {'year': 2024, 'start_week': 1},
+    {'year': 2024, 'start_week': 1.5, 'end_week': 3},
+    {'year': 2024, 'start_week': True, 'end_week': 3},
+    {'year': 2024, 'start_week': 10, 'end_week': 5},
+    {'start_year': 2025, 'start_week': 1, 'end_year': 2024, 'end_week': 52},
+    {'year': 2024, 'start_week': 1, 'end_week': 2, 'targets': ['Рентген']},
+    {'year': 2024, 'start_week': 1, 'end_week': 2, 'targets': [{'name': 'КТ'}]},
+    {'year': 2024, 'start_week': 1, 'end_week': 2, 'targets': [['КТ']]},
+    {'year': 2024, 'start_week': 1, 'end_week': 2, 'targets': 'КТ'},
+    {'year': 2024, 'start_week': 1, 'end_week': 2, 'target': ['КТ']},
+])
+def test_predict_rejects_invalid_input(client, manager, body):
+    assert client.post('/manager/predict', headers=manager, json=body).status_code == 400
+
+
+def test_predict_rejects_too_long_range(app, client, manager):
+    limit = app.config['MAX_RANGE_WEEKS']
+    body = {'start_year': 2000, 'start_week': 1, 'end_year': 2000 + limit // 52 + 1, 'end_week': 1}
+    response = client.post('/manager/predict', headers=manager, json=body)
+    assert response.status_code == 400
+    assert str(limit) in response.get_json()['message']